@@ -1,4 +1,5 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update, func, or_
+from sqlalchemy.orm import Session, aliased
 from datetime import datetime
 from app import models, schemas, utils
 
@@ -9,6 +10,15 @@ def get_user(db: Session, user_id: int):
 def get_users(db: Session):
     return db.query(models.User).all()
 
+def users_rows(db: Session):
+    """Usuarios como dicts planos (mismos campos que UserResponse), sin cargar ORM"""
+    result = db.execute(
+        select(models.User.id, models.User.username, models.User.name, models.User.email,
+               models.Role.name.label("role"))
+        .outerjoin(models.Role, models.User.role_id == models.Role.id)
+    )
+    return [row._asdict() for row in result]
+
 def create_user(db: Session, user: schemas.UserCreate):
     hashed_password = utils.hash_password(user.password)
     db_user = models.User(
@@ -38,8 +48,57 @@ def create_role(db: Session, name: str):
     return db_role
 
 # ---------------- INCIDENTES ----------------
-def get_incidentes(db: Session):
-    return db.query(models.Incidente).order_by(models.Incidente.id.desc()).all()
+def incidente_filters(desde=None, hasta=None, status=None, priority=None, camera=None, type=None):
+    """Condiciones comunes para listar / exportar incidentes (fechas sobre created_at)"""
+    conds = []
+    if desde:
+        conds.append(models.Incidente.created_at >= desde)
+    if hasta:
+        conds.append(models.Incidente.created_at <= hasta)
+    if status:
+        conds.append(models.Incidente.status == status)
+    if priority:
+        conds.append(models.Incidente.priority == priority)
+    if camera:
+        conds.append(models.Incidente.camera == camera)
+    if type:
+        conds.append(models.Incidente.type == type)
+    return conds
+
+def get_incidentes(db: Session, **filtros):
+    return db.query(models.Incidente)\
+             .filter(*incidente_filters(**filtros))\
+             .order_by(models.Incidente.id.desc())\
+             .all()
+
+def incidentes_rows(db: Session, **filtros):
+    """
+    Listado de incidentes como dicts planos con los campos de IncidenteResponse:
+    una sola consulta con los nombres de creador / cerrador, sin objetos ORM.
+    """
+    Inc = models.Incidente
+    creador, cerrador = aliased(models.User), aliased(models.User)
+    result = db.execute(
+        select(
+            Inc.id, Inc.type, Inc.priority, Inc.status, Inc.observacion,
+            Inc.created_by_id, Inc.close_by_id,
+            func.coalesce(creador.name, "Desconocido").label("created_by_name"),
+            func.coalesce(cerrador.name, "-").label("closed_by_name"),
+            Inc.pista, Inc.trabajos_via, Inc.created_at, Inc.closed_at, Inc.updated_at,
+            Inc.camera, Inc.clip,
+        )
+        .outerjoin(creador, Inc.created_by_id == creador.id)
+        .outerjoin(cerrador, Inc.close_by_id == cerrador.id)
+        .where(*incidente_filters(**filtros))
+        .order_by(Inc.id.desc())
+    )
+    rows = [row._asdict() for row in result]
+    for row in rows:
+        # JSON viejo puede traer un valor suelto en vez de lista
+        for key in ("pista", "trabajos_via"):
+            value = row[key]
+            row[key] = [] if value is None else value if isinstance(value, list) else [value]
+    return rows
 
 def get_incidente(db: Session, incidente_id: int):
     return db.query(models.Incidente).filter(models.Incidente.id == incidente_id).first()
@@ -63,6 +122,51 @@ def update_incidente(db: Session, incidente_id: int, incidente_data: schemas.Inc
     db.refresh(db_incidente)
     return db_incidente
 
+def bulk_update_incidentes(db: Session, ids, values, skip_closed=False, filtros=None, limit=None):
+    """
+    Aplica values a varios incidentes con un solo UPDATE en una transacción.
+    Con filtros (en vez de ids) selecciona los ids en la misma transacción.
+    skip_closed: no toca los cerrados (regla del operador).
+    Devuelve {id: resultado} para cada id pedido, o None (sin tocar nada) si
+    los filtros seleccionan más de limit incidentes.
+    """
+    Inc = models.Incidente
+    query = select(Inc.id, Inc.status).with_for_update()  # bloquea las filas hasta el commit
+    if ids is not None:
+        query = query.where(Inc.id.in_(ids))
+    else:
+        # uno más que el límite para detectar que no caben todos
+        query = query.where(*incidente_filters(**(filtros or {}))).order_by(Inc.id)
+        if limit is not None:
+            query = query.limit(limit + 1)
+    found = dict(db.execute(query).all())
+    if ids is None:
+        if limit is not None and len(found) > limit:
+            db.rollback()
+            return None
+        ids = list(found)
+
+    outcomes, targets = {}, []
+    for inc_id in dict.fromkeys(ids):
+        status = found.get(inc_id)
+        if inc_id not in found:
+            outcomes[inc_id] = "no_encontrado"
+        elif status == "Cerrado" and values.get("status") == "Cerrado":
+            outcomes[inc_id] = "ya_cerrado"
+        elif status == "Cerrado" and skip_closed:
+            outcomes[inc_id] = "prohibido"
+        else:
+            outcomes[inc_id] = "actualizado"
+            targets.append(inc_id)
+
+    if targets and values:
+        stmt = update(Inc).where(Inc.id.in_(targets))
+        if skip_closed:
+            stmt = stmt.where(Inc.status != "Cerrado")
+        db.execute(stmt.values(**values).execution_options(synchronize_session=False))
+    db.commit()
+    return outcomes
+
 def close_incidente(db: Session, incidente_id: int, cerrado_por_id: int):
     db_incidente = get_incidente(db, incidente_id)
     if not db_incidente:
@@ -83,8 +187,48 @@ from datetime import datetime
 # CRUD VIDEOS
 # =========================
 
-def get_videos(db: Session):
-    return db.query(models.Video).order_by(models.Video.upload_time.desc()).all()
+def filter_videos(db: Session, camera_id=None, event_type=None, incidente_id=None, desde=None, hasta=None, q=None):
+    query = db.query(models.Video)
+    if camera_id is not None:
+        query = query.filter(models.Video.camera_id == camera_id)
+    if event_type:
+        query = query.filter(models.Video.event_type == event_type)
+    if incidente_id is not None:
+        query = query.filter(models.Video.incidente_id == incidente_id)
+    if desde:
+        query = query.filter(models.Video.upload_time >= desde)
+    if hasta:
+        query = query.filter(models.Video.upload_time <= hasta)
+    if q:
+        # texto libre sobre nombre de archivo y tipo de evento
+        like = f"%{q}%"
+        query = query.filter(or_(models.Video.filename.ilike(like), models.Video.event_type.ilike(like)))
+    return query
+
+def get_videos(db: Session, skip: int = 0, limit: int = None, **filtros):
+    query = filter_videos(db, **filtros).order_by(models.Video.upload_time.desc())
+    if skip:
+        query = query.offset(skip)
+    if limit:
+        query = query.limit(limit)
+    return query.all()
+
+def videos_rows(db: Session, skip: int = 0, limit: int = None, **filtros):
+    """Como get_videos pero solo las columnas del listado, como dicts planos"""
+    V = models.Video
+    query = filter_videos(db, **filtros).with_entities(
+        V.id, V.camera_id, V.filename, V.event_type, V.upload_time, V.folder,
+        V.start_time, V.end_time, V.duration_sec, V.size_bytes, V.incidente_id,
+        V.thumbnail, V.preview,
+    ).order_by(V.upload_time.desc())
+    if skip:
+        query = query.offset(skip)
+    if limit:
+        query = query.limit(limit)
+    return [row._asdict() for row in query]
+
+def count_videos(db: Session, **filtros):
+    return filter_videos(db, **filtros).count()
 
 def get_video(db: Session, video_id: int):
     return db.query(models.Video).filter(models.Video.id == video_id).first()
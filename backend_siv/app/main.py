@@ -8,6 +8,12 @@ from app.routes.users import user_router
 from app.routes.videos import video_router
 from app.routes.incidentes import router as incidentes_router
 from app.routes.camara import camera_router, status_router
+from app.routes.eventos import eventos_router
+from backend_siv.app.services.config import INCIDENT_DIR
+from backend_siv.app.services.sincronizacion import ensure_updated_at
+from backend_siv.app.services.esquema import ensure_columns
+from app.database import engine
+from app import models
 
 # Carpeta de grabaciones
 VIDEOS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "videos", "grabaciones")
@@ -21,6 +27,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Changes-Cursor", "X-Total-Count"],  # sincronización y paginación
 )
 #
 # Routers
@@ -30,11 +37,30 @@ app.include_router(video_router, prefix="/api/videos", tags=["Videos"])
 app.include_router(incidentes_router, prefix="/api/incidentes", tags=["Incidentes"])
 app.include_router(camera_router, prefix="/api", tags=["Cámaras"])
 app.include_router(status_router, prefix="/api", tags=["Status Cámaras"])
+app.include_router(eventos_router, prefix="/api/eventos", tags=["Eventos"])
+
+# Clips de incidentes (catálogo). Debe montarse antes que /videos
+os.makedirs(INCIDENT_DIR, exist_ok=True)
+app.mount("/videos/incidentes", StaticFiles(directory=INCIDENT_DIR), name="videos_incidentes")
 
 # Montar carpeta de grabaciones como estático
 app.mount("/videos", StaticFiles(directory=VIDEOS_DIR), name="videos")
 
 
+@app.on_event("startup")
+def migrate_schema():
+    # columnas nuevas en bases creadas antes (no hay migraciones)
+    try:
+        ensure_updated_at(engine)
+        ensure_columns(engine, models.Incidente.__table__)
+    except Exception as e:
+        print(f"⚠️ No se pudo revisar el esquema de incidentes: {e}")
+    try:
+        ensure_columns(engine, models.Video.__table__)
+    except Exception as e:
+        print(f"⚠️ No se pudo revisar el esquema de videos: {e}")
+
+
 @app.get("/")
 def root():
     return {"status": "Servidor SIV funcionando ✔️"}
@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, String, JSON, DateTime, Date, Time, ForeignKey
+from sqlalchemy import Column, Integer, String, JSON, DateTime, Date, Time, ForeignKey, Index, DDL, event
 from sqlalchemy.orm import relationship
+from sqlalchemy.dialects import mysql
 from datetime import datetime
 from app.database import Base
 
@@ -46,6 +47,7 @@ class Incidente(Base):
     ubicacion_via = Column(String(100), nullable=True)
     trabajos_via = Column(JSON, nullable=False, default=[])
     status = Column(String(20), nullable=False, default="Activo")
+    clip = Column(String(200), nullable=True)  # clip de incidente asociado (borradores automáticos)
     
     # Usuarios que abrieron y cerraron
     created_by_id = Column(Integer, ForeignKey("users.id"), nullable=True)
@@ -53,13 +55,52 @@ class Incidente(Base):
     
     created_at = Column(DateTime, default=datetime.utcnow)
     closed_at = Column(DateTime, nullable=True)
+    # Último cambio (alta, edición o cierre): cursor de /changes y ETag de los listados.
+    # Microsegundos en MySQL para no empatar cambios del mismo segundo.
+    updated_at = Column(
+        DateTime().with_variant(mysql.DATETIME(fsp=6), "mysql"),
+        default=datetime.utcnow, onupdate=datetime.utcnow, nullable=True, index=True,
+    )
 
     # Relaciones opcionales para poder acceder al usuario desde el incidente
     creador = relationship("User", foreign_keys=[created_by_id], backref="incidentes_creados")
     cerrador = relationship("User", foreign_keys=[close_by_id], backref="incidentes_cerrados")
 
+    # Búsqueda de texto libre (MySQL); el orden de columnas debe coincidir con MATCH()
+    __table_args__ = (
+        Index(
+            "ft_incidentes_texto", "observacion", "ubicacion_via", "type", "sector",
+            mysql_prefix="FULLTEXT",
+        ).ddl_if(dialect="mysql"),
+    )
+
+# En SQLite (local / pruebas) el índice de texto es una tabla FTS5 con
+# contenido externo, sincronizada por triggers
+INCIDENTES_FTS_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS incidentes_fts USING fts5(
+        observacion, ubicacion_via, type, sector,
+        content='incidentes', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS incidentes_fts_ai AFTER INSERT ON incidentes BEGIN
+        INSERT INTO incidentes_fts(rowid, observacion, ubicacion_via, type, sector)
+        VALUES (new.id, new.observacion, new.ubicacion_via, new.type, new.sector);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS incidentes_fts_ad AFTER DELETE ON incidentes BEGIN
+        INSERT INTO incidentes_fts(incidentes_fts, rowid, observacion, ubicacion_via, type, sector)
+        VALUES ('delete', old.id, old.observacion, old.ubicacion_via, old.type, old.sector);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS incidentes_fts_au AFTER UPDATE ON incidentes BEGIN
+        INSERT INTO incidentes_fts(incidentes_fts, rowid, observacion, ubicacion_via, type, sector)
+        VALUES ('delete', old.id, old.observacion, old.ubicacion_via, old.type, old.sector);
+        INSERT INTO incidentes_fts(rowid, observacion, ubicacion_via, type, sector)
+        VALUES (new.id, new.observacion, new.ubicacion_via, new.type, new.sector);
+    END""",
+]
+for _ddl in INCIDENTES_FTS_DDL:
+    event.listen(Incidente.__table__, "after_create", DDL(_ddl).execute_if(dialect="sqlite"))
+
 # app/models/video.py
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, BigInteger, Float, String, DateTime, ForeignKey, Index
 from app.database import Base
 
 # =========================
@@ -69,7 +110,21 @@ class Video(Base):
     __tablename__ = "videos"
 
     id = Column(Integer, primary_key=True, index=True)
-    camera_id = Column(Integer, nullable=False)
+    camera_id = Column(Integer, nullable=False, index=True)
     filename = Column(String(200), unique=True, index=True, nullable=False)
-    event_type = Column(String(50), nullable=False)
-    upload_time = Column(DateTime, nullable=False)
+    event_type = Column(String(50), nullable=False, index=True)
+    upload_time = Column(DateTime, nullable=False, index=True)
+
+    # Metadatos del catálogo (clips registrados por el detector)
+    folder = Column(String(50), nullable=False, default="grabaciones")
+    start_time = Column(DateTime, nullable=True, index=True)
+    end_time = Column(DateTime, nullable=True)
+    duration_sec = Column(Float, nullable=True)
+    size_bytes = Column(BigInteger, nullable=True)
+    incidente_id = Column(Integer, ForeignKey("incidentes.id"), nullable=True, index=True)
+    thumbnail = Column(String(200), nullable=True)  # ruta relativa a la carpeta del video
+    preview = Column(String(200), nullable=True)
+
+    __table_args__ = (
+        Index("ix_videos_camera_start", "camera_id", "start_time"),
+    )
@@ -1,37 +1,50 @@
-from fastapi import APIRouter, HTTPException
+import uuid
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Request, Response, Query, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import StreamingResponse
-import time
-
-from backend_siv.app.services.detector import (
-    start_camera,
-    stop_camera,
-    generate_frames,
-    VIDEO_PATHS,
-    vehicles_in_frame,
-    stopped_vehicles,
-    track_histories,
-    accident_detected,
-    assistance_detected,
-    cones_detected,
-    TARGET_RES
+
+from backend_siv.app.services.config import VIDEO_PATHS, MOSAIC_MAX_CAMS
+from backend_siv.app.services.camaras import (
+    get_engine, generate_frames, generate_mosaic, EngineError, FRAME_WAIT_SEC
 )
 
 camera_router = APIRouter()
 status_router = APIRouter()  # Router separado para status
 
-VEHICLE_MEDIUM = 13
-VEHICLE_HIGH = 18
-TIMEOUT_SEC = 5
 
-_last_assistance_seen = {}
-_last_cones_seen = {}
+def _check_camera(cam_id):
+    if cam_id not in VIDEO_PATHS:
+        raise HTTPException(404, "Cámara no encontrada")
+
+
+def _engine_call(fn, *args):
+    # En modo remote el motor puede no estar levantado
+    try:
+        return fn(*args)
+    except EngineError as e:
+        raise HTTPException(503, str(e))
+
+
+def _cam_ids(ids):
+    """'1,2,3' -> [1, 2, 3] de cámaras existentes; sin ids, todas. Lo no numérico se ignora"""
+    if not ids:
+        return list(VIDEO_PATHS)
+    cam_ids = [int(x) for x in (x.strip() for x in ids.split(",")) if x.isdigit()]
+    return list(dict.fromkeys(cid for cid in cam_ids if cid in VIDEO_PATHS))
+
+
+def _snapshot_etag(seq, captured):
+    # seq + captura: el seq vuelve a 0 si el motor se reinicia
+    return f'"{seq:x}-{int((captured or 0) * 1000):x}"'
 
 # ---------------------------
 # STREAMING
 # ---------------------------
 @camera_router.get("/cam/{cam_id}/stream")
 def stream_camera(cam_id: int):
-    start_camera(cam_id)  # Inicia el hilo de la cámara
+    _check_camera(cam_id)
+    _engine_call(get_engine().start, cam_id)  # Inicia el hilo de la cámara
     return StreamingResponse(
         generate_frames(cam_id),  # Función que entrega frames
         media_type="multipart/x-mixed-replace; boundary=frame"
@@ -39,84 +52,169 @@ def stream_camera(cam_id: int):
 
 @camera_router.post("/cam/{cam_id}/stop")
 def stop_camera_endpoint(cam_id: int):
-    stop_camera(cam_id)  # Detiene los hilos de la cámara
+    _check_camera(cam_id)
+    _engine_call(get_engine().stop, cam_id)  # Detiene los hilos de la cámara
     return {"status": f"Cámara {cam_id} detenida"}
 
 
+@camera_router.websocket("/cam/{cam_id}/live")
+async def live_camera(websocket: WebSocket, cam_id: int):
+    """
+    H.264 en MP4 fragmentado para Media Source Extensions. Cada vez que el viewer
+    debe (re)sincronizar llega primero un mensaje de texto {"mime": ...} y luego
+    el segmento de inicialización; el resto son fragmentos binarios.
+    """
+    await websocket.accept()
+    if cam_id not in VIDEO_PATHS:
+        await websocket.close(code=4404, reason="Cámara no encontrada")
+        return
+    engine = get_engine()
+    viewer_id = uuid.uuid4().hex
+    seq = 0  # seq 0 → el primer mensaje trae el init
+    try:
+        await run_in_threadpool(engine.start, cam_id)
+        while True:
+            new_seq, data, mime = await run_in_threadpool(
+                engine.wait_fragments, cam_id, seq, FRAME_WAIT_SEC, viewer_id
+            )
+            if not data:
+                continue
+            if data[4:8] == b"ftyp":
+                await websocket.send_json({"mime": mime})
+            await websocket.send_bytes(data)
+            seq = new_seq
+    except WebSocketDisconnect:
+        pass
+    except EngineError as e:
+        await websocket.close(code=1011, reason=str(e)[:120])
+    finally:
+        try:
+            await run_in_threadpool(engine.release_viewer, cam_id, viewer_id, False, "fmp4")
+        except EngineError:
+            pass
+
+
 @camera_router.get("/cam/{cam_id}/stream_low")
 def stream_camera_low(cam_id: int):
-    start_camera(cam_id)
+    _check_camera(cam_id)
+    _engine_call(get_engine().start, cam_id)
     return StreamingResponse(
         generate_frames(cam_id, low=True),
         media_type="multipart/x-mixed-replace; boundary=frame"
     )
 
+@camera_router.get("/cams/mosaic")
+def cameras_mosaic(
+    ids: Optional[str] = Query(None, description="1,2,3 en orden de la grilla (por defecto todas)"),
+    cols: Optional[int] = Query(None, ge=1, le=MOSAIC_MAX_CAMS),
+):
+    """
+    Stream MJPEG con la grilla de varias cámaras armada en el servidor.
+    Una conexión para todo el muro; los viewers del mismo layout comparten la codificación.
+    """
+    cam_ids = _cam_ids(ids)
+    if not cam_ids:
+        raise HTTPException(404, "Ninguna cámara válida")
+    if len(cam_ids) > MOSAIC_MAX_CAMS:
+        raise HTTPException(400, f"Máximo {MOSAIC_MAX_CAMS} cámaras por mosaico")
+    engine = get_engine()
+    for cid in cam_ids:
+        _engine_call(engine.start, cid)
+    return StreamingResponse(
+        generate_mosaic(cam_ids, cols),
+        media_type="multipart/x-mixed-replace; boundary=frame"
+    )
+
+# ---------------------------
+# SNAPSHOTS (ÚLTIMO JPEG CACHEADO)
+# ---------------------------
+@camera_router.get("/cam/{cam_id}/snapshot")
+def camera_snapshot(cam_id: int, request: Request, low: bool = False):
+    _check_camera(cam_id)
+    # no inicia la cámara: el sondeo de la grilla no debe despertar cámaras apagadas por inactividad
+    seq, data, captured = _engine_call(get_engine().snapshot, cam_id, low)
+    if data is None:
+        return Response(status_code=204, headers={"Cache-Control": "no-cache"})
+
+    headers = {
+        "ETag": _snapshot_etag(seq, captured),
+        "Cache-Control": "no-cache",
+        "X-Frame-Captured": f"{captured:.3f}",
+    }
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    return Response(data, media_type="image/jpeg", headers=headers)
+
+
+@camera_router.get("/cams/snapshots")
+def cameras_snapshots(
+    ids: Optional[str] = Query(None, description="1,2,3 (por defecto todas)"),
+    low: bool = True,
+    since: Optional[str] = Query(None, description="cam:etag,... ya vistos por el cliente"),
+):
+    """
+    Último snapshot de varias cámaras en una sola respuesta multipart/mixed.
+    Las cámaras cuyo ETag coincide con 'since' no se reenvían.
+    """
+    cam_ids = _cam_ids(ids)
+    known = {}
+    for item in (since or "").split(","):
+        cid, _, etag = item.partition(":")
+        if cid.strip().isdigit() and etag:
+            known[int(cid)] = etag.strip().strip('"')
+
+    # solo lo cacheado: las cámaras apagadas salen en X-Snapshot-Missing
+    items = _engine_call(get_engine().snapshots, cam_ids, low)
+
+    parts, unchanged, missing = [], [], []
+    for cid, seq, data, captured in items:
+        if data is None:
+            missing.append(cid)
+            continue
+        etag = _snapshot_etag(seq, captured)
+        if known.get(cid) == etag.strip('"'):
+            unchanged.append(cid)
+            continue
+        parts.append(
+            b"--snapshot\r\n"
+            b"Content-Type: image/jpeg\r\n" +
+            f"X-Cam-Id: {cid}\r\nETag: {etag}\r\nX-Frame-Captured: {captured:.3f}\r\n"
+            f"Content-Length: {len(data)}\r\n\r\n".encode() +
+            data + b"\r\n"
+        )
+    parts.append(b"--snapshot--\r\n")
+    return Response(
+        b"".join(parts),
+        media_type="multipart/mixed; boundary=snapshot",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Snapshot-Unchanged": ",".join(map(str, unchanged)),
+            "X-Snapshot-Missing": ",".join(map(str, missing)),
+        },
+    )
+
 # ---------------------------
 # STATUS COMPLETO
 # ---------------------------
 @status_router.get("/camera/{cam_id}/status_full")
 def camera_status_full(cam_id: int):
-    global _last_assistance_seen, _last_cones_seen
-
-    if cam_id not in _last_assistance_seen:
-        _last_assistance_seen[cam_id] = 0
-    if cam_id not in _last_cones_seen:
-        _last_cones_seen[cam_id] = 0
-
-    if cam_id not in VIDEO_PATHS:
-        raise HTTPException(404, "Cámara no encontrada")
+    _check_camera(cam_id)
+    return _engine_call(get_engine().status, cam_id)
 
 
-    total_vehiculos = vehicles_in_frame.get(cam_id, 0)
-
-    if total_vehiculos > VEHICLE_HIGH:
-        nivel = "Alta"
-        nivel_color = "#dc2626"
-    elif total_vehiculos > VEHICLE_MEDIUM:
-        nivel = "Media"
-        nivel_color = "#facc15"
-    else:
-        nivel = "Baja"
-        nivel_color = "#16a34a"
-
-    ids_detenidos = list(stopped_vehicles.get(cam_id, set()))
-    num_detenidos = len(ids_detenidos)
+# ---------------------------
+# MÉTRICAS DEL PIPELINE
+# ---------------------------
+@status_router.get("/camera/{cam_id}/metrics")
+def camera_metrics(cam_id: int):
+    _check_camera(cam_id)
+    return _engine_call(get_engine().metrics, cam_id)
 
-    # Personas en vía
-    personas_en_via = 0
-    ROAD_Y_START = int(0.5 * TARGET_RES[1])
-    ROAD_Y_END = TARGET_RES[1]
 
-    for tid, history in track_histories.get(cam_id, {}).items():
-        if not history:
-            continue
-        y = history[-1][1]
-        if ROAD_Y_START <= y <= ROAD_Y_END:
-            personas_en_via += 1
-
-    accident = accident_detected.get(cam_id, False)
-
-    now = time.time()
-    if assistance_detected.get(cam_id):
-        _last_assistance_seen[cam_id] = now
-    if cones_detected.get(cam_id):
-        _last_cones_seen[cam_id] = now
-
-    asistencia_activa = (now - _last_assistance_seen[cam_id]) < TIMEOUT_SEC
-    conos_activos = (now - _last_cones_seen[cam_id]) < TIMEOUT_SEC
-
-    alerta_vehiculo = num_detenidos > 0 and not asistencia_activa and not conos_activos
-
-    return {
-        "status": "online",
-        "vehiculos": total_vehiculos,
-        "nivel": nivel,
-        "nivel_color": nivel_color,
-        "detenidos": num_detenidos,
-        "ids_detenidos": ids_detenidos,
-        "personas_en_via": personas_en_via,
-        "accidente_detectado": accident,
-        "asistencia_detectada": asistencia_activa,
-        "conos_detectados": conos_activos,
-        "alerta_vehiculo": alerta_vehiculo
-    }
+# ---------------------------
+# OCUPACIÓN POR ZONA
+# ---------------------------
+@status_router.get("/camera/{cam_id}/zonas")
+def camera_zones(cam_id: int):
+    _check_camera(cam_id)
+    return {"cam_id": cam_id, "zonas": _engine_call(get_engine().zones, cam_id)}
@@ -0,0 +1,47 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from typing import Optional
+import json
+
+from backend_siv.app.services.camaras import get_engine, EngineError
+
+eventos_router = APIRouter()
+
+HEARTBEAT_SEC = 15
+
+
+# ---------------------------
+# EVENTOS ABIERTOS
+# ---------------------------
+@eventos_router.get("/abiertos")
+def open_events(cam_id: Optional[int] = None):
+    try:
+        return get_engine().open_events(cam_id)
+    except EngineError as e:
+        raise HTTPException(503, str(e))
+
+
+# ---------------------------
+# STREAM SSE (alertas en tiempo real)
+# ---------------------------
+def _sse(cam_id):
+    engine = get_engine()
+    seq, _ = engine.wait_events(0, 0)  # solo eventos nuevos desde la conexión
+    while True:
+        seq, events = engine.wait_events(seq, HEARTBEAT_SEC)
+        if not events:
+            yield ": ping\n\n"
+            continue
+        for msg in events:
+            if cam_id is not None and msg["cam_id"] != cam_id:
+                continue
+            yield f"id: {msg['seq']}\nevent: {msg['tipo']}\ndata: {json.dumps(msg)}\n\n"
+
+
+@eventos_router.get("/stream")
+def stream_events(cam_id: Optional[int] = None):
+    return StreamingResponse(
+        _sse(cam_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
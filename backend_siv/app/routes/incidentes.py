@@ -1,10 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime, date, time
 
 from app import crud, schemas, models
 from app.routes.dependencies import get_db, require_roles
+from backend_siv.app.services.exportar import export_stream, EXPORT_FORMATS
+from backend_siv.app.services.busqueda import search_incidentes
+from backend_siv.app.services.config import (
+    SEARCH_PAGE_SIZE, SEARCH_MAX_PAGE_SIZE, BULK_MAX_IDS, CHANGES_LIMIT, FAST_JSON_LISTS
+)
+from backend_siv.app.services.serializacion import FastJSONResponse
+from backend_siv.app.services.sincronizacion import changes_since, current_cursor, list_etag
 
 router = APIRouter(tags=["Incidentes"])
 
@@ -18,15 +27,56 @@ def fix_list(value):
         return value
     return [value]
 
+# ---------------------------
+# GET condicional (ETag)
+# ---------------------------
+def not_modified(request, response, etag):
+    """Respuesta 304 si el cliente ya tiene esta versión; si no, deja el ETag puesto"""
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
+# ---------------------------
+# Filtros comunes (listado / exportación)
+# ---------------------------
+def incidente_filtros(
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    status: Optional[str] = None,
+    priority: Optional[str] = None,
+    camera: Optional[str] = None,
+    type: Optional[str] = None,
+):
+    return dict(desde=desde, hasta=hasta, status=status, priority=priority, camera=camera, type=type)
+
+EXPORT_COLUMNS = [
+    "id", "type", "priority", "camera", "sector",
+    "start_date", "start_time", "end_date", "end_time",
+    "observacion", "pista", "senalizacion", "ubicacion_via", "trabajos_via",
+    "status", "created_by_id", "close_by_id", "created_at", "closed_at",
+]
+
 # ---------------------------
 # GET todos los incidentes
 # ---------------------------
 @router.get("/", response_model=List[schemas.IncidenteResponse])
 def get_incidentes(
+    request: Request,
+    response: Response,
+    filtros: dict = Depends(incidente_filtros),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(require_roles("admin", "supervisor", "operador"))
 ):
-    incidencias = crud.get_incidentes(db)
+    cached = not_modified(request, response, list_etag(db, "listado", filtros))
+    if cached:
+        return cached
+    # desde aquí el cliente puede seguir con /changes
+    response.headers["X-Changes-Cursor"] = current_cursor(db)
+    if FAST_JSON_LISTS:
+        return FastJSONResponse(crud.incidentes_rows(db, **filtros), headers=dict(response.headers))
+    incidencias = crud.get_incidentes(db, **filtros)
     for inc in incidencias:
         inc.pista = fix_list(inc.pista)
         inc.trabajos_via = fix_list(inc.trabajos_via)
@@ -34,6 +84,91 @@ def get_incidentes(
         inc.closed_by_name = inc.cerrador.name if inc.cerrador else "-"
     return incidencias
 
+# ---------------------------
+# GET cambios desde un cursor (sincronización incremental)
+# ---------------------------
+@router.get("/changes", response_model=schemas.CambiosIncidentes)
+def get_changes(
+    request: Request,
+    response: Response,
+    since: Optional[str] = Query(None, description="Cursor de la respuesta anterior (o X-Changes-Cursor del listado)"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(require_roles("admin", "supervisor", "operador"))
+):
+    """Incidentes creados, editados o cerrados después del cursor, en orden de cambio"""
+    try:
+        cached = not_modified(request, response, list_etag(db, "changes", since=since))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if cached:
+        return cached
+    rows, cursor, has_more = changes_since(db, since, CHANGES_LIMIT)
+    for inc in rows:
+        inc.pista = fix_list(inc.pista)
+        inc.trabajos_via = fix_list(inc.trabajos_via)
+        inc.created_by_name = inc.creador.name if inc.creador else "Desconocido"
+        inc.closed_by_name = inc.cerrador.name if inc.cerrador else "-"
+    return {"items": rows, "cursor": cursor or "", "has_more": has_more}
+
+# ---------------------------
+# GET búsqueda de texto (FULLTEXT / FTS5)
+# ---------------------------
+@router.get("/buscar", response_model=schemas.BusquedaIncidentes)
+def buscar_incidentes(
+    q: str = Query(..., min_length=1, description="Texto en observación, ubicación, tipo o sector"),
+    page: int = Query(1, ge=1),
+    size: int = Query(SEARCH_PAGE_SIZE, ge=1, le=SEARCH_MAX_PAGE_SIZE),
+    filtros: dict = Depends(incidente_filtros),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(require_roles("admin", "supervisor", "operador"))
+):
+    """
+    Busca con el índice de texto (todas las palabras, por prefijo) y ordena por
+    relevancia; combinable con los filtros del listado.
+    """
+    try:
+        total, rows = search_incidentes(db, q, page, size, **filtros)
+    except RuntimeError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    items = []
+    for inc, score in rows:
+        inc.pista = fix_list(inc.pista)
+        inc.trabajos_via = fix_list(inc.trabajos_via)
+        inc.created_by_name = inc.creador.name if inc.creador else "Desconocido"
+        inc.closed_by_name = inc.cerrador.name if inc.cerrador else "-"
+        inc.score = round(score, 4)
+        items.append(inc)
+    return {"total": total, "page": page, "size": size, "items": items}
+
+# ---------------------------
+# GET exportar (CSV / Parquet en streaming)
+# ---------------------------
+@router.get("/export")
+def export_incidentes(
+    formato: str = Query("csv", pattern="^(csv|parquet)$"),
+    gzip: bool = False,
+    filtros: dict = Depends(incidente_filtros),
+    current_user: models.User = Depends(require_roles("admin", "supervisor", "operador"))
+):
+    """
+    Exporta los incidentes filtrados leyendo por lotes desde un cursor del servidor;
+    la memoria no crece con el rango de fechas.
+    """
+    stmt = select(*[getattr(models.Incidente, c) for c in EXPORT_COLUMNS])\
+        .where(*crud.incidente_filters(**filtros))\
+        .order_by(models.Incidente.id)
+    try:
+        stream = export_stream(stmt, formato, gzip)
+    except RuntimeError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+
+    media_type, ext = EXPORT_FORMATS[formato]
+    filename = f"incidentes.{ext}" + (".gz" if gzip else "")
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    if gzip:
+        media_type = "application/gzip"
+    return StreamingResponse(stream, media_type=media_type, headers=headers)
+
 # ---------------------------
 # GET por ID
 # ---------------------------
@@ -93,6 +228,59 @@ def update_incidente(
         raise HTTPException(status_code=404, detail="Incidente no encontrado")
     return updated_inc
 
+# ---------------------------
+# POST operaciones masivas (una transacción)
+# ---------------------------
+@router.post("/bulk/", response_model=schemas.BulkRespuesta)
+def bulk_incidentes(
+    data: schemas.IncidenteBulk,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(require_roles("admin", "supervisor", "operador"))
+):
+    """
+    Actualiza o cierra varios incidentes (por ids o por filtros) con un solo
+    UPDATE. Devuelve el resultado de cada id; el operador no toca cerrados.
+    """
+    if (data.ids is None) == (data.filtros is None):
+        raise HTTPException(status_code=400, detail="Indica ids o filtros (uno de los dos)")
+    if data.filtros is not None and not any(v not in (None, "") for v in data.filtros.dict().values()):
+        # filtros vacíos seleccionarían todos los incidentes
+        raise HTTPException(status_code=400, detail="Indica al menos un filtro")
+    if data.ids is not None and len(data.ids) > BULK_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"Máximo {BULK_MAX_IDS} incidentes por operación")
+
+    if data.accion == "actualizar":
+        values = data.cambios.dict(exclude_unset=True) if data.cambios else {}
+        if not values:
+            raise HTTPException(status_code=400, detail="Sin cambios para aplicar")
+    else:
+        if not data.end_date or not data.end_time:
+            raise HTTPException(status_code=400, detail="Fecha y hora de cierre son obligatorias")
+        values = {
+            "status": "Cerrado",
+            "close_by_id": data.close_by_id or current_user.id,
+            "closed_at": datetime.combine(data.end_date, data.end_time),
+        }
+
+    operador = current_user.role.name.lower() == "operador"
+    outcomes = crud.bulk_update_incidentes(
+        db, data.ids, values, skip_closed=operador,
+        filtros=data.filtros.dict() if data.filtros else None, limit=BULK_MAX_IDS,
+    )
+    if outcomes is None:
+        # no se aplica a una parte: el operador creería que cerró todos
+        raise HTTPException(
+            status_code=400,
+            detail=f"Los filtros seleccionan más de {BULK_MAX_IDS} incidentes; acótalos",
+        )
+    resultados = [{"id": i, "resultado": r} for i, r in outcomes.items()]
+    return {
+        "accion": data.accion,
+        "total": len(resultados),
+        "actualizados": sum(r == "actualizado" for r in outcomes.values()),
+        "resultados": resultados,
+    }
+
 # ---------------------------
 # PATCH cerrar incidente
 # ---------------------------
@@ -4,6 +4,8 @@ from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 from app import crud, models, schemas
 from app.routes.dependencies import get_current_user, get_db
+from backend_siv.app.services.config import FAST_JSON_LISTS
+from backend_siv.app.services.serializacion import FastJSONResponse
 
 user_router = APIRouter()
 
@@ -36,6 +38,8 @@ def get_me(current_user: models.User = Depends(get_current_user)):
 @user_router.get("/", response_model=list[schemas.UserResponse])
 def list_users(db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
     check_admin_or_supervisor(current_user)
+    if FAST_JSON_LISTS:
+        return FastJSONResponse(crud.users_rows(db))
     users = crud.get_users(db)
     return [
         {
@@ -1,10 +1,23 @@
 # app/api/routes/videos.py
 import os
 import uuid
+import shutil
 from datetime import datetime
-from fastapi import APIRouter, UploadFile, File, Form, Depends
+from typing import Optional
+from fastapi import APIRouter, UploadFile, File, Form, Depends, Query, Response, Request, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from app import models, schemas, database, crud
+from backend_siv.app.services.entrega import range_file_response, resolve_video_path
+from backend_siv.app.services.media import make_hls, hls_dir
+from backend_siv.app.services.grabacion import find_segments
+from backend_siv.app.services.exportar import export_stream, EXPORT_FORMATS
+from backend_siv.app.services import lotes
+from backend_siv.app.services.camaras import get_engine, EngineError
+from backend_siv.app.services.config import FAST_JSON_LISTS, PUBLIC_VIDEO_FOLDERS
+from backend_siv.app.services.serializacion import FastJSONResponse
+from app.routes.dependencies import require_roles
 from pydantic import BaseModel
 
 # Carpeta de grabaciones dentro del backend
@@ -32,24 +45,255 @@ class VideoListResponse(BaseModel):
     event_type: str
     upload_time: datetime
     url: str
+    start_time: Optional[datetime] = None
+    end_time: Optional[datetime] = None
+    duration_sec: Optional[float] = None
+    size_bytes: Optional[int] = None
+    incidente_id: Optional[int] = None
+    thumbnail_url: Optional[str] = None
+    preview_url: Optional[str] = None
+
+
+def video_base_url(v):
+    # Las grabaciones manuales se sirven en /videos, el resto en /videos/<carpeta>;
+    # las carpetas privadas (análisis) no tienen URL pública
+    folder = (v["folder"] if isinstance(v, dict) else v.folder) or "grabaciones"
+    if folder not in PUBLIC_VIDEO_FOLDERS:
+        return None
+    return "/videos" if folder == "grabaciones" else f"/videos/{folder}"
+
+
+def video_row(row):
+    """Fila plana de crud.videos_rows -> dict con los campos de VideoListResponse"""
+    base = video_base_url(row)
+    row.pop("folder")
+    thumbnail, preview = row.pop("thumbnail"), row.pop("preview")
+    row["url"] = f"/api/videos/{row['id']}/play"
+    row["thumbnail_url"] = f"{base}/{thumbnail}" if thumbnail and base else None
+    row["preview_url"] = f"{base}/{preview}" if preview and base else None
+    return row
 
 # -------------------------
 # Listar videos (sin token)
 # -------------------------
 @video_router.get("/", response_model=list[VideoListResponse])
-def list_videos(db: Session = Depends(get_db)):
-    videos = crud.get_videos(db)  # Trae todos los videos de la DB
-    return [
-        VideoListResponse(
+def list_videos(
+    response: Response,
+    camera_id: Optional[int] = None,
+    event_type: Optional[str] = None,
+    incidente_id: Optional[int] = None,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    q: Optional[str] = Query(None, max_length=100, description="Texto en nombre de archivo o tipo de evento"),
+    page: int = Query(1, ge=1),
+    page_size: Optional[int] = Query(None, ge=1, le=500),
+    db: Session = Depends(get_db)
+):
+    """
+    Lista el catálogo filtrando por campos indexados.
+    Sin page_size devuelve todo (compatibilidad); el total va en X-Total-Count.
+    """
+    filtros = dict(camera_id=camera_id, event_type=event_type,
+                   incidente_id=incidente_id, desde=desde, hasta=hasta, q=q)
+    skip = (page - 1) * page_size if page_size else 0
+    if FAST_JSON_LISTS:
+        videos = [video_row(v) for v in crud.videos_rows(db, skip=skip, limit=page_size, **filtros)]
+    else:
+        videos = crud.get_videos(db, skip=skip, limit=page_size, **filtros)
+    response.headers["X-Total-Count"] = str(crud.count_videos(db, **filtros) if page_size else len(videos))
+
+    if FAST_JSON_LISTS:
+        return FastJSONResponse(videos, headers=dict(response.headers))
+    result = []
+    for v in videos:
+        base = video_base_url(v)
+        result.append(VideoListResponse(
             id=v.id,
             camera_id=v.camera_id,
             filename=v.filename,
             event_type=v.event_type,
             upload_time=v.upload_time,
-            url=f"/videos/{v.filename}"
-        ) for v in videos
+            url=f"/api/videos/{v.id}/play",
+            start_time=v.start_time,
+            end_time=v.end_time,
+            duration_sec=v.duration_sec,
+            size_bytes=v.size_bytes,
+            incidente_id=v.incidente_id,
+            thumbnail_url=f"{base}/{v.thumbnail}" if v.thumbnail and base else None,
+            preview_url=f"{base}/{v.preview}" if v.preview and base else None,
+        ))
+    return result
+
+# -------------------------
+# Exportar catálogo (CSV / Parquet en streaming)
+# -------------------------
+@video_router.get("/export")
+def export_videos(
+    formato: str = Query("csv", pattern="^(csv|parquet)$"),
+    gzip: bool = False,
+    camera_id: Optional[int] = None,
+    event_type: Optional[str] = None,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+):
+    V = models.Video
+    stmt = select(
+        V.id, V.camera_id, V.event_type, V.filename, V.folder,
+        V.start_time, V.end_time, V.duration_sec, V.size_bytes,
+        V.incidente_id, V.upload_time
+    ).order_by(V.id)
+    if camera_id is not None:
+        stmt = stmt.where(V.camera_id == camera_id)
+    if event_type:
+        stmt = stmt.where(V.event_type == event_type)
+    if desde:
+        stmt = stmt.where(V.upload_time >= desde)
+    if hasta:
+        stmt = stmt.where(V.upload_time <= hasta)
+    try:
+        stream = export_stream(stmt, formato, gzip)
+    except RuntimeError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+
+    media_type, ext = EXPORT_FORMATS[formato]
+    filename = f"videos.{ext}" + (".gz" if gzip else "")
+    return StreamingResponse(
+        stream,
+        media_type="application/gzip" if gzip else media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+# -------------------------
+# Segmentos de grabación continua
+# -------------------------
+@video_router.get("/segmentos")
+def list_segments(
+    camera_id: int,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None
+):
+    """Segmentos de la grabación continua que se solapan con [desde, hasta]"""
+    segs = find_segments(
+        camera_id,
+        desde.timestamp() if desde else None,
+        hasta.timestamp() if hasta else None
+    )
+    return [
+        {
+            "file": e["file"],
+            "start": datetime.fromtimestamp(e["start"]),
+            "end": datetime.fromtimestamp(e["end"]),
+            "frames": e["frames"],
+            "size_bytes": e["size"],
+            "url": f"/api/videos/archivo/generado/cam{camera_id}/{e['file']}",
+        } for e in segs
     ]
 
+# -------------------------
+# Reproducción con soporte Range
+# -------------------------
+def _video_file(db, video_id):
+    v = crud.get_video(db, video_id)
+    # los de carpetas privadas se descargan por /archivo/<carpeta> con sesión
+    if not v or (v.folder or "grabaciones") not in PUBLIC_VIDEO_FOLDERS:
+        raise HTTPException(status_code=404, detail="Video no encontrado")
+    return resolve_video_path(v.folder or "grabaciones", v.filename)
+
+
+@video_router.get("/{video_id}/play")
+def play_video(video_id: int, request: Request, db: Session = Depends(get_db)):
+    return range_file_response(request, _video_file(db, video_id), "video/mp4")
+
+
+@video_router.get("/{video_id}/hls/{name}")
+def play_video_hls(video_id: int, name: str, request: Request, db: Session = Depends(get_db)):
+    """
+    Modo HLS opcional: la primera petición de la playlist segmenta el clip
+    (remux sin recodificar); luego se sirven playlist y segmentos desde disco.
+    """
+    path = _video_file(db, video_id)
+    out_dir = make_hls(path) if name == "index.m3u8" else hls_dir(path)
+    if not out_dir:
+        raise HTTPException(status_code=503, detail="Segmentación HLS no disponible (ffmpeg)")
+    seg = os.path.join(out_dir, os.path.basename(name))
+    if not os.path.isfile(seg):
+        raise HTTPException(status_code=404, detail="Segmento no encontrado")
+    return range_file_response(request, seg, max_age=0 if name.endswith(".m3u8") else 86400)
+
+
+@video_router.get("/archivo/analisis/{relpath:path}")
+def get_analysis_file(
+    relpath: str,
+    request: Request,
+    current_user: models.User = Depends(require_roles("admin", "supervisor", "operador"))
+):
+    # Resultado de un análisis por lotes: video subido por un operador, solo con sesión
+    return range_file_response(request, resolve_video_path("analisis", relpath))
+
+
+@video_router.get("/archivo/{folder}/{relpath:path}")
+def get_video_file(folder: str, relpath: str, request: Request):
+    # Grabaciones continuas, miniaturas, previews, etc. por ruta (solo carpetas públicas)
+    if folder not in PUBLIC_VIDEO_FOLDERS:
+        raise HTTPException(status_code=404, detail="Carpeta no encontrada")
+    return range_file_response(request, resolve_video_path(folder, relpath))
+
+# -------------------------
+# Análisis por lotes de videos subidos
+# -------------------------
+@video_router.post("/analisis", status_code=202)
+def submit_analysis(
+    file: UploadFile = File(...),
+    camera_id: int = Form(0),
+    start_time: Optional[datetime] = Form(None),
+    current_user: models.User = Depends(require_roles("admin", "supervisor", "operador"))
+):
+    if not file.filename.lower().endswith((".mp4", ".avi", ".mov", ".mkv")):
+        raise HTTPException(400, "Formato de video no soportado")
+    work_dir = lotes.new_job_dir()
+    src = os.path.join(work_dir, "origen" + os.path.splitext(file.filename)[1].lower())
+    with open(src, "wb") as out:
+        shutil.copyfileobj(file.file, out, 1024 * 1024)
+    # el trabajo corre en el motor: con varios workers HTTP todos lo ven
+    try:
+        return get_engine().submit_analysis(src, file.filename, camera_id, start_time)
+    except ValueError as e:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        raise HTTPException(400, str(e))
+    except EngineError as e:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        raise HTTPException(503, str(e))
+
+
+def _analysis_call(fn, *args):
+    try:
+        return fn(*args)
+    except EngineError as e:
+        raise HTTPException(503, str(e))
+
+
+@video_router.get("/analisis")
+def list_analysis():
+    return _analysis_call(get_engine().analysis_jobs)
+
+
+@video_router.get("/analisis/{job_id}")
+def analysis_status(job_id: str):
+    status = _analysis_call(get_engine().analysis_status, job_id)
+    if status is None:
+        raise HTTPException(404, "Trabajo no encontrado")
+    return status
+
+
+@video_router.get("/analisis/{job_id}/resultado")
+def analysis_result(job_id: str):
+    status = _analysis_call(get_engine().analysis_status, job_id)
+    if status is None:
+        raise HTTPException(404, "Trabajo no encontrado")
+    if status["status"] != "listo":
+        raise HTTPException(409, f"Trabajo en estado {status['status']}")
+    return _analysis_call(get_engine().analysis_result, job_id)
+
 #########################
 #
 #Endpint para grabar videos automaticos
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from typing import Optional, List, Literal
 from datetime import datetime, date, time
 
 # =========================
@@ -90,10 +90,55 @@ class IncidenteResponse(BaseModel):
     trabajos_via: List = []
     created_at: datetime
     closed_at: Optional[datetime]
+    updated_at: Optional[datetime] = None
+    camera: Optional[str] = None
+    clip: Optional[str] = None
 
     class Config:
         orm_mode = True
 
+class CambiosIncidentes(BaseModel):
+    items: List[IncidenteResponse]
+    cursor: str        # enviar como since en el próximo pedido
+    has_more: bool     # quedan cambios: pedir de nuevo enseguida
+
+class IncidenteBusqueda(IncidenteResponse):
+    score: float = 0.0  # relevancia (mayor = más relevante)
+
+class BusquedaIncidentes(BaseModel):
+    total: int
+    page: int
+    size: int
+    items: List[IncidenteBusqueda]
+
+# Operaciones masivas: por lista de ids o por los mismos filtros del listado
+class IncidenteFiltros(BaseModel):
+    desde: Optional[datetime] = None
+    hasta: Optional[datetime] = None
+    status: Optional[str] = None
+    priority: Optional[str] = None
+    camera: Optional[str] = None
+    type: Optional[str] = None
+
+class IncidenteBulk(BaseModel):
+    accion: Literal["actualizar", "cerrar"]
+    ids: Optional[List[int]] = None
+    filtros: Optional[IncidenteFiltros] = None
+    cambios: Optional[IncidenteUpdate] = None   # actualizar
+    close_by_id: Optional[int] = None           # cerrar (por defecto el usuario actual)
+    end_date: Optional[date] = None             # cerrar
+    end_time: Optional[time] = None             # cerrar
+
+class BulkResultado(BaseModel):
+    id: int
+    resultado: str  # actualizado | no_encontrado | prohibido | ya_cerrado
+
+class BulkRespuesta(BaseModel):
+    accion: str
+    total: int
+    actualizados: int
+    resultados: List[BulkResultado]
+
 
 
 
@@ -105,6 +150,14 @@ class VideoBase(BaseModel):
     filename: str
     event_type: str
     upload_time: datetime
+    folder: Optional[str] = "grabaciones"
+    start_time: Optional[datetime] = None
+    end_time: Optional[datetime] = None
+    duration_sec: Optional[float] = None
+    size_bytes: Optional[int] = None
+    incidente_id: Optional[int] = None
+    thumbnail: Optional[str] = None
+    preview: Optional[str] = None
 
 class VideoCreate(VideoBase):
     pass
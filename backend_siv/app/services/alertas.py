@@ -0,0 +1,107 @@
+import time
+
+from backend_siv.app.services.config import ALERT_RULES
+
+IDLE = "IDLE"
+PENDING = "PENDING"
+ACTIVE = "ACTIVE"
+
+
+# ===============================
+# TABLA DE TRANSICIONES
+# ===============================
+# (estado, señal presente) -> [(condición, siguiente estado)]
+# La primera condición que se cumple decide; sin entrada el estado se mantiene.
+TRANSITIONS = {
+    (IDLE, True): [("always", PENDING)],
+    (PENDING, True): [("confirmed", ACTIVE)],
+    (PENDING, False): [("gap_expired", IDLE)],
+    (ACTIVE, False): [("released", IDLE)],
+}
+
+GUARDS = {
+    "always": lambda r, s, now: True,
+    "confirmed": lambda r, s, now: now - s["since"] >= r["confirm_sec"],
+    "gap_expired": lambda r, s, now: now - s["last_seen"] > r["gap_sec"],
+    "released": lambda r, s, now: now - s["last_seen"] >= r["release_sec"],
+}
+
+
+# ===============================
+# MOTOR DE ALERTAS POR CÁMARA
+# ===============================
+class AlertEngine:
+    """
+    Evalúa todas las reglas de una cámara en una pasada por frame. Las ventanas
+    son en segundos (no en frames): el resultado no depende de los FPS y un
+    frame perdido no reinicia la confirmación.
+    """
+
+    def __init__(self, rules=ALERT_RULES):
+        self.rules = rules
+        self.states = {name: self._initial() for name in rules}
+
+    @staticmethod
+    def _initial():
+        return {"state": IDLE, "since": 0.0, "last_seen": 0.0}
+
+    def update(self, signals, now=None):
+        """
+        signals: conjunto de señales presentes en el frame (clases + señales derivadas).
+        Devuelve {regla: activa}.
+        """
+        if now is None:
+            now = time.time()
+        for name, rule in self.rules.items():
+            st = self.states[name]
+            seen = rule["signal"] in signals
+            if seen:
+                st["last_seen"] = now
+            for guard, target in TRANSITIONS.get((st["state"], seen), ()):
+                if GUARDS[guard](rule, st, now):
+                    if target == PENDING:
+                        st["since"] = now
+                    st["state"] = target
+                    break
+        return self.active()
+
+    def active(self, name=None):
+        if name is not None:
+            return self.states[name]["state"] == ACTIVE
+        return {n: st["state"] == ACTIVE for n, st in self.states.items()}
+
+    def snapshot(self):
+        return {n: dict(st) for n, st in self.states.items()}
+
+    def restore(self, states):
+        for name, st in states.items():
+            if name in self.states:
+                self.states[name] = dict(st)
+
+
+# ===============================
+# ARNÉS CON DETECCIONES SINTÉTICAS
+# ===============================
+def simulate(stream, rules=ALERT_RULES):
+    """
+    Alimenta el motor con una secuencia [(t, señales), ...] y devuelve los
+    cambios de estado [(t, regla, estado)]. Sirve para ajustar ALERT_RULES:
+
+        stream = [(i / 10, {"cono"} if i % 7 else set()) for i in range(50)]
+        simulate(stream)  # un frame perdido cada 7 no hace parpadear "conos"
+    """
+    engine = AlertEngine(rules)
+    changes = []
+    last = {n: IDLE for n in rules}
+    for t, signals in stream:
+        engine.update(signals, now=t)
+        for name, st in engine.states.items():
+            if st["state"] != last[name]:
+                changes.append((t, name, st["state"]))
+                last[name] = st["state"]
+    return changes
+
+
+def synthetic_stream(pattern, signal, fps=10, start=0.0):
+    """'..xxx.xx' -> [(t, señales)]: 'x' = señal presente en ese frame"""
+    return [(start + i / fps, {signal} if c == "x" else set()) for i, c in enumerate(pattern)]
@@ -0,0 +1,97 @@
+import re
+import threading
+
+from sqlalchemy import select, func, text, literal_column, table, column
+from sqlalchemy.dialects.mysql import match
+
+from app import models, crud
+from app.database import engine
+from backend_siv.app.services.config import SEARCH_MAX_TERMS, SEARCH_MIN_TOKEN
+
+Incidente = models.Incidente
+TEXT_COLUMNS = (Incidente.observacion, Incidente.ubicacion_via, Incidente.type, Incidente.sector)
+
+_ready = False
+_ready_lock = threading.Lock()
+
+
+# ===============================
+# ÍNDICE DE TEXTO (BASES YA CREADAS)
+# ===============================
+def ensure_search_index(bind=engine):
+    """
+    create_all crea el índice solo con la tabla nueva; en bases existentes se
+    agrega aquí una vez por proceso (FULLTEXT en MySQL, FTS5 en SQLite).
+    """
+    global _ready
+    with _ready_lock:
+        if _ready:
+            return
+        dialect = bind.dialect.name
+        with bind.begin() as conn:
+            if dialect == "mysql":
+                exists = conn.execute(text(
+                    "SHOW INDEX FROM incidentes WHERE Key_name = 'ft_incidentes_texto'"
+                )).first()
+                if not exists:
+                    print("🔎 Creando índice FULLTEXT de incidentes...")
+                    conn.execute(text(
+                        "ALTER TABLE incidentes ADD FULLTEXT INDEX ft_incidentes_texto "
+                        "(observacion, ubicacion_via, type, sector)"
+                    ))
+            elif dialect == "sqlite":
+                exists = conn.execute(text(
+                    "SELECT 1 FROM sqlite_master WHERE name = 'incidentes_fts'"
+                )).first()
+                for ddl in models.INCIDENTES_FTS_DDL:
+                    conn.execute(text(ddl))
+                if not exists:
+                    # indexa las filas que ya estaban
+                    conn.execute(text("INSERT INTO incidentes_fts(incidentes_fts) VALUES ('rebuild')"))
+            else:
+                raise RuntimeError(f"Búsqueda de texto no soportada en {dialect}")
+        _ready = True
+
+
+# ===============================
+# CONSULTA
+# ===============================
+def terms(q, min_len=1):
+    """Palabras de la consulta (sin operadores); se buscan como prefijo y todas deben aparecer"""
+    words = re.findall(r"\w+", q or "", re.UNICODE)
+    return [w for w in words if len(w) >= min_len][:SEARCH_MAX_TERMS]
+
+
+def search_statement(dialect, words, filtros):
+    """select(Incidente, score) con los filtros del listado; score mayor = más relevante"""
+    conds = crud.incidente_filters(**filtros)
+    if dialect == "mysql":
+        score = match(*TEXT_COLUMNS, against=" ".join(f"+{w}*" for w in words)).in_boolean_mode()
+        return select(Incidente, score.label("score")).where(score > 0, *conds)
+    # SQLite FTS5: bm25 es menor cuanto más relevante
+    query = " ".join('"' + w.replace('"', "") + '"*' for w in words)
+    fts = table("incidentes_fts", column("rowid"))
+    fts_name = literal_column("incidentes_fts")
+    return (
+        select(Incidente, (-func.bm25(fts_name)).label("score"))
+        .join(fts, fts.c.rowid == Incidente.id)
+        .where(fts_name.op("MATCH")(query), *conds)
+    )
+
+
+def search_incidentes(db, q, page=1, size=25, **filtros):
+    """(total, [(incidente, score)]) de la página pedida, más relevantes primero"""
+    dialect = db.get_bind().dialect.name
+    # en MySQL las palabras cortas no están en el índice y con '+' no devolverían nada
+    words = terms(q, SEARCH_MIN_TOKEN if dialect == "mysql" else 1)
+    if not words:
+        return 0, []
+    ensure_search_index(db.get_bind())
+    stmt = search_statement(dialect, words, filtros)
+    total = db.execute(select(func.count()).select_from(stmt.subquery())).scalar()
+    rows = db.execute(
+        stmt.order_by(literal_column("score").desc(), Incidente.id.desc())
+        .offset((page - 1) * size)
+        .limit(size)
+    ).all()
+    return total, [(inc, float(score)) for inc, score in rows]
@@ -0,0 +1,430 @@
+import time
+import socket
+import uuid
+import threading
+
+from backend_siv.app.services.config import (
+    VIDEO_PATHS, ENGINE_MODE, ENGINE_SOCKET, ENGINE_TIMEOUT_SEC, SNAPSHOT_WAIT_SEC,
+    FAKE_FPS, TARGET_RES, JPEG_QUALITY, LOW_RES, LOW_JPEG_QUALITY, MOSAIC_TILE
+)
+from backend_siv.app.services import ipc
+
+FRAME_WAIT_SEC = 5
+
+
+class EngineError(Exception):
+    pass
+
+
+# ===============================
+# MOTOR EN EL MISMO PROCESO
+# ===============================
+class LocalEngine:
+    """Usa el detector importado en este proceso (un solo worker de uvicorn)"""
+
+    def __init__(self):
+        from backend_siv.app.services import detector  # carga YOLO
+        self.d = detector
+        detector.start_monitored_cameras()
+
+    def cameras(self):
+        return list(VIDEO_PATHS)
+
+    def start(self, cam_id):
+        self.d.start_camera(cam_id)
+
+    def stop(self, cam_id):
+        self.d.stop_camera(cam_id)
+
+    def status(self, cam_id):
+        return self.d.camera_status(cam_id)
+
+    def metrics(self, cam_id):
+        return self.d.get_pipeline_metrics(cam_id)
+
+    def zones(self, cam_id):
+        return self.d.zone_occupancy.get(cam_id, {})
+
+    def wait_frame(self, cam_id, after_seq=0, low=False, timeout=FRAME_WAIT_SEC, viewer_id=None):
+        return self.d.wait_frame(cam_id, after_seq, low, timeout, viewer_id)
+
+    def release_viewer(self, cam_id, viewer_id, low=False, rendition=None):
+        self.d.release_viewer(cam_id, viewer_id, low, rendition)
+
+    def wait_fragments(self, cam_id, after_seq=0, timeout=FRAME_WAIT_SEC, viewer_id=None):
+        try:
+            return self.d.wait_fragments(cam_id, after_seq, timeout, viewer_id)
+        except RuntimeError as e:
+            raise EngineError(str(e))
+
+    def snapshot(self, cam_id, low=False, timeout=SNAPSHOT_WAIT_SEC):
+        return self.d.snapshot(cam_id, low, timeout)
+
+    def snapshots(self, cam_ids, low=False):
+        return self.d.snapshots(cam_ids, low)
+
+    def wait_mosaic(self, cam_ids, cols=None, after_seq=0, timeout=FRAME_WAIT_SEC):
+        return self.d.wait_mosaic(cam_ids, cols, after_seq, timeout)
+
+    def open_events(self, cam_id=None):
+        return self.d.event_bus.open_events(cam_id)
+
+    def wait_events(self, after_seq=0, timeout=FRAME_WAIT_SEC):
+        return self.d.event_bus.wait_events(after_seq, timeout)
+
+    # Análisis por lotes: trabajos y pool de modelos en el proceso del motor
+    def submit_analysis(self, src, filename, camera_id=0, start_time=None):
+        """ValueError si el video no se puede leer"""
+        from backend_siv.app.services import lotes
+        return lotes.job_status(lotes.submit_job(src, filename, camera_id, start_time))
+
+    def analysis_status(self, job_id):
+        from backend_siv.app.services import lotes
+        return lotes.job_status(job_id)
+
+    def analysis_result(self, job_id):
+        from backend_siv.app.services import lotes
+        return lotes.job_result(job_id)
+
+    def analysis_jobs(self):
+        from backend_siv.app.services import lotes
+        return lotes.list_jobs()
+
+
+# ===============================
+# MOTOR EN OTRO PROCESO (SOCKET UNIX)
+# ===============================
+# Comandos de solo lectura (o idempotentes por viewer_id): se pueden repetir si la
+# conexión persistente estaba muerta y se cortó después de enviarlos
+RETRY_SAFE_CMDS = {
+    "cameras", "status", "metrics", "zones", "frame", "snapshot", "snapshots", "fragments",
+    "mosaic", "open_events", "wait_events", "analysis_status", "analysis_result", "analysis_jobs",
+}
+
+
+class RemoteEngine:
+    """
+    Cliente del motor (engine.py). Una conexión persistente por hilo:
+    cada request HTTP corre en un hilo del threadpool y no comparte socket.
+    """
+
+    def __init__(self, path=ENGINE_SOCKET):
+        self.path = path
+        self._local = threading.local()
+
+    def _sock(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = ipc.connect(self.path)
+            self._local.sock = sock
+        return sock
+
+    def _drop(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+        self._local.sock = None
+
+    def call(self, cmd, wait=0, **params):
+        for attempt in (1, 2):
+            sent = False
+            try:
+                sock = self._sock()
+                sock.settimeout(ENGINE_TIMEOUT_SEC + wait)
+                ipc.send_msg(sock, {"cmd": cmd, **params})
+                sent = True
+                header, payload = ipc.recv_msg(sock)
+                break
+            except (OSError, ConnectionError) as e:
+                self._drop()
+                # una vez enviado, reintentar solo lo que no cambia estado: un start,
+                # stop o analysis_submit podría ejecutarse dos veces en el motor
+                retry = not sent or (cmd in RETRY_SAFE_CMDS and not isinstance(e, socket.timeout))
+                if attempt == 2 or not retry:
+                    raise EngineError(f"Motor de detección no disponible: {e}")
+        if not header.get("ok"):
+            raise EngineError(header.get("error", "Error del motor"))
+        return header, payload
+
+    def cameras(self):
+        return self.call("cameras")[0]["result"]
+
+    def start(self, cam_id):
+        self.call("start", cam_id=cam_id)
+
+    def stop(self, cam_id):
+        self.call("stop", cam_id=cam_id)
+
+    def status(self, cam_id):
+        return self.call("status", cam_id=cam_id)[0]["result"]
+
+    def metrics(self, cam_id):
+        return self.call("metrics", cam_id=cam_id)[0]["result"]
+
+    def zones(self, cam_id):
+        return self.call("zones", cam_id=cam_id)[0]["result"]
+
+    def wait_frame(self, cam_id, after_seq=0, low=False, timeout=FRAME_WAIT_SEC, viewer_id=None):
+        header, payload = self.call(
+            "frame", wait=timeout, cam_id=cam_id, after_seq=after_seq, low=low,
+            timeout=timeout, viewer_id=viewer_id
+        )
+        return header["seq"], (payload or None), header.get("captured")
+
+    def release_viewer(self, cam_id, viewer_id, low=False, rendition=None):
+        self.call("release_viewer", cam_id=cam_id, viewer_id=viewer_id, low=low, rendition=rendition)
+
+    def wait_fragments(self, cam_id, after_seq=0, timeout=FRAME_WAIT_SEC, viewer_id=None):
+        header, payload = self.call(
+            "fragments", wait=timeout, cam_id=cam_id, after_seq=after_seq, timeout=timeout, viewer_id=viewer_id
+        )
+        return header["seq"], payload, header.get("mime")
+
+    def snapshot(self, cam_id, low=False, timeout=SNAPSHOT_WAIT_SEC):
+        header, payload = self.call("snapshot", wait=timeout, cam_id=cam_id, low=low, timeout=timeout)
+        return header["seq"], (payload or None), header.get("captured")
+
+    def snapshots(self, cam_ids, low=False):
+        # un solo viaje: las imágenes vienen concatenadas y la cabecera trae los largos
+        header, payload = self.call("snapshots", cam_ids=list(cam_ids), low=low)
+        out, pos = [], 0
+        for cid, seq, captured, size in header["items"]:
+            out.append((cid, seq, payload[pos:pos + size] or None, captured))
+            pos += size
+        return out
+
+    def wait_mosaic(self, cam_ids, cols=None, after_seq=0, timeout=FRAME_WAIT_SEC):
+        header, payload = self.call(
+            "mosaic", wait=timeout, cam_ids=list(cam_ids), cols=cols, after_seq=after_seq, timeout=timeout
+        )
+        return header["seq"], (payload or None), header.get("captured")
+
+    def open_events(self, cam_id=None):
+        return self.call("open_events", cam_id=cam_id)[0]["result"]
+
+    def wait_events(self, after_seq=0, timeout=FRAME_WAIT_SEC):
+        header, _ = self.call("wait_events", wait=timeout, after_seq=after_seq, timeout=timeout)
+        return header["seq"], header["result"]
+
+    def submit_analysis(self, src, filename, camera_id=0, start_time=None):
+        # el video ya está en disco: el motor corre en el mismo host
+        header, _ = self.call(
+            "analysis_submit", src=src, filename=filename, camera_id=camera_id,
+            start_time=start_time.isoformat() if start_time else None
+        )
+        if header.get("invalid"):
+            raise ValueError(header["invalid"])
+        return header["result"]
+
+    def analysis_status(self, job_id):
+        return self.call("analysis_status", job_id=job_id)[0]["result"]
+
+    def analysis_result(self, job_id):
+        return self.call("analysis_result", job_id=job_id)[0]["result"]
+
+    def analysis_jobs(self):
+        return self.call("analysis_jobs")[0]["result"]
+
+
+# ===============================
+# MOTOR SINTÉTICO (PRUEBAS DE CARGA)
+# ===============================
+class FakeEngine:
+    """
+    Mismo contrato que LocalEngine sin YOLO ni videos: cada cámara publica un
+    frame nuevo cada 1/FAKE_FPS (JPEGs pre-codificados, del tamaño real de la
+    salida) y todos sus viewers despiertan en el mismo tick, como con FrameHub.
+    El costo medido es el de la API y el streaming, no el del modelo.
+    """
+
+    def __init__(self, fps=FAKE_FPS):
+        self.fps = fps
+        self._frames = {}
+        self._lock = threading.Lock()
+        self._started = set()
+
+    def _jpegs(self, key, size, quality):
+        with self._lock:
+            if key not in self._frames:
+                import cv2
+                import numpy as np
+                w, h = size
+                rng = np.random.default_rng(len(self._frames))
+                base = rng.integers(0, 255, (h // 8, w // 8, 3), dtype=np.uint8)
+                base = cv2.resize(base, (w, h), interpolation=cv2.INTER_LINEAR)
+                frames = []
+                for i in range(self.fps):
+                    img = base.copy()
+                    x = int(i / self.fps * (w - 120))
+                    cv2.rectangle(img, (x, h // 2 - 40), (x + 120, h // 2 + 40), (0, 0, 255), 2)
+                    cv2.putText(img, f"SIV {key} {i}", (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+                    frames.append(cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes())
+                self._frames[key] = frames
+            return self._frames[key]
+
+    def _tick(self):
+        return int(time.time() * self.fps)
+
+    def _wait_tick(self, after_seq, timeout):
+        deadline = time.time() + timeout
+        tick = self._tick()
+        while tick <= after_seq:
+            left = deadline - time.time()
+            if left <= 0:
+                return None
+            time.sleep(min(left, (after_seq + 1) / self.fps - time.time() + 0.001))
+            tick = self._tick()
+        return tick
+
+    def _frame(self, key, size, quality, tick):
+        frames = self._jpegs(key, size, quality)
+        return frames[tick % len(frames)]
+
+    def cameras(self):
+        return list(VIDEO_PATHS)
+
+    def start(self, cam_id):
+        self._started.add(cam_id)
+
+    def stop(self, cam_id):
+        self._started.discard(cam_id)
+
+    def status(self, cam_id):
+        # varía en el tiempo para que el ETag / caché no oculten trabajo
+        vehiculos = (self._tick() // self.fps + cam_id) % 25
+        return {
+            "status": "online" if cam_id in self._started else "idle",
+            "vehiculos": vehiculos,
+            "nivel": "Alta" if vehiculos > 15 else "Media" if vehiculos > 8 else "Baja",
+            "nivel_color": "#16a34a",
+            "detenidos": 0,
+            "ids_detenidos": [],
+            "personas_en_via": 0,
+            "zonas": {},
+            "accidente_detectado": False,
+            "asistencia_detectada": False,
+            "conos_detectados": False,
+            "alerta_vehiculo": False,
+        }
+
+    def metrics(self, cam_id):
+        return {"fake": True, "fps": self.fps}
+
+    def zones(self, cam_id):
+        return {}
+
+    def wait_frame(self, cam_id, after_seq=0, low=False, timeout=FRAME_WAIT_SEC, viewer_id=None):
+        tick = self._wait_tick(after_seq, timeout)
+        if tick is None:
+            return after_seq, None, None
+        size, quality = (LOW_RES, LOW_JPEG_QUALITY) if low else (TARGET_RES, JPEG_QUALITY)
+        return tick, self._frame((cam_id, low), size, quality, tick), tick / self.fps
+
+    def release_viewer(self, cam_id, viewer_id, low=False, rendition=None):
+        pass
+
+    def wait_fragments(self, cam_id, after_seq=0, timeout=FRAME_WAIT_SEC, viewer_id=None):
+        raise EngineError("fMP4 no disponible en el motor sintético")
+
+    def snapshot(self, cam_id, low=False, timeout=SNAPSHOT_WAIT_SEC):
+        return self.wait_frame(cam_id, self._tick() - 1, low, timeout)
+
+    def snapshots(self, cam_ids, low=False):
+        return [(cid, *self.snapshot(cid, low)) for cid in cam_ids]
+
+    def wait_mosaic(self, cam_ids, cols=None, after_seq=0, timeout=FRAME_WAIT_SEC):
+        tick = self._wait_tick(after_seq, timeout)
+        if tick is None:
+            return after_seq, None, None
+        cols = cols or min(len(cam_ids), 4)
+        rows = -(-len(cam_ids) // cols)
+        size = (MOSAIC_TILE[0] * cols, MOSAIC_TILE[1] * rows)
+        return tick, self._frame(("mosaico", cols, rows), size, JPEG_QUALITY, tick), tick / self.fps
+
+    def open_events(self, cam_id=None):
+        return []
+
+    def wait_events(self, after_seq=0, timeout=FRAME_WAIT_SEC):
+        time.sleep(timeout)
+        return after_seq, []
+
+    def submit_analysis(self, src, filename, camera_id=0, start_time=None):
+        raise EngineError("Análisis no disponible en el motor sintético")
+
+    def analysis_status(self, job_id):
+        return None
+
+    def analysis_result(self, job_id):
+        return None
+
+    def analysis_jobs(self):
+        return []
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            if ENGINE_MODE == "remote":
+                _engine = RemoteEngine()
+            elif ENGINE_MODE == "fake":
+                _engine = FakeEngine()
+            else:
+                _engine = LocalEngine()
+        return _engine
+
+
+# ===============================
+# STREAM MJPEG
+# ===============================
+def generate_frames(cam_id, low=False):
+    """
+    low = True  -> mini video (baja calidad / rápido)
+    low = False -> fullscreen (calidad normal)
+    """
+    engine = get_engine()
+    viewer_id = uuid.uuid4().hex  # lease del viewer: la cámara se anota y codifica mientras exista
+    seq = 0
+    try:
+        while True:
+            seq, data, captured = engine.wait_frame(cam_id, seq, low, viewer_id=viewer_id)
+            if data is None:
+                continue
+            # X-Frame-Captured: epoch de captura, para medir la edad del frame en el navegador
+            yield (
+                b"--frame\r\n"
+                b"Content-Type: image/jpeg\r\n"
+                b"X-Frame-Captured: " + f"{captured:.3f}".encode() + b"\r\n\r\n" +
+                data +
+                b"\r\n"
+            )
+    finally:
+        # si el cliente se fue sin cerrar el generador, el lease vence solo
+        try:
+            engine.release_viewer(cam_id, viewer_id, low)
+        except EngineError:
+            pass
+
+
+def generate_mosaic(cam_ids, cols=None):
+    """Stream MJPEG de un mosaico: una conexión para toda la grilla"""
+    engine = get_engine()
+    seq = 0
+    while True:
+        seq, data, captured = engine.wait_mosaic(cam_ids, cols, seq)
+        if data is None:
+            continue
+        yield (
+            b"--frame\r\n"
+            b"Content-Type: image/jpeg\r\n"
+            b"X-Frame-Captured: " + f"{captured:.3f}".encode() + b"\r\n\r\n" +
+            data +
+            b"\r\n"
+        )
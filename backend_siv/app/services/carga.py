@@ -0,0 +1,387 @@
+import os
+import json
+import time
+import shutil
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+import http.client
+from datetime import datetime
+
+# Prueba de carga de la API y los streams contra la app en este mismo proceso,
+# con SQLite y el motor sintético (SIV_ENGINE_MODE=fake):
+#
+#   cd backend_siv   (igual que uvicorn app.main:app; los servicios se importan como backend_siv.*)
+#   PYTHONPATH=.. python -m app.services.carga --duration 30 --incidentes 16 --stream 8 --out carga.json
+#   PYTHONPATH=.. python -m app.services.carga --compare carga_antes.json carga.json
+#
+# Los clientes comparten el GIL con el servidor: los números sirven para comparar
+# versiones con el mismo escenario, no como capacidad absoluta de producción.
+
+LOGIN_USER = "carga"
+LOGIN_PASSWORD = "carga-siv"
+STREAM_READ = 64 * 1024
+FRAME_MARK = b"--frame\r\n"
+RETRY_MIN_SEC = 0.2   # espera antes de reconectar un stream caído (se duplica hasta RETRY_MAX_SEC)
+RETRY_MAX_SEC = 5.0
+
+
+# ===============================
+# REGISTRO DE MEDICIONES
+# ===============================
+class Recorder:
+    """Latencias / errores por endpoint y bytes / frames por stream (solo después del warmup)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.measuring = False
+        self.started = None
+        self.requests = {}    # nombre -> {"lat": [], "errores": 0, "codigos": {}, "bytes": 0}
+        self.streams = {}     # nombre -> [{"bytes", "frames", "primer_frame_ms", "errores"}]
+
+    def begin(self):
+        with self.lock:
+            self.measuring = True
+            self.started = time.perf_counter()
+
+    def add(self, name, elapsed, code, size):
+        if not self.measuring:
+            return
+        with self.lock:
+            st = self.requests.setdefault(name, {"lat": [], "errores": 0, "codigos": {}, "bytes": 0})
+            st["lat"].append(elapsed)
+            st["codigos"][str(code)] = st["codigos"].get(str(code), 0) + 1
+            st["bytes"] += size
+            if not isinstance(code, int) or code >= 400:
+                st["errores"] += 1
+
+    def stream(self, name):
+        st = {"bytes": 0, "frames": 0, "primer_frame_ms": None, "errores": 0}
+        with self.lock:
+            self.streams.setdefault(name, []).append(st)
+        return st
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+# ===============================
+# CLIENTES
+# ===============================
+def _conn(port):
+    return http.client.HTTPConnection("127.0.0.1", port, timeout=15)
+
+
+def http_worker(name, port, next_request, stop, rec):
+    """Repite next_request() con una conexión keep-alive hasta stop"""
+    conn = _conn(port)
+    state = {}
+    while not stop.is_set():
+        method, path, body, headers = next_request(state)
+        t0 = time.perf_counter()
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            resp = conn.getresponse()
+            data = resp.read()
+            code = resp.status
+            state["etag"] = resp.getheader("ETag")
+        except (OSError, http.client.HTTPException) as e:
+            conn.close()
+            conn = _conn(port)
+            data, code = b"", type(e).__name__
+        rec.add(name, time.perf_counter() - t0, code, len(data))
+    conn.close()
+
+
+def stream_worker(name, port, path, stop, rec):
+    """Un viewer MJPEG: lee el stream hasta stop contando bytes y frames"""
+    st = rec.stream(name)
+    backoff = RETRY_MIN_SEC
+    while not stop.is_set():
+        conn = _conn(port)
+        t0 = time.perf_counter()
+        try:
+            conn.request("GET", path)
+            resp = conn.getresponse()
+            if resp.status != 200:
+                resp.read()
+                raise ConnectionError(f"HTTP {resp.status}")
+            backoff = RETRY_MIN_SEC
+            tail = b""
+            while not stop.is_set():
+                chunk = resp.read1(STREAM_READ)
+                if not chunk:
+                    raise ConnectionError("stream cerrado por el servidor")
+                # la marca puede quedar partida entre dos lecturas
+                frames = (tail + chunk).count(FRAME_MARK)
+                tail = chunk[-len(FRAME_MARK) + 1:]
+                if frames and st["primer_frame_ms"] is None:
+                    st["primer_frame_ms"] = (time.perf_counter() - t0) * 1000
+                if rec.measuring:
+                    st["bytes"] += len(chunk)
+                    st["frames"] += frames
+        except (OSError, http.client.HTTPException, ConnectionError):
+            st["errores"] += 1
+            # servidor caído o rechazando: no reconectar en bucle
+            stop.wait(backoff)
+            backoff = min(backoff * 2, RETRY_MAX_SEC)
+        finally:
+            conn.close()
+
+
+# ===============================
+# APP EN PROCESO
+# ===============================
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def seed(rows):
+    """Base SQLite con un usuario admin y rows incidentes"""
+    from sqlalchemy import insert
+    from app import models, utils
+    from app.database import engine, SessionLocal
+
+    models.Base.metadata.create_all(engine)
+    with SessionLocal() as db:
+        if not db.query(models.User).filter(models.User.username == LOGIN_USER).first():
+            role = db.query(models.Role).filter(models.Role.name == "admin").first()
+            if not role:
+                role = models.Role(name="admin", permissions=[])
+                db.add(role)
+                db.flush()
+            db.add(models.User(username=LOGIN_USER, name="Prueba de carga", email="carga@siv.cl",
+                               password=utils.hash_password(LOGIN_PASSWORD), role_id=role.id))
+            db.commit()
+        user = db.query(models.User).filter(models.User.username == LOGIN_USER).first()
+        missing = rows - db.query(models.Incidente).count()
+        if missing > 0:
+            now = datetime.utcnow()
+            db.execute(insert(models.Incidente), [
+                dict(type="cono", priority=("Alta", "Media", "Baja")[i % 3], camera=str(i % 4 + 1),
+                     sector="N", status="Activo", observacion=f"Incidente de carga {i}",
+                     pista=[1], trabajos_via=[], created_by_id=user.id, created_at=now, updated_at=now)
+                for i in range(missing)
+            ])
+            db.commit()
+
+
+def serve(port):
+    import uvicorn
+    from app.main import app
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("El servidor no pudo iniciar")
+        time.sleep(0.05)
+    return server, thread
+
+
+def login(port):
+    conn = _conn(port)
+    conn.request("POST", "/api/auth/login", body=json.dumps({"username": LOGIN_USER, "password": LOGIN_PASSWORD}),
+                 headers={"Content-Type": "application/json"})
+    resp = conn.getresponse()
+    data = json.loads(resp.read())
+    conn.close()
+    if resp.status != 200:
+        raise RuntimeError(f"Login falló: {data}")
+    return data["access_token"]
+
+
+# ===============================
+# ESCENARIO
+# ===============================
+def run(args):
+    # base SQLite propia y temporal, aunque el entorno apunte a la de producción:
+    # seed() crea un admin con clave conocida e inserta incidentes falsos
+    tmp_dir = tempfile.mkdtemp(prefix="siv_carga_")
+    db_url = f"sqlite:///{os.path.join(tmp_dir, 'carga.db')}"
+    # antes de importar la app: config y database leen el entorno al importarse
+    os.environ.setdefault("SIV_ENGINE_MODE", "fake")
+    os.environ.setdefault("SIV_FAKE_CAMS", str(args.cams))
+    os.environ["SIV_DATABASE_URL"] = db_url
+    try:
+        return _run(args, db_url)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def _run(args, db_url):
+    from app.database import engine
+    if str(engine.url) != db_url:
+        raise RuntimeError(f"app.database ya estaba importado con {engine.url}: la carga necesita su propia base")
+
+    seed(args.rows)
+    port = free_port()
+    server, thread = serve(port)
+    token = login(port)
+    auth = {"Authorization": f"Bearer {token}"}
+    cams = list(range(1, args.cams + 1))
+
+    def req_login(state):
+        body = json.dumps({"username": LOGIN_USER, "password": LOGIN_PASSWORD})
+        return "POST", "/api/auth/login", body, {"Content-Type": "application/json"}
+
+    def req_incidentes(state):
+        headers = dict(auth)
+        if args.conditional and state.get("etag"):
+            headers["If-None-Match"] = state["etag"]
+        return "GET", "/api/incidentes/", None, headers
+
+    def req_status(state):
+        state["i"] = state.get("i", -1) + 1
+        return "GET", f"/api/camera/{cams[state['i'] % len(cams)]}/status_full", None, {}
+
+    rec = Recorder()
+    stop = threading.Event()
+    workers = []
+    for name, fn, count in (("login", req_login, args.login),
+                            ("incidentes", req_incidentes, args.incidentes),
+                            ("status_full", req_status, args.status)):
+        for _ in range(count):
+            workers.append(threading.Thread(target=http_worker, args=(name, port, fn, stop, rec), daemon=True))
+    for name, path, count in (("stream", "/api/cam/{}/stream", args.stream),
+                              ("stream_low", "/api/cam/{}/stream_low", args.stream_low)):
+        for i in range(count):
+            workers.append(threading.Thread(
+                target=stream_worker, args=(name, port, path.format(cams[i % len(cams)]), stop, rec), daemon=True
+            ))
+
+    print(f"🚦 Carga: {len(workers)} clientes por {args.duration}s (+{args.warmup}s de warmup) en :{port}")
+    for w in workers:
+        w.start()
+    time.sleep(args.warmup)
+    rec.begin()
+    time.sleep(args.duration)
+    elapsed = time.perf_counter() - rec.started
+    rec.measuring = False
+    stop.set()
+    for w in workers:
+        w.join(timeout=20)
+    server.should_exit = True
+    thread.join(timeout=10)
+    return report(rec, elapsed, args)
+
+
+def report(rec, elapsed, args):
+    endpoints = {}
+    for name, st in sorted(rec.requests.items()):
+        lat = [v * 1000 for v in st["lat"]]
+        total = len(lat)
+        endpoints[name] = {
+            "requests": total,
+            "rps": round(total / elapsed, 1),
+            "errores": st["errores"],
+            "tasa_error": round(st["errores"] / total, 4) if total else None,
+            "codigos": st["codigos"],
+            "p50_ms": round(percentile(lat, 50), 2) if lat else None,
+            "p90_ms": round(percentile(lat, 90), 2) if lat else None,
+            "p99_ms": round(percentile(lat, 99), 2) if lat else None,
+            "max_ms": round(max(lat), 2) if lat else None,
+            "bytes_s": round(st["bytes"] / elapsed),
+        }
+
+    streams = {}
+    for name, items in sorted(rec.streams.items()):
+        rates = [s["bytes"] / elapsed for s in items]
+        fps = [s["frames"] / elapsed for s in items]
+        first = [s["primer_frame_ms"] for s in items if s["primer_frame_ms"] is not None]
+        streams[name] = {
+            "viewers": len(items),
+            "errores": sum(s["errores"] for s in items),
+            "bytes_s_por_stream": round(sum(rates) / len(rates)) if rates else 0,
+            "bytes_s_min": round(min(rates)) if rates else 0,
+            "bytes_s_total": round(sum(rates)),
+            "fps_por_stream": round(sum(fps) / len(fps), 2) if fps else 0,
+            "fps_min": round(min(fps), 2) if fps else 0,
+            "primer_frame_p50_ms": round(percentile(first, 50), 1) if first else None,
+            "primer_frame_max_ms": round(max(first), 1) if first else None,
+        }
+
+    try:
+        version = subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True,
+                                 text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        version = None
+    return {
+        "version": version,
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "escenario": vars(args),
+        "duracion_s": round(elapsed, 2),
+        "endpoints": endpoints,
+        "streams": streams,
+    }
+
+
+# ===============================
+# COMPARACIÓN ENTRE VERSIONES
+# ===============================
+COMPARE_KEYS = {
+    "endpoints": ("rps", "p50_ms", "p99_ms", "tasa_error"),
+    "streams": ("fps_por_stream", "bytes_s_por_stream", "primer_frame_p50_ms", "errores"),
+}
+
+
+def compare(before, after):
+    """Cambios (%) de las métricas principales entre dos reportes"""
+    out = {}
+    for section, keys in COMPARE_KEYS.items():
+        for name, new in after.get(section, {}).items():
+            old = before.get(section, {}).get(name, {})
+            for key in keys:
+                a, b = old.get(key), new.get(key)
+                if a is None or b is None:
+                    continue
+                change = round((b - a) / a * 100, 1) if a else None
+                out[f"{section}.{name}.{key}"] = {"antes": a, "despues": b, "cambio_pct": change}
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prueba de carga SIV (app en proceso, SQLite, motor sintético)")
+    parser.add_argument("--duration", type=float, default=20, help="segundos medidos")
+    parser.add_argument("--warmup", type=float, default=3, help="segundos sin medir al inicio")
+    parser.add_argument("--login", type=int, default=1, help="clientes haciendo login en bucle")
+    parser.add_argument("--incidentes", type=int, default=8, help="clientes sondeando /api/incidentes/")
+    parser.add_argument("--status", type=int, default=8, help="clientes sondeando status_full")
+    parser.add_argument("--stream", type=int, default=4, help="viewers MJPEG fullscreen")
+    parser.add_argument("--stream-low", type=int, default=4, help="viewers MJPEG mini")
+    parser.add_argument("--cams", type=int, default=4, help="cámaras sintéticas")
+    parser.add_argument("--rows", type=int, default=2000, help="incidentes en la base")
+    parser.add_argument("--conditional", action="store_true", help="los sondeos envían If-None-Match")
+    parser.add_argument("--out", help="archivo JSON del reporte (si no, stdout)")
+    parser.add_argument("--compare", nargs=2, metavar=("ANTES", "DESPUES"), help="compara dos reportes y sale")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        reports = []
+        for path in args.compare:
+            with open(path) as f:
+                reports.append(json.load(f))
+        print(json.dumps(compare(*reports), indent=2, ensure_ascii=False))
+        return
+
+    result = run(args)
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+        print(f"📄 Reporte en {args.out}")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
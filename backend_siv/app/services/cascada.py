@@ -0,0 +1,77 @@
+from backend_siv.app.services.config import (
+    CASCADE_FAST_FPS, CASCADE_FULL_FPS, CASCADE_ESCALATED_FPS,
+    CASCADE_UNCERTAIN_CONF, CASCADE_TRIGGER_CLASSES, TRACK_LOW_THRESH
+)
+
+STAGES = ("full", "fast", "coast")
+
+
+def _period(fps):
+    return 1.0 / fps if fps and fps > 0 else 0.0
+
+
+# ===============================
+# PLANIFICADOR DE LA CASCADA (UNO POR CÁMARA)
+# ===============================
+class CascadeScheduler:
+    """
+    Decide qué etapa corre en cada frame:
+      full  → modelo completo (periódico o escalado por un disparador)
+      fast  → modelo rápido
+      coast → sin modelo; el tracker extrapola las cajas
+    """
+
+    def __init__(self, fast_fps=CASCADE_FAST_FPS, full_fps=CASCADE_FULL_FPS,
+                 escalated_fps=CASCADE_ESCALATED_FPS, uncertain_conf=CASCADE_UNCERTAIN_CONF,
+                 trigger_classes=CASCADE_TRIGGER_CLASSES):
+        self.fast_period = _period(fast_fps)
+        self.full_period = _period(full_fps)
+        self.escalated_period = _period(escalated_fps)
+        self.uncertain_conf = uncertain_conf
+        self.trigger_classes = set(trigger_classes)
+        self.last_fast = float("-inf")
+        self.last_full = float("-inf")
+        self.counts = {stage: 0 for stage in STAGES}
+        self.escalations = 0
+        self.last_reason = None
+
+    def plan(self, now):
+        if now - self.last_full >= self.full_period:
+            return "full"
+        if now - self.last_fast >= self.fast_period:
+            return "fast"
+        return "coast"
+
+    def trigger(self, confs, class_names, stopped=0):
+        """Motivo para pasar el frame al modelo completo, o None"""
+        if stopped:
+            return "detenido"
+        hit = self.trigger_classes.intersection(class_names)
+        if hit:
+            return sorted(hit)[0]
+        if any(TRACK_LOW_THRESH <= c < self.uncertain_conf for c in confs):
+            return "confianza_baja"
+        return None
+
+    def escalate(self, now, confs, class_names, stopped=0):
+        """True si el resultado rápido debe reemplazarse por el modelo completo"""
+        reason = self.trigger(confs, class_names, stopped)
+        if reason is None or now - self.last_full < self.escalated_period:
+            return False
+        self.escalations += 1
+        self.last_reason = reason
+        return True
+
+    def ran(self, stage, now):
+        self.counts[stage] += 1
+        if stage == "full":
+            self.last_full = self.last_fast = now
+        elif stage == "fast":
+            self.last_fast = now
+
+    def stats(self):
+        return {
+            "frames_por_etapa": dict(self.counts),
+            "escalados": self.escalations,
+            "ultimo_motivo": self.last_reason,
+        }
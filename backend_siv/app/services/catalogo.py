@@ -0,0 +1,112 @@
+import os
+import time
+import queue
+import threading
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from app import models
+from app.database import SessionLocal
+from backend_siv.app.services.config import CATALOG_BATCH_SIZE, CATALOG_FLUSH_SEC, HLS_AUTO_MIN_SEC
+from backend_siv.app.services.media import probe_video, make_thumbnail, make_preview, faststart, make_hls
+
+# ===============================
+# COLA DE CLIPS PENDIENTES
+# ===============================
+# El detector solo encola; miniaturas, preview e INSERT se hacen en este hilo
+catalog_queue = queue.Queue()
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def register_clip(cam_id, path, event_type, start_time, end_time, incidente_id=None):
+    """Encola un clip recién cerrado para registrarlo en la tabla videos"""
+    _ensure_worker()
+    catalog_queue.put({
+        "camera_id": cam_id,
+        "path": path,
+        "event_type": event_type,
+        "start_time": start_time,
+        "end_time": end_time,
+        "incidente_id": incidente_id,
+    })
+
+
+def _ensure_worker():
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_catalog_loop, daemon=True)
+            _worker.start()
+
+
+# ===============================
+# CONSTRUCCIÓN DE LA FILA
+# ===============================
+def build_row(item):
+    path = item["path"]
+    folder, filename = os.path.split(path)
+    faststart(path)
+    _, _, duration, _ = probe_video(path)
+    start, end = item["start_time"], item["end_time"]
+    if not duration and start and end:
+        duration = (end - start).total_seconds()
+    if HLS_AUTO_MIN_SEC and duration >= HLS_AUTO_MIN_SEC:
+        make_hls(path)
+
+    return {
+        "camera_id": item["camera_id"],
+        "filename": filename,
+        "folder": os.path.basename(folder),
+        "event_type": item["event_type"],
+        "upload_time": end or datetime.utcnow(),
+        "start_time": start,
+        "end_time": end,
+        "duration_sec": duration,
+        "size_bytes": os.path.getsize(path),
+        "incidente_id": item.get("incidente_id"),
+        "thumbnail": make_thumbnail(path),
+        "preview": make_preview(path),
+    }
+
+
+# ===============================
+# HILO DEL CATÁLOGO
+# ===============================
+def _catalog_loop():
+    pending = []
+    deadline = None
+
+    while True:
+        timeout = None if deadline is None else max(deadline - time.time(), 0)
+        try:
+            item = catalog_queue.get(timeout=timeout)
+            if not os.path.exists(item["path"]):
+                print(f"⚠️ Catálogo: no existe {item['path']}")
+                continue
+            pending.append(build_row(item))
+            if deadline is None:
+                deadline = time.time() + CATALOG_FLUSH_SEC
+        except queue.Empty:
+            pass
+        except Exception as e:
+            print(f"⚠️ Catálogo: error procesando clip → {e}")
+
+        if pending and (len(pending) >= CATALOG_BATCH_SIZE or time.time() >= deadline):
+            _flush(pending)
+            pending = []
+            deadline = None
+
+
+def _flush(rows):
+    db = SessionLocal()
+    try:
+        db.execute(insert(models.Video), rows)
+        db.commit()
+        print(f"🗂️ Catálogo: {len(rows)} clip(s) registrados")
+    except Exception as e:
+        db.rollback()
+        print(f"⚠️ Catálogo: no se pudo registrar {len(rows)} clip(s) → {e}")
+    finally:
+        db.close()
@@ -0,0 +1,93 @@
+import os
+import time
+import zlib
+import queue
+import pickle
+import struct
+import threading
+
+from backend_siv.app.services.config import CHECKPOINT_DIR, CHECKPOINT_MAX_AGE_SEC
+
+MAGIC = b"SIVC"
+VERSION = 2  # 2: contadores de conos/asistencia -> estado de AlertEngine
+_HEADER = struct.Struct(">4sHd")  # magic, versión, guardado (epoch)
+
+
+# ===============================
+# CHECKPOINT EN DISCO (BINARIO COMPACTO)
+# ===============================
+def checkpoint_path(cam_id):
+    return os.path.join(CHECKPOINT_DIR, f"cam{cam_id}.ckpt")
+
+
+def save_checkpoint(cam_id, state, now=None):
+    """Escribe el estado (solo tipos básicos) comprimido y de forma atómica"""
+    now = now or time.time()
+    body = zlib.compress(pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL), 3)
+    path = checkpoint_path(cam_id)
+    tmp = path + ".tmp"
+    os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, now))
+        f.write(body)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)  # un lector nunca ve un checkpoint a medio escribir
+
+
+def load_checkpoint(cam_id, max_age=CHECKPOINT_MAX_AGE_SEC, now=None):
+    """(guardado, estado) si hay un checkpoint válido y reciente; None si no"""
+    path = checkpoint_path(cam_id)
+    try:
+        with open(path, "rb") as f:
+            raw = f.read()
+        magic, version, saved_at = _HEADER.unpack_from(raw)
+        if magic != MAGIC or version != VERSION:
+            print(f"⚠️ Checkpoint cámara {cam_id} con formato desconocido, se ignora")
+            return None
+        now = now or time.time()
+        if now - saved_at > max_age:
+            return None
+        return saved_at, pickle.loads(zlib.decompress(raw[_HEADER.size:]))
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"⚠️ Checkpoint cámara {cam_id} ilegible → {e}")
+        return None
+
+
+# ===============================
+# ESCRITOR EN SEGUNDO PLANO
+# ===============================
+class CheckpointWriter:
+    """
+    El hilo de inferencia solo copia su estado y lo encola; la serialización
+    y el fsync corren en este hilo. Por cámara se guarda solo el último.
+    """
+
+    def __init__(self):
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._wake = queue.Queue()
+        self.written = 0
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def submit(self, cam_id, state):
+        with self._lock:
+            self._pending[cam_id] = (time.time(), state)
+        self._wake.put(cam_id)
+
+    def _loop(self):
+        while True:
+            cam_id = self._wake.get()
+            with self._lock:
+                item = self._pending.pop(cam_id, None)
+            if item is None:
+                continue  # ya se escribió uno más nuevo
+            saved_at, state = item
+            try:
+                save_checkpoint(cam_id, state, saved_at)
+                self.written += 1
+            except OSError as e:
+                print(f"⚠️ No se pudo guardar checkpoint cámara {cam_id} → {e}")
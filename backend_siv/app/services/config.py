@@ -1,4 +1,5 @@
 import os
+import shutil
 
 # =========================================================
 # RUTAS BASE
@@ -21,11 +22,25 @@ VIDEO_PATHS = {
 
 
 }
+INCIDENT_DIR = os.path.join(VIDEO_DIR, "incidentes")
+GENERATED_DIR = os.path.join(VIDEO_DIR, "generado")
+ANALYSIS_DIR = os.path.join(VIDEO_DIR, "analisis")
+RECORDINGS_DIR = os.path.join(os.path.dirname(APP_DIR), "videos", "grabaciones")
+
+# Carpetas que se pueden entregar por /api/videos (nombre -> ruta)
+VIDEO_FOLDERS = {
+    "grabaciones": RECORDINGS_DIR,
+    "incidentes": INCIDENT_DIR,
+    "generado": GENERATED_DIR,
+    "analisis": ANALYSIS_DIR,
+}
+# Las que se entregan sin token (grabaciones de cámaras); "analisis" son videos
+# subidos por los operadores y requiere sesión
+PUBLIC_VIDEO_FOLDERS = ("grabaciones", "incidentes", "generado")
 
 # =========================================================
 # PARÁMETROS GENERALES
 # =========================================================
-TRACKER_CONFIG = "bytetrack.yaml"
 TARGET_RES = (854, 480)
 JPEG_QUALITY = 90
 MIN_CONFIDENCE = 0.35
@@ -63,7 +78,6 @@ DEFAULT_COLOR = (200, 200, 200)
 # ===============================
 TARGET_RES = (1280, 720)
 JPEG_QUALITY = 80
-TRACKER_CONFIG = "bytetrack.yaml"
 
 # ===============================
 # TRACKING
@@ -77,5 +91,225 @@ STOP_DISTANCE_THRESHOLD = 10
 STOP_CONFIRM_FRAMES = 8
 MOVE_CONFIRM_FRAMES = 5
 
+# Tracker propio por cámara (tracker.py): umbrales de confianza e IoU estilo ByteTrack
+TRACK_HIGH_THRESH = 0.5     # detecciones de primera asociación
+TRACK_LOW_THRESH = 0.1      # bajo esto se descarta la detección
+TRACK_NEW_THRESH = 0.6      # mínimo para abrir un track nuevo
+TRACK_MATCH_IOU = 0.2       # IoU mínimo en la primera asociación
+TRACK_LOW_MATCH_IOU = 0.5   # IoU mínimo con detecciones de confianza baja
+TRACK_BUFFER = 30           # frames que un track perdido espera antes de borrarse
+
 TIMEOUT_SEC = 5
-#/Users/limberalcedo/Desktop/Proyecto/SIV_proyecto/backend_siv/app/core/config.py
\ No newline at end of file
+
+# ===============================
+# CATÁLOGO DE CLIPS
+# ===============================
+CATALOG_BATCH_SIZE = 20        # filas por INSERT masivo
+CATALOG_FLUSH_SEC = 2.0        # máximo tiempo que una fila espera en cola
+THUMB_DIRNAME = "thumbs"       # subcarpeta de miniaturas (poster .jpg)
+PREVIEW_DIRNAME = "previews"   # subcarpeta de previews de baja resolución
+THUMB_WIDTH = 320
+PREVIEW_RES = (320, 180)
+PREVIEW_MAX_SEC = 6            # duración máxima del preview
+PREVIEW_FPS = 10
+
+# ===============================
+# ENTREGA DE VIDEO (RANGE / HLS)
+# ===============================
+FFMPEG_BIN = os.getenv("SIV_FFMPEG", shutil.which("ffmpeg"))  # None = sin remux
+STREAM_CHUNK_SIZE = 256 * 1024
+HLS_DIRNAME = "hls"
+HLS_SEGMENT_SEC = 6
+HLS_AUTO_MIN_SEC = 600          # clips más largos se segmentan al catalogarlos (0 = nunca)
+
+# ===============================
+# GRABACIÓN CONTINUA SEGMENTADA
+# ===============================
+SEGMENT_SEC = 300               # duración de cada segmento
+SEGMENT_QUEUE_SIZE = 60         # frames en espera del hilo escritor
+# etiquetas y estelas en la grabación continua (cada frame se anota aunque nadie mire);
+# "0" = grabación limpia y solo se anota para viewers (las etiquetas quedan en el sidecar)
+SEGMENT_ANNOTATED = os.getenv("SIV_RECORD_ANNOTATED", "1") == "1"
+RETENTION_INTERVAL_SEC = 300
+RETENTION_MAX_AGE_HOURS = 72
+RETENTION_MAX_BYTES = 20 * 1024**3   # cuota por cámara
+RETENTION_OVERRIDES = {
+    # cam_id: {"max_age_hours": 24, "max_bytes": 5 * 1024**3},
+}
+
+# ===============================
+# ETAPA DE SALIDA (JPEG + GRABACIÓN)
+# ===============================
+OUTPUT_QUEUE_SIZE = 2
+OUTPUT_DROP_POLICY = "drop_oldest"   # "drop_oldest" | "drop_newest" | "block"
+
+# ===============================
+# LATENCIA POR FRAME
+# ===============================
+FRAME_MAX_AGE_SEC = 0.5         # frames capturados hace más que esto no se infieren
+FRAME_QUEUE_MAX = 30            # tope de seguridad de la cola de captura
+OUTPUT_MAX_AGE_SEC = 1.0        # frames más viejos se graban pero no se codifican a JPEG
+LATENCY_WINDOW = 600            # muestras por etapa para los percentiles
+
+# ===============================
+# EVENTOS DEL DETECTOR -> INCIDENTES
+# ===============================
+EVENT_MERGE_SEC = 30            # un evento se fusiona con el abierto si llega antes de este silencio
+EVENT_FLUSH_SEC = 0.5           # cada cuánto el consumidor inserta los borradores
+EVENT_BATCH_SIZE = 50
+EVENT_DRAFT_STATUS = "Borrador"
+EVENT_TYPES = {
+    # tipo de evento: (type del incidente, prioridad)
+    "vehiculo_detenido": ("Vehículo detenido", "Alta"),
+    "peaton_en_via": ("Peatón en vía", "Alta"),
+    "conos": ("Conos en vía", "Media"),
+    "asistencia": ("Asistencia en vía", "Baja"),
+}
+
+# ===============================
+# ZONAS POR CÁMARA
+# ===============================
+# Polígonos en coordenadas normalizadas (0..1) sobre el frame original.
+# Si dos zonas se solapan gana la que aparece después.
+CAMERA_ZONES = {
+    1: {
+        "vereda": [(0.0, 0.45), (1.0, 0.45), (1.0, 0.55), (0.0, 0.55)],
+        "berma": [(0.0, 0.55), (1.0, 0.55), (1.0, 0.62), (0.0, 0.62)],
+        "carril": [(0.0, 0.62), (1.0, 0.62), (1.0, 1.0), (0.0, 1.0)],
+    },
+}
+# Cámaras sin zonas configuradas: mitad inferior = carril (comportamiento anterior)
+DEFAULT_ZONES = {"carril": [(0.0, 0.5), (1.0, 0.5), (1.0, 1.0), (0.0, 1.0)]}
+ROAD_ZONES = {"carril", "berma"}  # zonas donde un peatón genera alerta
+ZONE_GRID_CELL = 4                # px por celda de la grilla rasterizada
+
+# ===============================
+# MOTOR DE DETECCIÓN (PROCESO SEPARADO)
+# ===============================
+# local  -> cada worker de uvicorn corre el detector en su propio proceso (1 worker)
+# remote -> el motor corre aparte (python -m backend_siv.app.services.engine)
+#           y los workers HTTP le consultan por un socket Unix
+# fake   -> cámaras sintéticas sin YOLO ni videos (pruebas de carga: services/carga.py)
+ENGINE_MODE = os.getenv("SIV_ENGINE_MODE", "local")
+ENGINE_SOCKET = os.getenv("SIV_ENGINE_SOCKET", "/tmp/siv_engine.sock")
+ENGINE_TIMEOUT_SEC = 10
+
+FAKE_CAMS = int(os.getenv("SIV_FAKE_CAMS", "4"))
+FAKE_FPS = 15                   # frames por segundo de cada cámara sintética
+if ENGINE_MODE == "fake":
+    VIDEO_PATHS = {cid: f"fake://{cid}" for cid in range(1, FAKE_CAMS + 1)}
+
+# ===============================
+# VIEWERS Y CICLO DE VIDA DE CÁMARAS
+# ===============================
+ALWAYS_MONITORED = set()        # cámaras con detección aunque nadie las mire (se inician solas)
+IDLE_GRACE_SEC = 60             # sin viewers por este tiempo -> la cámara se apaga
+VIEWER_LEASE_SEC = 15           # un viewer que no pide frames en este tiempo se da por ido
+LOW_RES = (640, 360)            # rendición "low" (stream_low)
+LOW_JPEG_QUALITY = 45
+SNAPSHOT_INTERVAL_SEC = 2       # con solo snapshots se codifica un frame cada este tiempo
+SNAPSHOT_MAX_AGE_SEC = 10       # un snapshot más viejo espera al próximo frame
+SNAPSHOT_WAIT_SEC = 3
+MOSAIC_TILE = (480, 270)        # tamaño de cada cámara en /cams/mosaic
+MOSAIC_FPS = 5                  # ticks por segundo del mosaico (una codificación por tick)
+MOSAIC_IDLE_SEC = 30            # un layout sin viewers por este tiempo se descarta
+MOSAIC_MAX_CAMS = 16
+
+# Stream H.264 en MP4 fragmentado por WebSocket (requiere PyAV; sin él solo MJPEG)
+FMP4_CODEC = "libx264"
+FMP4_PRESET = "ultrafast"
+FMP4_BITRATE = 1_500_000        # bits/s por cámara, compartido por todos sus viewers
+FMP4_GOP_SEC = 2                # keyframe cada este tiempo (arranque de viewers nuevos)
+FMP4_BUFFER_FRAGMENTS = 300     # fragmentos guardados para viewers atrasados
+
+# Niveles de congestión (status_full)
+VEHICLE_MEDIUM = 13
+VEHICLE_HIGH = 18
+
+# ===============================
+# ANÁLISIS POR LOTES (VIDEOS SUBIDOS)
+# ===============================
+BATCH_WORKERS = int(os.getenv("SIV_BATCH_WORKERS", "2"))   # procesos con su propio modelo
+BATCH_CHUNK_SEC = 120           # los videos largos se dividen en tramos de este largo
+BATCH_LINK_DISTANCE = 40        # px para unir un track entre tramos consecutivos
+# Videos subidos y tramos en proceso: fuera de las carpetas servidas como estáticos
+ANALYSIS_WORK_DIR = os.getenv("SIV_ANALYSIS_WORK_DIR", os.path.join(BACKEND_DIR, "trabajos_analisis"))
+
+# ===============================
+# SIDECAR DE DETECCIONES (REANÁLISIS SIN MODELO)
+# ===============================
+# Junto a cada segmento/clip se guarda <nombre>.det.npz con las detecciones
+# crudas por frame; reanalisis.py recalcula detenidos y alertas desde ahí.
+SIDECAR_ENABLED = os.getenv("SIV_SIDECAR", "0") == "1"
+SIDECAR_SUFFIX = ".det.npz"
+
+# ===============================
+# REGLAS DE ALERTA (HISTÉRESIS POR TIEMPO)
+# ===============================
+# signal: clase detectada en el frame o señal calculada por el detector
+# confirm_sec: tiempo con la señal presente para activar la alerta
+# gap_sec: huecos tolerados mientras se confirma (frames perdidos)
+# release_sec: tiempo sin la señal para desactivar una alerta activa
+ALERT_RULES = {
+    "conos":         {"signal": "cono",          "confirm_sec": 0.4, "gap_sec": 1.0, "release_sec": 3.0},
+    "asistencia":    {"signal": "asistencia",    "confirm_sec": 0.4, "gap_sec": 1.0, "release_sec": 6.0},
+    "peaton_en_via": {"signal": "peaton_en_via", "confirm_sec": 0.5, "gap_sec": 0.5, "release_sec": 2.0},
+}
+
+# ===============================
+# CHECKPOINTS DEL TRACKER
+# ===============================
+CHECKPOINT_DIR = os.getenv("SIV_CHECKPOINT_DIR", os.path.join(BACKEND_DIR, "checkpoints"))
+CHECKPOINT_INTERVAL_SEC = 5     # cada cuánto se guarda el estado de cada cámara
+CHECKPOINT_MAX_AGE_SEC = 120    # checkpoints más viejos se ignoran al arrancar
+CHECKPOINT_MATCH_SEC = 10       # ventana para reasociar tracks restaurados con los ids nuevos
+
+# ===============================
+# TURNOS DE INFERENCIA ENTRE CÁMARAS
+# ===============================
+SCHED_SLOTS = int(os.getenv("SIV_SCHED_SLOTS", "1"))  # inferencias simultáneas
+# nivel -> peso (de mayor a menor prioridad); más peso = más turnos con el host saturado
+SCHED_WEIGHTS = {
+    "incidente": 4.0,   # alerta activa, vehículo detenido o clip de incidente abierto
+    "viewers": 2.0,     # alguien está mirando la cámara
+    "movimiento": 1.5,  # hubo tracks en los últimos SCHED_MOTION_SEC
+    "quieta": 1.0,
+}
+SCHED_MIN_FPS = 2.0             # turnos mínimos garantizados por cámara
+SCHED_MOTION_SEC = 10
+
+# ===============================
+# CASCADA DE MODELOS (CPU)
+# ===============================
+# Modelo rápido en cada frame para mantener los tracks; el completo (best.pt)
+# periódicamente y cuando el rápido ve algo dudoso o una posible alerta.
+CASCADE_ENABLED = os.getenv("SIV_CASCADE", "0") == "1"
+CASCADE_FAST_MODEL = os.getenv("SIV_FAST_MODEL")  # None = mismo modelo con imgsz reducido
+CASCADE_FAST_IMGSZ = int(os.getenv("SIV_FAST_IMGSZ", "320"))
+CASCADE_FAST_FPS = 0            # frames/s del modelo rápido (0 = todos); el resto se predice
+CASCADE_FULL_FPS = 1.0          # frames/s del modelo completo sin disparadores
+CASCADE_ESCALATED_FPS = 10.0    # tope del modelo completo mientras haya disparadores
+CASCADE_UNCERTAIN_CONF = 0.4    # detecciones rápidas bajo esto piden el modelo completo
+CASCADE_TRIGGER_CLASSES = {"cono", "asistencia"}  # además: vehículos detenidos
+
+# ===============================
+# EXPORTACIÓN (CSV / PARQUET)
+# ===============================
+EXPORT_CHUNK_ROWS = 1000        # filas por lote leídas del cursor del servidor
+
+# ===============================
+# BÚSQUEDA DE INCIDENTES (FULLTEXT / FTS5)
+# ===============================
+SEARCH_MIN_TOKEN = 3            # innodb_ft_min_token_size: palabras más cortas no están indexadas
+SEARCH_MAX_TERMS = 8
+SEARCH_PAGE_SIZE = 25
+SEARCH_MAX_PAGE_SIZE = 100
+BULK_MAX_IDS = 1000             # incidentes por operación masiva
+CHANGES_LIMIT = 500             # incidentes por respuesta de /incidentes/changes
+CHANGES_SETTLE_SEC = 2          # el cursor no avanza sobre cambios más nuevos que esto
+#/Users/limberalcedo/Desktop/Proyecto/SIV_proyecto/backend_siv/app/core/config.py
+# ===============================
+# LISTADOS GRANDES (JSON SIN PYDANTIC)
+# ===============================
+# Filas planas serializadas con orjson en get_incidentes / list_users / list_videos
+FAST_JSON_LISTS = os.getenv("SIV_FAST_JSON", "0") == "1"
@@ -1,19 +1,44 @@
-import cv2
+import os
 import time
-import threading
 import queue
-from collections import defaultdict
-from ultralytics import YOLO
-import os
 import atexit
+import threading
+from collections import defaultdict
+from contextlib import nullcontext
+from datetime import datetime
+
+import cv2
 import numpy as np
+from ultralytics import YOLO
 
 from backend_siv.app.services.config import (
     VIDEO_PATHS, MODEL_PATH, CLASS_COLORS, DEFAULT_COLOR,
-    TARGET_RES, JPEG_QUALITY, TRACKER_CONFIG,
-    MAX_TRACK_HISTORY, MIN_CONFIDENCE,
-    STOP_FRAMES_THRESHOLD, STOP_DISTANCE_THRESHOLD
+    TARGET_RES, INCIDENT_DIR,
+    MAX_TRACK_HISTORY, TRACK_LOW_THRESH,
+    STOP_DISTANCE_THRESHOLD,
+    ROAD_ZONES, VEHICLE_MEDIUM, VEHICLE_HIGH, TIMEOUT_SEC,
+    ALWAYS_MONITORED, IDLE_GRACE_SEC, SEGMENT_ANNOTATED,
+    SNAPSHOT_INTERVAL_SEC, SNAPSHOT_MAX_AGE_SEC,
+    SCHED_MOTION_SEC, FRAME_MAX_AGE_SEC, FRAME_QUEUE_MAX,
+    CASCADE_ENABLED, CASCADE_FAST_MODEL, CASCADE_FAST_IMGSZ,
+    CHECKPOINT_INTERVAL_SEC, CHECKPOINT_MATCH_SEC, SIDECAR_ENABLED
 )
+from backend_siv.app.services import fmp4
+from backend_siv.app.services.alertas import AlertEngine
+from backend_siv.app.services.cascada import CascadeScheduler
+from backend_siv.app.services.catalogo import register_clip
+from backend_siv.app.services.checkpoint import CheckpointWriter, save_checkpoint, load_checkpoint
+from backend_siv.app.services.detenidos import step_stopped, forget_missing
+from backend_siv.app.services.eventos import event_bus, start_event_consumer
+from backend_siv.app.services.grabacion import SegmentRecorder, ClipWriter, start_retention_job
+from backend_siv.app.services.latencia import FrameRecord, LatencyStats
+from backend_siv.app.services.mosaico import get_mosaic, mosaic_stats
+from backend_siv.app.services.planificador import InferenceScheduler
+from backend_siv.app.services.salida import OutputStage, FrameHub
+from backend_siv.app.services.sidecar import pack_detections
+from backend_siv.app.services.tracker import ByteTracker
+from backend_siv.app.services.viewers import ViewerRegistry
+from backend_siv.app.services.zonas import get_zone_map, empty_occupancy, freeze_occupancy
 
 # ===============================
 # ESTADOS EXPORTADOS (FASTAPI)
@@ -27,52 +52,59 @@ cones_detected = {cid: False for cid in VIDEO_PATHS}
 
 class_counters = {}
 
+# Ocupación del último frame: cam_id -> {zona: {clase: n}}
+zone_occupancy = {cid: {} for cid in VIDEO_PATHS}
+
 # ===============================
 # CONTROL DE THREADS POR CÁMARA
 # ===============================
 active_cams = {}  # cam_id -> (thread_capture, thread_process)
 stop_flags = {cid: False for cid in VIDEO_PATHS}  # bandera para detener threads
+cams_lock = threading.RLock()  # start/stop desde requests y desde el apagado por inactividad
+
+# Viewers por cámara y rendición (full / low): sin viewers no se anota ni codifica
+viewers = ViewerRegistry()
 
 # ===============================
 # PARÁMETROS DE CONFIRMACIÓN
 # ===============================
-STOP_CONFIRM_FRAMES = 12  # aumentamos de 8 a 12 para mayor robustez
-MOVE_CONFIRM_FRAMES = 5
-
-CONES_CONFIRM_FRAMES = 10
-ASSIST_CONFIRM_FRAMES = 10
-ASSIST_WINDOW_SEC = 6
 MAX_TRAIL = 15  # longitud de la estela de vehículos
+FRAME_PAD = 20  # borde agregado antes de la inferencia
 
 # ===============================
 # ESTADOS GLOBALES
 # ===============================
-frame_queues = {cid: queue.Queue(maxsize=5) for cid in VIDEO_PATHS}
-processed_queues = {cid: queue.Queue(maxsize=2) for cid in VIDEO_PATHS}
+frame_queues = {cid: queue.Queue(maxsize=FRAME_QUEUE_MAX) for cid in VIDEO_PATHS}  # FrameRecord
+frame_hubs = {cid: FrameHub() for cid in VIDEO_PATHS}  # último JPEG anotado por cámara
+low_hubs = {cid: FrameHub() for cid in VIDEO_PATHS}    # misma imagen en LOW_RES (stream_low)
+fmp4_hubs = {cid: fmp4.FragmentHub() for cid in VIDEO_PATHS}  # H.264 fragmentado (WebSocket)
 
 track_histories = {cid: defaultdict(list) for cid in VIDEO_PATHS}
+# Un tracker por cámara: el modelo solo detecta, la asociación no se comparte entre cámaras
+trackers = {cid: ByteTracker() for cid in VIDEO_PATHS}
+# Turnos del modelo por prioridad (incidente > viewers > movimiento > quieta)
+scheduler = InferenceScheduler()
+last_motion = {cid: 0.0 for cid in VIDEO_PATHS}
+# Cascada rápido/completo (solo con SIV_CASCADE=1)
+cascades = {cid: CascadeScheduler() for cid in VIDEO_PATHS} if CASCADE_ENABLED else {}
 vehicle_states = {cid: defaultdict(lambda: "MOVING") for cid in VIDEO_PATHS}
 
-cones_frames = {cid: 0 for cid in VIDEO_PATHS}
-assist_frames = {cid: 0 for cid in VIDEO_PATHS}
-
-cones_confirmed = {cid: False for cid in VIDEO_PATHS}
-assistance_confirmed = {cid: False for cid in VIDEO_PATHS}
-last_cones_time = {cid: 0 for cid in VIDEO_PATHS}
+# Conos / asistencia / peatón en vía: reglas con histéresis por tiempo (ALERT_RULES)
+alert_engines = {cid: AlertEngine() for cid in VIDEO_PATHS}
 
 stopped_persistence = {cid: defaultdict(int) for cid in VIDEO_PATHS}
 movement_persistence = {cid: defaultdict(int) for cid in VIDEO_PATHS}
 
 # ===============================
-# VIDEO OUTPUT
+# VIDEO OUTPUT (segmentos rotativos, ver grabacion.py)
 # ===============================
-OUTPUT_DIR = os.path.join(os.path.dirname(__file__), "../../videos/generado")
-os.makedirs(OUTPUT_DIR, exist_ok=True)
+recorders = {}
+output_stages = {}  # cam_id -> OutputStage (JPEG + recorder fuera del hilo de inferencia)
+atexit.register(lambda: [r.close() for r in recorders.values()])
 
-VIDEO_OUTPUT_PATHS = {
-    cid: os.path.join(OUTPUT_DIR, f"cam{cid}_output.mp4")
-    for cid in VIDEO_PATHS
-}
+# Métricas del pipeline (la etapa de salida agrega las suyas)
+pipeline_metrics = {cid: {"inference_ms": 0.0, "tracking_ms": 0.0, "frames": 0} for cid in VIDEO_PATHS}
+latency_stats = {cid: LatencyStats() for cid in VIDEO_PATHS}  # latencia por etapa
 
 
 # ===============================
@@ -80,16 +112,20 @@ VIDEO_OUTPUT_PATHS = {
 # ===============================
 incident_recording = {cid: False for cid in VIDEO_PATHS}
 incident_writer = {cid: None for cid in VIDEO_PATHS}
-INCIDENT_DIR = os.path.join(os.path.dirname(__file__), "../../videos/incidentes")
 os.makedirs(INCIDENT_DIR, exist_ok=True)
 
+# Metadatos del clip en curso (para registrarlo en el catálogo al cerrarlo)
+incident_meta = {cid: None for cid in VIDEO_PATHS}
 
-video_writers = {}
-atexit.register(lambda: [w.release() for w in video_writers.values()])
-incident_recording = {cid: False for cid in VIDEO_PATHS}
-incident_writer = {cid: None for cid in VIDEO_PATHS}
-INCIDENT_DIR = os.path.join(os.path.dirname(__file__), "../../videos/incidentes")
-os.makedirs(INCIDENT_DIR, exist_ok=True)
+# ===============================
+# CHECKPOINTS (REINICIO SIN PERDER ALERTAS)
+# ===============================
+checkpoints = CheckpointWriter()
+# Tracks del checkpoint a la espera de reasociarse: YOLO reinicia sus ids al arrancar
+restored_tracks = {cid: {} for cid in VIDEO_PATHS}
+restored_until = {cid: 0 for cid in VIDEO_PATHS}
+# Clip que quedó abierto antes del reinicio: el siguiente hereda su inicio e incidente
+resumed_incident = {cid: None for cid in VIDEO_PATHS}
 
 
 # ===============================
@@ -99,6 +135,70 @@ model = YOLO(MODEL_PATH)
 print("✅ Modelo YOLO cargado → clases:", model.names)
 model_lock = threading.Lock()
 
+
+def _boxes(result):
+    boxes = result.boxes
+    if boxes is None or not len(boxes):
+        return np.zeros((0, 4), np.float32), np.zeros(0, np.float32), np.zeros(0, np.int64)
+    return boxes.xyxy.cpu().numpy(), boxes.conf.cpu().numpy(), boxes.cls.int().cpu().numpy()
+
+
+def detect(frame):
+    """Detecciones crudas (xyxy, conf, cls) sin tracking"""
+    with model_lock:
+        result = model.predict(frame, conf=TRACK_LOW_THRESH, verbose=False)[0]
+    return _boxes(result)
+
+
+# Modelo rápido de la cascada: otro .pt o el mismo con imgsz reducido
+fast_model, fast_lock, fast_cls_map = model, model_lock, None
+if CASCADE_ENABLED and CASCADE_FAST_MODEL:
+    fast_model, fast_lock = YOLO(CASCADE_FAST_MODEL), threading.Lock()
+    # ids del modelo rápido → ids de best.pt por nombre (-1 = clase desconocida)
+    by_name = {v.lower(): k for k, v in model.names.items()}
+    fast_cls_map = np.array([by_name.get(fast_model.names[i].lower(), -1) for i in range(len(fast_model.names))])
+    print("⚡ Modelo rápido de la cascada →", CASCADE_FAST_MODEL)
+
+
+def detect_fast(frame):
+    """Detecciones del modelo rápido en ids de clase de best.pt"""
+    with fast_lock:
+        result = fast_model.predict(frame, conf=TRACK_LOW_THRESH, imgsz=CASCADE_FAST_IMGSZ, verbose=False)[0]
+    xyxy, confs, classes = _boxes(result)
+    if fast_cls_map is not None and len(classes):
+        classes = fast_cls_map[classes]
+        keep = classes >= 0
+        xyxy, confs, classes = xyxy[keep], confs[keep], classes[keep]
+    return xyxy, confs, classes
+
+
+def cascade_detect(cam_id, frame, now):
+    """(etapa, detecciones) según la cascada; detecciones None en frames 'coast'"""
+    sched = cascades[cam_id]
+    stage = sched.plan(now)
+    raw = None
+    if stage == "fast":
+        raw = detect_fast(frame)
+        names = {model.names[int(c)].lower() for c in raw[2]}
+        if sched.escalate(now, raw[1], names, len(stopped_vehicles[cam_id])):
+            stage = "full"
+    if stage == "full":
+        raw = detect(frame)
+    sched.ran(stage, now)
+    return stage, raw
+
+
+def priority_level(cam_id):
+    """Nivel de la cámara para el planificador (SCHED_WEIGHTS)"""
+    if incident_recording[cam_id] or stopped_vehicles[cam_id] or any(alert_engines[cam_id].active().values()):
+        return "incidente"
+    if viewers.count(cam_id) > 0:
+        return "viewers"
+    if time.time() - last_motion[cam_id] <= SCHED_MOTION_SEC:
+        return "movimiento"
+    return "quieta"
+
+
 # ===============================
 # UTILIDADES VISUALES
 # ===============================
@@ -146,32 +246,10 @@ def draw_label(frame, box, label, color, confidence=None, alert=False, hide_conf
 # DETECCIÓN DE DETENIDOS + ESTELA
 # ===============================
 def update_stopped_vehicles(cam_id, current_ids):
-    nuevos_detenidos = set()
-    for tid in current_ids:
-        history = track_histories[cam_id][tid]
-        if len(history) < STOP_FRAMES_THRESHOLD:
-            continue
-        x0, y0 = history[-STOP_FRAMES_THRESHOLD]
-        x1, y1 = history[-1]
-        dist = ((x1 - x0)**2 + (y1 - y0)**2)**0.5
-        state = vehicle_states[cam_id][tid]
-
-        if dist < STOP_DISTANCE_THRESHOLD:
-            movement_persistence[cam_id][tid] = 0
-            if state == "MOVING":
-                stopped_persistence[cam_id][tid] += 1
-                if stopped_persistence[cam_id][tid] >= STOP_CONFIRM_FRAMES:
-                    vehicle_states[cam_id][tid] = "STOPPED_CONFIRMED"
-            if vehicle_states[cam_id][tid] == "STOPPED_CONFIRMED":
-                nuevos_detenidos.add(tid)
-        else:
-            stopped_persistence[cam_id][tid] = 0
-            if state == "STOPPED_CONFIRMED":
-                movement_persistence[cam_id][tid] += 1
-                if movement_persistence[cam_id][tid] >= MOVE_CONFIRM_FRAMES:
-                    vehicle_states[cam_id][tid] = "MOVING"
-
-    stopped_vehicles[cam_id] = nuevos_detenidos
+    stopped_vehicles[cam_id] = step_stopped(
+        track_histories[cam_id], vehicle_states[cam_id],
+        stopped_persistence[cam_id], movement_persistence[cam_id], current_ids
+    )
 
 def draw_trails(frame, cam_id):
     for tid, history in track_histories[cam_id].items():
@@ -187,40 +265,63 @@ def capture_video(cam_id):
     cap = cv2.VideoCapture(VIDEO_PATHS[cam_id])
     fps = cap.get(cv2.CAP_PROP_FPS) or 30
     delay = 1 / fps
+    seq = 0
 
     while not stop_flags[cam_id]:
         ret, frame = cap.read()
         if not ret:
             cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
             continue
+        seq += 1
+        # El descarte por antigüedad lo hace process_frames; el tope es solo de seguridad
         if frame_queues[cam_id].full():
-            frame_queues[cam_id].get_nowait()
-        frame_queues[cam_id].put(frame)
+            try:
+                frame_queues[cam_id].get_nowait()
+                latency_stats[cam_id].stale_dropped += 1
+            except queue.Empty:
+                pass
+        frame_queues[cam_id].put(FrameRecord(cam_id, seq, frame))
         time.sleep(delay)
     cap.release()
 
 
-def start_incident_recording(cam_id, fps, frame):
+def start_incident_recording(cam_id, fps, frame, event_type="incidente"):
     if incident_recording[cam_id]:
         return
-    filename = f"cam{cam_id}_incident_{int(time.time())}.mp4"
+    resumed = resumed_incident[cam_id]
+    resumed_incident[cam_id] = None
+    suffix = "_cont" if resumed else ""
+    filename = f"cam{cam_id}_incident_{int(time.time())}{suffix}.mp4"
     path = os.path.join(INCIDENT_DIR, filename)
-    writer = cv2.VideoWriter(
-        path,
-        cv2.VideoWriter_fourcc(*"avc1"),
-        fps,
-        (frame.shape[1], frame.shape[0])
+    incident_writer[cam_id] = ClipWriter(
+        path, fps, (frame.shape[1], frame.shape[0]), class_names=model.names, cam_id=cam_id
     )
-    incident_writer[cam_id] = writer
     incident_recording[cam_id] = True
+    incident_meta[cam_id] = {
+        "path": path,
+        "event_type": event_type,
+        "start_time": resumed["start_time"] if resumed else datetime.utcnow(),
+        "incidente_id": resumed["incidente_id"] if resumed else None,
+    }
     print(f"🎬 Grabando incidente cámara {cam_id} → {filename}")
 
 def stop_incident_recording(cam_id):
     if not incident_recording[cam_id]:
         return
-    incident_writer[cam_id].release()
+    writer = incident_writer[cam_id]
     incident_writer[cam_id] = None
     incident_recording[cam_id] = False
+
+    meta = incident_meta[cam_id]
+    incident_meta[cam_id] = None
+    if meta:
+        end_time = datetime.utcnow()
+        # se registra cuando el hilo del clip terminó de escribir el archivo
+        writer.on_close = lambda path: register_clip(
+            cam_id, path, meta["event_type"],
+            meta["start_time"], end_time, meta["incidente_id"]
+        )
+    writer.close()
     print(f"⏹️ Incidente cámara {cam_id} finalizado")
 
 
@@ -231,102 +332,163 @@ def stop_incident_recording(cam_id):
 # PROCESAMIENTO DE FRAMES
 # ===============================
 def process_frames(cam_id, fps):
-    writer = cv2.VideoWriter(
-        VIDEO_OUTPUT_PATHS[cam_id],
-        cv2.VideoWriter_fourcc(*"avc1"),
-        fps,
-        TARGET_RES
-    )
-    video_writers[cam_id] = writer
+    if cam_id not in recorders:
+        recorders[cam_id] = SegmentRecorder(cam_id, fps, TARGET_RES, class_names=model.names)
+    if cam_id not in output_stages:
+        output_stages[cam_id] = OutputStage(
+            cam_id, frame_hubs[cam_id], recorders[cam_id], low_hub=low_hubs[cam_id],
+            latency=latency_stats[cam_id],
+            fmp4=fmp4.Fmp4Encoder(fmp4_hubs[cam_id], fps) if fmp4.available() else None
+        )
+    output = output_stages[cam_id]
+    metrics = pipeline_metrics[cam_id]
 
     EXCLUDE_ALERT_LABELS = {"persona", "cono", "asistencia"}
 
+    trackers[cam_id].reset()  # ids nuevos; restore_state reasocia los del checkpoint
+    if CASCADE_ENABLED:
+        cascades[cam_id] = CascadeScheduler()  # el primer frame pasa por el modelo completo
+    tracker = trackers[cam_id]
+    restore_state(cam_id)
+    last_checkpoint = time.time()
+    last_snapshot = 0.0
+
     # Cooldown para incidentes
     incident_cooldown = 0
     MIN_INCIDENT_FRAMES = 15  # sigue grabando aunque desaparezca el evento
 
     while not stop_flags[cam_id]:
-        frame = frame_queues[cam_id].get()
+        try:
+            rec = frame_queues[cam_id].get(timeout=0.5)
+        except queue.Empty:
+            continue  # permite salir al detener la cámara
+        rec.dequeued = time.time()
+        if rec.dequeued - rec.captured > FRAME_MAX_AGE_SEC:
+            latency_stats[cam_id].stale_dropped += 1  # la inferencia va atrasada: se salta
+            continue
+        frame = rec.frame
         clean_frame = frame.copy()  # copia para grabar sin etiquetas
-        padded = cv2.copyMakeBorder(frame, 20, 20, 20, 20, cv2.BORDER_CONSTANT)
 
-        with model_lock:
-            results = model.track(
-                padded,
-                persist=True,
-                tracker=TRACKER_CONFIG
-            )[0]
+        # Se anota para la grabación continua (SEGMENT_ANNOTATED) o si alguien mira
+        # alguna rendición; con solo snapshots, un frame cada SNAPSHOT_INTERVAL_SEC
+        snap_due = rec.dequeued - last_snapshot >= SNAPSHOT_INTERVAL_SEC
+        snap_full = snap_due and viewers.count(cam_id, "snap_full") > 0
+        snap_low = snap_due and viewers.count(cam_id, "snap_low") > 0
+        if snap_full or snap_low:
+            last_snapshot = rec.dequeued
+        want_full = snap_full or viewers.count(cam_id, "full") > 0
+        want_low = snap_low or viewers.count(cam_id, "low") > 0
+        want_fmp4 = viewers.count(cam_id, "fmp4") > 0
+        annotate = SEGMENT_ANNOTATED or want_full or want_low or want_fmp4
+
+        padded = cv2.copyMakeBorder(frame, FRAME_PAD, FRAME_PAD, FRAME_PAD, FRAME_PAD, cv2.BORDER_CONSTANT)
+        zone_map = get_zone_map(cam_id, (frame.shape[1], frame.shape[0]))
+
+        # los frames 'coast' de la cascada no usan el modelo ni piden turno
+        needs_model = not (CASCADE_ENABLED and cascades[cam_id].plan(rec.dequeued) == "coast")
+        with scheduler.slot(cam_id, priority_level(cam_id)) if needs_model else nullcontext():
+            t0 = time.perf_counter()
+            if CASCADE_ENABLED:
+                stage, raw = cascade_detect(cam_id, padded, rec.dequeued)
+            else:
+                stage, raw = "full", detect(padded)
+            elapsed = (time.perf_counter() - t0) * 1000
+        key = f"inference_{stage}_ms" if CASCADE_ENABLED else "inference_ms"
+        if raw is None:
+            xyxy, ids, classes, confs = tracker.coast()
+        else:
+            metrics[key] = 0.9 * metrics[key] + 0.1 * elapsed if metrics.get(key) else elapsed
+            xyxy, ids, classes, confs = tracker.update(*raw)
+        metrics["tracking_ms"] = tracker.track_ms
+        metrics["frames"] += 1
+        rec.inferred = time.time()
 
-        annotated = frame.copy()
+        annotated = frame.copy() if annotate else frame
         current_ids = set()
         detected_classes = set()
-
-        assistance_detected[cam_id] = None
-        cones_detected[cam_id] = False
-
-        boxes = results.boxes
-        if boxes and boxes.id is not None:
-            for box, tid, cls, conf in zip(
-                boxes.xyxy.cpu().numpy(),
-                boxes.id.int().cpu().tolist(),
-                boxes.cls.int().cpu().tolist(),
-                boxes.conf.cpu().numpy()
-            ):
+        track_classes = {}  # tid -> clase en este frame
+        occupancy = empty_occupancy()
+        pedestrians_on_road = set()
+
+        detections = []  # (box, tid, clase, conf) para dibujar tras evaluar las reglas
+
+        # detecciones crudas del frame para el sidecar (también los frames vacíos)
+        dets = pack_detections((), (), (), ()) if SIDECAR_ENABLED else None
+        if len(ids):
+            ids = ids.tolist()
+            classes = classes.tolist()
+            if SIDECAR_ENABLED:
+                dets = pack_detections(ids, classes, confs, xyxy - FRAME_PAD)
+            for box, tid, cls, conf in zip(xyxy, ids, classes, confs):
                 class_name = model.names[int(cls)].lower()
                 detected_classes.add(class_name)
 
                 cx = int((box[0] + box[2]) / 2)
                 cy = int((box[1] + box[3]) / 2)
+                track_classes[tid] = class_name
+                if tid not in track_histories[cam_id] and restored_tracks[cam_id]:
+                    adopt_restored_track(cam_id, tid, (cx, cy))
+                zone = zone_map.classify(cx - FRAME_PAD, cy - FRAME_PAD)
+                if zone:
+                    occupancy[zone][class_name] += 1
+                    if class_name == "persona" and zone in ROAD_ZONES:
+                        pedestrians_on_road.add(tid)
                 track_histories[cam_id][tid].append((cx, cy))
                 if len(track_histories[cam_id][tid]) > MAX_TRACK_HISTORY:
                     track_histories[cam_id][tid].pop(0)
 
-                state = vehicle_states[cam_id][tid]
-                base_color = get_color(class_name)
-
-                # Confirmación asistencia / conos
-                if class_name == "asistencia":
-                    assist_frames[cam_id] += 1
-                    if assist_frames[cam_id] >= ASSIST_CONFIRM_FRAMES:
-                        assistance_confirmed[cam_id] = True
-                        assistance_detected[cam_id] = "Asistencia"
-                elif class_name == "cono":
-                    cones_frames[cam_id] += 1
-                    if cones_frames[cam_id] >= CONES_CONFIRM_FRAMES:
-                        cones_confirmed[cam_id] = True
-                        cones_detected[cam_id] = True
-
-                # Bloqueo alertas
-                block_alerts = assistance_confirmed[cam_id] or cones_confirmed[cam_id]
-
                 current_ids.add(tid)
-                vehicles_in_frame[cam_id] = len(current_ids)
+                detections.append((box, tid, class_name, conf))
 
+        vehicles_in_frame[cam_id] = len(current_ids)
+        if current_ids:
+            last_motion[cam_id] = rec.dequeued
+        zone_occupancy[cam_id] = freeze_occupancy(occupancy)
+        update_stopped_vehicles(cam_id, current_ids)
+
+        # ===============================
+        # REGLAS DE ALERTA (una pasada por frame)
+        # ===============================
+        signals = set(detected_classes)
+        if pedestrians_on_road:
+            signals.add("peaton_en_via")
+        alerts = alert_engines[cam_id].update(signals)
+        cones_active = alerts["conos"]
+        assistance_active = alerts["asistencia"]
+        assistance_detected[cam_id] = "Asistencia" if assistance_active else None
+        cones_detected[cam_id] = cones_active
+        block_alerts = assistance_active or cones_active
+
+        if annotate:
+            for box, tid, class_name, conf in detections:
                 hide_conf = class_name in {"persona", "cono", "asistencia"}
                 label_text = class_name.capitalize()
-                show_alert = state == "STOPPED_CONFIRMED" and not block_alerts and class_name not in EXCLUDE_ALERT_LABELS
-
+                show_alert = (
+                    vehicle_states[cam_id][tid] == "STOPPED_CONFIRMED"
+                    and not block_alerts and class_name not in EXCLUDE_ALERT_LABELS
+                )
                 if show_alert:
                     draw_label(annotated, box, label_text, (0, 0, 255), confidence=conf, alert=True, hide_confidence=hide_conf)
                 else:
-                    draw_label(annotated, box, label_text, base_color, confidence=conf, hide_confidence=hide_conf)
-
-        update_stopped_vehicles(cam_id, current_ids)
-        draw_trails(annotated, cam_id)  # dibujar estelas
+                    draw_label(annotated, box, label_text, get_color(class_name), confidence=conf, hide_confidence=hide_conf)
+            draw_trails(annotated, cam_id)  # dibujar estelas
+        rec.rendered = time.time()
 
         # ===============================
         # GRABAR VIDEO DE INCIDENTE
         # ===============================
-        incident = bool(
-            stopped_vehicles[cam_id] or
-            assistance_confirmed[cam_id] or
-            cones_confirmed[cam_id]
-        )
+        incident = bool(stopped_vehicles[cam_id] or assistance_active or cones_active)
 
         if incident:
             incident_cooldown = 0
-            start_incident_recording(cam_id, fps, clean_frame)
-            incident_writer[cam_id].write(clean_frame)
+            if stopped_vehicles[cam_id]:
+                event_type = "vehiculo_detenido"
+            elif assistance_active:
+                event_type = "asistencia"
+            else:
+                event_type = "conos"
+            start_incident_recording(cam_id, fps, clean_frame, event_type)
+            incident_writer[cam_id].write(clean_frame, dets)
         else:
             if incident_recording[cam_id]:
                 incident_cooldown += 1
@@ -334,96 +496,340 @@ def process_frames(cam_id, fps):
                     stop_incident_recording(cam_id)
                 else:
                     # seguimos grabando aunque el evento desaparezca momentáneamente
-                    incident_writer[cam_id].write(clean_frame)
+                    incident_writer[cam_id].write(clean_frame, dets)
+
+        # ===============================
+        # EVENTOS -> BUS (debounce y borradores de incidente)
+        # ===============================
+        clip_meta = incident_meta[cam_id]
+        stopped_ids = {
+            tid for tid in stopped_vehicles[cam_id]
+            if track_classes.get(tid) not in EXCLUDE_ALERT_LABELS
+        }
+        if stopped_ids and not block_alerts:
+            event_bus.publish(cam_id, "vehiculo_detenido", stopped_ids, clip_meta)
+        if alerts["peaton_en_via"]:
+            event_bus.publish(cam_id, "peaton_en_via", pedestrians_on_road, clip_meta)
+        if cones_active:
+            event_bus.publish(cam_id, "conos", clip_meta=clip_meta)
+        if assistance_active:
+            event_bus.publish(cam_id, "asistencia", clip_meta=clip_meta)
 
         # Limpiar tracks de IDs no presentes
-        for tid in list(vehicle_states[cam_id].keys()):
-            if tid not in current_ids:
-                vehicle_states[cam_id].pop(tid, None)
-                stopped_persistence[cam_id].pop(tid, None)
-                movement_persistence[cam_id].pop(tid, None)
-                track_histories[cam_id].pop(tid, None)
-
-        if "asistencia" not in detected_classes:
-            assist_frames[cam_id] = 0
-            assistance_confirmed[cam_id] = False
-            assistance_detected[cam_id] = None
-        if "cono" not in detected_classes:
-            cones_frames[cam_id] = 0
-            cones_confirmed[cam_id] = False
-            cones_detected[cam_id] = False
-
-        # Video completo con labels/estelas para streaming
-        writer.write(annotated)
-        ok, jpg = cv2.imencode(".jpg", annotated, [int(cv2.IMWRITE_JPEG_QUALITY), JPEG_QUALITY])
-        if ok:
-            if processed_queues[cam_id].full():
-                processed_queues[cam_id].get_nowait()
-            processed_queues[cam_id].put(jpg.tobytes())
+        forget_missing(
+            track_histories[cam_id], vehicle_states[cam_id],
+            stopped_persistence[cam_id], movement_persistence[cam_id], current_ids
+        )
+
+        now = time.time()
+        if now - last_checkpoint >= CHECKPOINT_INTERVAL_SEC:
+            checkpoints.submit(cam_id, snapshot_state(cam_id))
+            last_checkpoint = now
+
+        # Grabación siempre (con labels/estelas salvo SIV_RECORD_ANNOTATED=0), JPEG solo de las rendiciones con viewers
+        output.submit(annotated, full=want_full, low=want_low, dets=dets, rec=rec, fmp4=want_fmp4)
+
+
+# ===============================
+# CHECKPOINT DEL ESTADO POR CÁMARA
+# ===============================
+def snapshot_state(cam_id):
+    """Copia en tipos básicos de tracks, contadores de alerta y clip en curso"""
+    tracks = {}
+    for tid, history in list(track_histories[cam_id].items()):
+        tracks[tid] = (
+            list(history),
+            vehicle_states[cam_id].get(tid, "MOVING"),
+            stopped_persistence[cam_id].get(tid, 0),
+            movement_persistence[cam_id].get(tid, 0),
+        )
+    meta = incident_meta[cam_id]
+    return {
+        "tracks": tracks,
+        "alerts": alert_engines[cam_id].snapshot(),
+        "incident": {k: meta[k] for k in ("event_type", "start_time", "incidente_id")} if meta else None,
+        "events": event_bus.open_events(cam_id),
+    }
+
+
+def restore_state(cam_id):
+    """Carga el checkpoint reciente de la cámara (si existe) al arrancar el procesamiento"""
+    loaded = load_checkpoint(cam_id)
+    if loaded is None:
+        return False
+    saved_at, state = loaded
+    restored_tracks[cam_id] = state["tracks"]
+    restored_until[cam_id] = time.time() + CHECKPOINT_MATCH_SEC
+    alert_engines[cam_id].restore(state["alerts"])
+    resumed_incident[cam_id] = state["incident"]
+    event_bus.restore(state["events"])
+    print(f"♻️ Cámara {cam_id}: restaurados {len(state['tracks'])} tracks "
+          f"(checkpoint de hace {time.time() - saved_at:.0f}s)")
+    return True
+
+
+def adopt_restored_track(cam_id, tid, pos):
+    """
+    Un id nuevo hereda historia y estado del track restaurado más cercano a su
+    posición, así un vehículo que ya estaba detenido no vuelve a contar desde cero.
+    """
+    if time.time() > restored_until[cam_id]:
+        restored_tracks[cam_id] = {}
+        return
+    best, best_dist = None, STOP_DISTANCE_THRESHOLD * 2
+    for old_tid, (history, *_rest) in restored_tracks[cam_id].items():
+        if not history:
+            continue
+        x, y = history[-1]
+        dist = ((pos[0] - x) ** 2 + (pos[1] - y) ** 2) ** 0.5
+        if dist <= best_dist:
+            best, best_dist = old_tid, dist
+    if best is None:
+        return
+    history, state, stopped, moving = restored_tracks[cam_id].pop(best)
+    track_histories[cam_id][tid] = history
+    vehicle_states[cam_id][tid] = state
+    stopped_persistence[cam_id][tid] = stopped
+    movement_persistence[cam_id][tid] = moving
+
+
+def checkpoint_all():
+    for cam_id in list(active_cams):
+        try:
+            save_checkpoint(cam_id, snapshot_state(cam_id))
+        except Exception as e:
+            print(f"⚠️ Checkpoint final cámara {cam_id} → {e}")
+
+
+atexit.register(checkpoint_all)
+
+
+def road_pedestrians(cam_id):
+    """Personas en zonas de calzada según la ocupación del último frame"""
+    occ = zone_occupancy.get(cam_id, {})
+    return sum(occ.get(z, {}).get("persona", 0) for z in ROAD_ZONES)
+
+
+def get_pipeline_metrics(cam_id):
+    data = {k: round(v, 2) if isinstance(v, float) else v for k, v in pipeline_metrics[cam_id].items()}
+    if cam_id in output_stages:
+        data.update(output_stages[cam_id].stats())
+    if cam_id in recorders:
+        data["recorder_dropped"] = recorders[cam_id].dropped
+    data["viewers"] = viewers.snapshot(cam_id)
+    if cam_id in cascades:
+        data["cascada"] = cascades[cam_id].stats()
+    data["planificador"] = scheduler.stats(cam_id)
+    data["latencia_ms"] = latency_stats[cam_id].summary()
+    data["active"] = cam_id in active_cams
+    data["mosaicos"] = [m for m in mosaic_stats() if cam_id in m["camaras"]]
+    return data
 
 
 # ===============================
 # STREAM (LOW / HIGH QUALITY)
 # ===============================
-def generate_frames(cam_id: int, low: bool = False):
+def wait_frame(cam_id, after_seq=0, low=False, timeout=None, viewer_id=None):
     """
-    low = True  -> mini video (baja calidad / rápido)
-    low = False -> fullscreen (calidad normal)
+    (seq, jpg, captura) del siguiente frame; jpg None si no llegó nada antes del timeout.
+    Con viewer_id cada pedido renueva el lease del viewer en esa rendición.
+    La rendición low la codifica la etapa de salida una vez por frame.
     """
+    if viewer_id:
+        viewers.touch(cam_id, "low" if low else "full", viewer_id)
+    hub = low_hubs[cam_id] if low else frame_hubs[cam_id]
+    seq, data, captured = hub.wait(after_seq, timeout)
+    if data is not None:
+        latency_stats[cam_id].observe_delivery(captured)
+    return seq, data, captured
+
+
+def snapshot(cam_id, low=False, timeout=None):
+    """
+    (seq, jpg, captura) del último frame codificado de la rendición. Con la
+    cámara andando renueva el lease de snapshots (sigue codificando a
+    SNAPSHOT_INTERVAL_SEC) y, si el cacheado es muy viejo o no hay, espera el
+    próximo hasta timeout. No inicia la cámara: apagada devuelve lo cacheado.
+    """
+    running = cam_id in active_cams
+    if running:
+        viewers.touch(cam_id, "snap_low" if low else "snap_full", "snapshot")
+    hub = low_hubs[cam_id] if low else frame_hubs[cam_id]
+    seq, data, captured = hub.latest()
+    if timeout and running and (data is None or time.time() - captured > SNAPSHOT_MAX_AGE_SEC):
+        new_seq, new_data, new_captured = hub.wait(seq, timeout)
+        if new_data is not None:
+            return new_seq, new_data, new_captured
+    return seq, data, captured
+
+
+def snapshots(cam_ids, low=False):
+    """Snapshots cacheados de varias cámaras (sin esperar)"""
+    return [(cid, *snapshot(cid, low)) for cid in cam_ids if cid in VIDEO_PATHS]
+
+
+def release_viewer(cam_id, viewer_id, low=False, rendition=None):
+    viewers.release(cam_id, rendition or ("low" if low else "full"), viewer_id)
 
-    while True:
-        frame = processed_queues[cam_id].get()
-
-        if low:
-            # MINI VIDEO
-            img = cv2.imdecode(
-                np.frombuffer(frame, np.uint8),
-                cv2.IMREAD_COLOR
-            )
-            img = cv2.resize(img, (640, 360))
-            _, buffer = cv2.imencode(
-                ".jpg",
-                img,
-                [cv2.IMWRITE_JPEG_QUALITY, 45]
-            )
-            data = buffer.tobytes()
-        else:
-            # FULLSCREEN (tal cual lo tenías)
-            data = frame
-
-        yield (
-            b"--frame\r\n"
-            b"Content-Type: image/jpeg\r\n\r\n" +
-            data +
-            b"\r\n"
-        )
+
+def wait_fragments(cam_id, after_seq=0, timeout=None, viewer_id=None):
+    """
+    (seq, bytes, mime) del stream H.264 fragmentado posterior a after_seq; bytes
+    empieza con el segmento de inicialización cuando el viewer debe resincronizar.
+    """
+    if not fmp4.available():
+        raise RuntimeError("Stream H.264 no disponible (PyAV no está instalado)")
+    if viewer_id:
+        viewers.touch(cam_id, "fmp4", viewer_id)
+    hub = fmp4_hubs[cam_id]
+    seq, data = hub.read(after_seq, timeout)
+    return seq, data, hub.mime
+
+
+def wait_mosaic(cam_ids, cols=None, after_seq=0, timeout=None):
+    """
+    (seq, jpg, captura) del mosaico de cam_ids. Todos los viewers del mismo layout
+    comparten un composer; mientras lo miren, sus cámaras siguen en low.
+    """
+    cam_ids = [cid for cid in cam_ids if cid in VIDEO_PATHS]
+    mosaic = get_mosaic(
+        cam_ids, cols,
+        source=lambda cid: low_hubs[cid].latest(),
+        touch=lambda cid, vid: viewers.touch(cid, "low", vid),
+        release=lambda cid, vid: viewers.release(cid, "low", vid),
+    )
+    return mosaic.wait(after_seq, timeout)
+
+
+# ===============================
+# STATUS COMPLETO
+# ===============================
+_last_assistance_seen = {cid: 0 for cid in VIDEO_PATHS}
+_last_cones_seen = {cid: 0 for cid in VIDEO_PATHS}
+
+def camera_status(cam_id):
+    total_vehiculos = vehicles_in_frame.get(cam_id, 0)
+
+    if total_vehiculos > VEHICLE_HIGH:
+        nivel = "Alta"
+        nivel_color = "#dc2626"
+    elif total_vehiculos > VEHICLE_MEDIUM:
+        nivel = "Media"
+        nivel_color = "#facc15"
+    else:
+        nivel = "Baja"
+        nivel_color = "#16a34a"
+
+    ids_detenidos = list(stopped_vehicles.get(cam_id, set()))
+    num_detenidos = len(ids_detenidos)
+
+    # Personas en vía (ocupación por zona calculada en process_frames)
+    personas_en_via = road_pedestrians(cam_id)
+
+    accident = accident_detected.get(cam_id, False)
+
+    now = time.time()
+    if assistance_detected.get(cam_id):
+        _last_assistance_seen[cam_id] = now
+    if cones_detected.get(cam_id):
+        _last_cones_seen[cam_id] = now
+
+    asistencia_activa = (now - _last_assistance_seen[cam_id]) < TIMEOUT_SEC
+    conos_activos = (now - _last_cones_seen[cam_id]) < TIMEOUT_SEC
+
+    alerta_vehiculo = num_detenidos > 0 and not asistencia_activa and not conos_activos
+
+    return {
+        "status": "online",
+        "vehiculos": total_vehiculos,
+        "nivel": nivel,
+        "nivel_color": nivel_color,
+        "detenidos": num_detenidos,
+        "ids_detenidos": ids_detenidos,
+        "personas_en_via": personas_en_via,
+        "zonas": zone_occupancy.get(cam_id, {}),
+        "accidente_detectado": accident,
+        "asistencia_detectada": asistencia_activa,
+        "conos_detectados": conos_activos,
+        "alerta_vehiculo": alerta_vehiculo
+    }
 
 # INICIAR Y DETENER CAMARAS
 # ===============================
 def start_camera(cam_id):
     """Inicia hilos de captura y procesamiento"""
-    if cam_id in active_cams:
-        return
-
-    stop_flags[cam_id] = False
-    cap = cv2.VideoCapture(VIDEO_PATHS[cam_id])
-    fps = cap.get(cv2.CAP_PROP_FPS) or 30
-    cap.release()
-
-    t1 = threading.Thread(target=capture_video, args=(cam_id,), daemon=True)
-    t2 = threading.Thread(target=process_frames, args=(cam_id, fps), daemon=True)
-    t1.start()
-    t2.start()
-    active_cams[cam_id] = (t1, t2)
+    with cams_lock:
+        if cam_id in active_cams:
+            return
+
+        stop_flags[cam_id] = False
+        cap = cv2.VideoCapture(VIDEO_PATHS[cam_id])
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30
+        cap.release()
+
+        viewers.mark_active(cam_id)  # el período de gracia corre desde el arranque
+        t1 = threading.Thread(target=capture_video, args=(cam_id,), daemon=True)
+        t2 = threading.Thread(target=process_frames, args=(cam_id, fps), daemon=True)
+        t1.start()
+        t2.start()
+        active_cams[cam_id] = (t1, t2)
+    start_retention_job(list(VIDEO_PATHS))
+    start_event_consumer()
+    start_idle_watchdog()
 
 def stop_camera(cam_id):
-    """Detiene hilos de captura y procesamiento"""
-    stop_flags[cam_id] = True
-    if cam_id in active_cams:
-        t1, t2 = active_cams[cam_id]
+    """Detiene hilos de captura y procesamiento y cierra la salida de la cámara"""
+    with cams_lock:
+        stop_flags[cam_id] = True
+        if cam_id not in active_cams:
+            return
+        t1, t2 = active_cams.pop(cam_id)
         t1.join()
         t2.join()
-        del active_cams[cam_id]
+
+        save_checkpoint(cam_id, snapshot_state(cam_id))  # antes de cerrar el clip en curso
+        scheduler.forget(cam_id)
+        stop_incident_recording(cam_id)
+        output = output_stages.pop(cam_id, None)
+        if output:
+            output.close()
+        recorder = recorders.pop(cam_id, None)
+        if recorder:
+            recorder.close()  # cierra el segmento en curso
+    print(f"⏸️ Cámara {cam_id} detenida")
+
+
+# ===============================
+# APAGADO POR INACTIVIDAD
+# ===============================
+_watchdog = None
+_watchdog_lock = threading.Lock()
+
+
+def _idle_loop():
+    while True:
+        time.sleep(5)
+        for cam_id in list(active_cams):
+            if cam_id in ALWAYS_MONITORED:
+                continue
+            if viewers.idle_for(cam_id) > IDLE_GRACE_SEC:
+                print(f"💤 Cámara {cam_id} sin viewers por {IDLE_GRACE_SEC}s → apagando")
+                stop_camera(cam_id)
+
+
+def start_idle_watchdog():
+    global _watchdog
+    with _watchdog_lock:
+        if _watchdog is None or not _watchdog.is_alive():
+            _watchdog = threading.Thread(target=_idle_loop, daemon=True)
+            _watchdog.start()
+
+
+def start_monitored_cameras():
+    """Cámaras con detección permanente (alertas aunque nadie mire)"""
+    for cam_id in ALWAYS_MONITORED:
+        if cam_id in VIDEO_PATHS:
+            start_camera(cam_id)
 
 # ===============================
 # MAIN (solo para pruebas locales)
@@ -0,0 +1,54 @@
+from backend_siv.app.services.config import STOP_FRAMES_THRESHOLD, STOP_DISTANCE_THRESHOLD
+
+# ===============================
+# PARÁMETROS DE CONFIRMACIÓN
+# ===============================
+STOP_CONFIRM_FRAMES = 12  # aumentamos de 8 a 12 para mayor robustez
+MOVE_CONFIRM_FRAMES = 5
+
+
+# ===============================
+# VEHÍCULOS DETENIDOS (SIN ESTADO GLOBAL)
+# ===============================
+# Lógica compartida por el detector en vivo y el reanálisis de sidecars:
+# recibe los dicts de una cámara y los actualiza en el lugar.
+def step_stopped(histories, states, stopped_p, moving_p, current_ids,
+                 stop_frames=STOP_FRAMES_THRESHOLD, stop_distance=STOP_DISTANCE_THRESHOLD,
+                 stop_confirm=STOP_CONFIRM_FRAMES, move_confirm=MOVE_CONFIRM_FRAMES):
+    """Devuelve los ids detenidos confirmados en este frame"""
+    nuevos_detenidos = set()
+    for tid in current_ids:
+        history = histories[tid]
+        if len(history) < stop_frames:
+            continue
+        x0, y0 = history[-stop_frames]
+        x1, y1 = history[-1]
+        dist = ((x1 - x0)**2 + (y1 - y0)**2)**0.5
+        state = states[tid]
+
+        if dist < stop_distance:
+            moving_p[tid] = 0
+            if state == "MOVING":
+                stopped_p[tid] += 1
+                if stopped_p[tid] >= stop_confirm:
+                    states[tid] = "STOPPED_CONFIRMED"
+            if states[tid] == "STOPPED_CONFIRMED":
+                nuevos_detenidos.add(tid)
+        else:
+            stopped_p[tid] = 0
+            if state == "STOPPED_CONFIRMED":
+                moving_p[tid] += 1
+                if moving_p[tid] >= move_confirm:
+                    states[tid] = "MOVING"
+
+    return nuevos_detenidos
+
+
+def forget_missing(histories, states, stopped_p, moving_p, current_ids):
+    """Limpiar tracks de IDs no presentes"""
+    for tid in list(states.keys()):
+        if tid not in current_ids:
+            states.pop(tid, None)
+            stopped_p.pop(tid, None)
+            moving_p.pop(tid, None)
+            histories.pop(tid, None)
@@ -0,0 +1,121 @@
+import os
+import socketserver
+import traceback
+from datetime import datetime
+
+from backend_siv.app.services.config import ENGINE_SOCKET, VIDEO_PATHS
+from backend_siv.app.services.camaras import LocalEngine
+from backend_siv.app.services import ipc
+
+# ===============================
+# MOTOR DE DETECCIÓN STANDALONE
+# ===============================
+# Un único proceso dueño de las cámaras, los hilos y el modelo YOLO.
+# Los workers HTTP (SIV_ENGINE_MODE=remote) le piden status y frames por
+# un socket Unix, así uvicorn puede escalar a varios workers sin duplicar
+# cámaras ni modelos.
+#
+#   python -m backend_siv.app.services.engine
+#   SIV_ENGINE_MODE=remote uvicorn app.main:app --workers 4
+
+engine = None
+
+
+def _dispatch(cmd, params):
+    """Devuelve (cabecera de respuesta, payload)"""
+    cam_id = params.get("cam_id")
+    if cam_id is not None and cam_id not in VIDEO_PATHS:
+        return {"ok": False, "error": "Cámara no encontrada"}, b""
+
+    if cmd == "frame":
+        seq, data, captured = engine.wait_frame(
+            cam_id, params.get("after_seq", 0), params.get("low", False),
+            params.get("timeout"), params.get("viewer_id")
+        )
+        return {"ok": True, "seq": seq, "captured": captured}, data or b""
+    if cmd == "snapshot":
+        seq, data, captured = engine.snapshot(cam_id, params.get("low", False), params.get("timeout"))
+        return {"ok": True, "seq": seq, "captured": captured}, data or b""
+    if cmd == "snapshots":
+        items = engine.snapshots(params.get("cam_ids", []), params.get("low", False))
+        header = [[cid, seq, captured, len(data or b"")] for cid, seq, data, captured in items]
+        return {"ok": True, "items": header}, b"".join(data or b"" for _, _, data, _ in items)
+    if cmd == "fragments":
+        seq, data, mime = engine.wait_fragments(
+            cam_id, params.get("after_seq", 0), params.get("timeout"), params.get("viewer_id")
+        )
+        return {"ok": True, "seq": seq, "mime": mime}, data
+    if cmd == "mosaic":
+        seq, data, captured = engine.wait_mosaic(
+            params.get("cam_ids", []), params.get("cols"), params.get("after_seq", 0), params.get("timeout")
+        )
+        return {"ok": True, "seq": seq, "captured": captured}, data or b""
+    if cmd == "analysis_submit":
+        start = params.get("start_time")
+        try:
+            status = engine.submit_analysis(
+                params["src"], params.get("filename"), params.get("camera_id", 0),
+                datetime.fromisoformat(start) if start else None
+            )
+        except ValueError as e:
+            return {"ok": True, "invalid": str(e)}, b""
+        return {"ok": True, "result": status}, b""
+    if cmd == "wait_events":
+        seq, events = engine.wait_events(params.get("after_seq", 0), params.get("timeout"))
+        return {"ok": True, "seq": seq, "result": events}, b""
+
+    handlers = {
+        "cameras": lambda: engine.cameras(),
+        "start": lambda: engine.start(cam_id),
+        "stop": lambda: engine.stop(cam_id),
+        "status": lambda: engine.status(cam_id),
+        "metrics": lambda: engine.metrics(cam_id),
+        "zones": lambda: engine.zones(cam_id),
+        "open_events": lambda: engine.open_events(cam_id),
+        "analysis_status": lambda: engine.analysis_status(params.get("job_id")),
+        "analysis_result": lambda: engine.analysis_result(params.get("job_id")),
+        "analysis_jobs": lambda: engine.analysis_jobs(),
+        "release_viewer": lambda: engine.release_viewer(
+            cam_id, params.get("viewer_id"), params.get("low", False), params.get("rendition")
+        ),
+    }
+    if cmd not in handlers:
+        return {"ok": False, "error": f"Comando desconocido: {cmd}"}, b""
+    return {"ok": True, "result": handlers[cmd]()}, b""
+
+
+class EngineHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        while True:
+            try:
+                request, _ = ipc.recv_msg(self.request)
+            except (ConnectionError, OSError):
+                return
+            cmd = request.pop("cmd", None)
+            try:
+                header, payload = _dispatch(cmd, request)
+            except Exception as e:
+                traceback.print_exc()
+                header, payload = {"ok": False, "error": str(e)}, b""
+            try:
+                ipc.send_msg(self.request, header, payload)
+            except OSError:
+                return
+
+
+class EngineServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(path=ENGINE_SOCKET):
+    global engine
+    engine = LocalEngine()
+    if os.path.exists(path):
+        os.remove(path)  # socket de una ejecución anterior
+    with EngineServer(path, EngineHandler) as server:
+        print(f"🧠 Motor de detección escuchando en {path}")
+        server.serve_forever()
+
+
+if __name__ == "__main__":
+    serve()
@@ -0,0 +1,137 @@
+import os
+import mimetypes
+from email.utils import formatdate, parsedate_to_datetime
+
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+
+from backend_siv.app.services.config import STREAM_CHUNK_SIZE, VIDEO_FOLDERS
+
+mimetypes.add_type("application/vnd.apple.mpegurl", ".m3u8")
+mimetypes.add_type("video/mp2t", ".ts")
+
+
+# ===============================
+# RESOLVER RUTAS (SIN TRAVERSAL)
+# ===============================
+def resolve_video_path(folder, relpath):
+    base = VIDEO_FOLDERS.get(folder)
+    if not base:
+        raise HTTPException(status_code=404, detail="Carpeta no encontrada")
+    base = os.path.realpath(base)
+    path = os.path.realpath(os.path.join(base, relpath))
+    if os.path.commonpath([base, path]) != base or not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Archivo no encontrado")
+    return path
+
+
+# ===============================
+# CACHÉ HTTP
+# ===============================
+def file_etag(stat):
+    return f'"{stat.st_size:x}-{int(stat.st_mtime * 1000):x}"'
+
+
+def _not_modified(request, etag, mtime):
+    inm = request.headers.get("if-none-match")
+    if inm is not None:
+        return etag in [t.strip() for t in inm.split(",")] or inm.strip() == "*"
+    ims = request.headers.get("if-modified-since")
+    if ims:
+        try:
+            return int(mtime) <= parsedate_to_datetime(ims).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _parse_range(header, size):
+    """
+    Interpreta 'bytes=a-b', 'bytes=a-' y 'bytes=-n'. Solo se atiende el primer rango;
+    devuelve (inicio, fin) inclusivo, None si el header no es válido
+    o lanza 416 si el rango no se puede satisfacer.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or not spec:
+        return None
+    first = spec.split(",")[0].strip()
+    start_s, sep, end_s = first.partition("-")
+    if not sep:
+        return None
+    try:
+        if start_s == "":
+            length = int(end_s)
+            if length <= 0:
+                raise ValueError
+            start, end = max(size - length, 0), size - 1
+        else:
+            start = int(start_s)
+            end = int(end_s) if end_s else size - 1
+    except ValueError:
+        return None
+
+    if start >= size or start > end:
+        raise HTTPException(
+            status_code=416,
+            detail="Rango no satisfacible",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+    return start, min(end, size - 1)
+
+
+def _iter_file(path, start, length):
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = f.read(min(STREAM_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+# ===============================
+# RESPUESTA CON SOPORTE RANGE
+# ===============================
+def range_file_response(request: Request, path, media_type=None, max_age=3600):
+    """
+    Entrega un archivo con Accept-Ranges / 206 Partial Content,
+    ETag y Last-Modified (304 si el cliente ya lo tiene).
+    """
+    stat = os.stat(path)
+    size = stat.st_size
+    etag = file_etag(stat)
+    media_type = media_type or mimetypes.guess_type(path)[0] or "application/octet-stream"
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+        "Cache-Control": f"private, max-age={max_age}",
+    }
+
+    if _not_modified(request, etag, stat.st_mtime):
+        return Response(status_code=304, headers=headers)
+
+    byte_range = None
+    range_header = request.headers.get("range")
+    if range_header and size:
+        # If-Range: si el archivo cambió se entrega completo
+        if_range = request.headers.get("if-range")
+        if not if_range or if_range.strip() == etag:
+            byte_range = _parse_range(range_header, size)
+
+    if byte_range is None:
+        headers["Content-Length"] = str(size)
+        return StreamingResponse(_iter_file(path, 0, size), media_type=media_type, headers=headers)
+
+    start, end = byte_range
+    length = end - start + 1
+    headers["Content-Length"] = str(length)
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return StreamingResponse(
+        _iter_file(path, start, length),
+        status_code=206,
+        media_type=media_type,
+        headers=headers
+    )
@@ -0,0 +1,41 @@
+from sqlalchemy import inspect, text
+
+
+# ===============================
+# COLUMNAS NUEVAS EN BASES YA CREADAS
+# ===============================
+def ensure_columns(bind, table):
+    """
+    create_all no altera tablas existentes: agrega las columnas e índices del
+    modelo que falten. Las columnas se agregan NULL (las filas viejas no tienen
+    valor) y se rellenan con el default del modelo si es un valor fijo; las
+    claves foráneas nuevas no se agregan. Devuelve los nombres agregados.
+    """
+    insp = inspect(bind)
+    if not insp.has_table(table.name):
+        return []
+    existing = {c["name"] for c in insp.get_columns(table.name)}
+    indexes = {i["name"] for i in insp.get_indexes(table.name)}
+    quote = bind.dialect.identifier_preparer.quote
+    added = []
+    with bind.begin() as conn:
+        for col in table.columns:
+            if col.name in existing:
+                continue
+            print(f"🛠️ Agregando {table.name}.{col.name}...")
+            col_type = col.type.compile(dialect=bind.dialect)
+            conn.execute(text(f"ALTER TABLE {quote(table.name)} ADD COLUMN {quote(col.name)} {col_type} NULL"))
+            if col.default is not None and col.default.is_scalar:
+                conn.execute(
+                    text(f"UPDATE {quote(table.name)} SET {quote(col.name)} = :value"),
+                    {"value": col.default.arg},
+                )
+            added.append(col.name)
+        for index in table.indexes:
+            # los índices de texto (FULLTEXT / FTS5) los maneja busqueda.ensure_search_index
+            if index.name in indexes or index.kwargs.get("mysql_prefix"):
+                continue
+            print(f"🛠️ Creando índice {index.name}...")
+            index.create(conn)
+            added.append(index.name)
+    return added
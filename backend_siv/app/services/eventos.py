@@ -0,0 +1,198 @@
+import time
+import queue
+import threading
+from collections import deque
+from datetime import datetime
+
+from app import models
+from app.database import SessionLocal
+from backend_siv.app.services.config import (
+    EVENT_MERGE_SEC, EVENT_FLUSH_SEC, EVENT_BATCH_SIZE,
+    EVENT_DRAFT_STATUS, EVENT_TYPES
+)
+
+
+# ===============================
+# BUS DE EVENTOS DEL DETECTOR
+# ===============================
+class EventBus:
+    """
+    El detector publica eventos tipados en cada frame mientras la condición dura.
+    Por cámara y tipo se mantiene un evento "abierto": lo que llega antes de
+    EVENT_MERGE_SEC de silencio se fusiona con él (contador, ids, última vez) y
+    solo la apertura se entrega al consumidor y a los suscriptores.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._open = {}            # (cam_id, tipo) -> evento abierto
+        self.pending = queue.Queue()
+        self._recent = deque(maxlen=200)  # aperturas recientes para long-poll / SSE
+        self._seq = 0
+
+    def publish(self, cam_id, tipo, ids=None, clip_meta=None, now=None):
+        """Devuelve el evento nuevo, o None si se fusionó con uno abierto"""
+        if tipo not in EVENT_TYPES:
+            raise ValueError(f"Tipo de evento desconocido: {tipo}")
+        now = now or time.time()
+        key = (cam_id, tipo)
+        with self._lock:
+            event = self._open.get(key)
+            if event and now - event["last"] < EVENT_MERGE_SEC:
+                event["last"] = now
+                event["count"] += 1
+                if ids:
+                    event["ids"].update(ids)
+                if clip_meta and not event["clip_meta"]:
+                    event["clip_meta"] = clip_meta
+                return None
+
+            self._seq += 1
+            event = {
+                "seq": self._seq,
+                "cam_id": cam_id,
+                "tipo": tipo,
+                "first": now,
+                "last": now,
+                "count": 1,
+                "ids": set(ids or ()),
+                "clip_meta": clip_meta,
+                "incidente_id": None,
+            }
+            self._open[key] = event
+            self._recent.append(event)
+            self._cond.notify_all()
+
+        self.pending.put(event)
+        return event
+
+    def wait_events(self, after_seq=0, timeout=None):
+        """(último seq, aperturas con seq > after_seq); espera hasta timeout si no hay ninguna"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq > after_seq, timeout)
+            return self._seq, [self.to_message(e) for e in self._recent if e["seq"] > after_seq]
+
+    @property
+    def last_seq(self):
+        return self._seq
+
+    def open_events(self, cam_id=None, now=None):
+        now = now or time.time()
+        with self._lock:
+            return [
+                self.to_message(e) for (cid, _), e in self._open.items()
+                if now - e["last"] < EVENT_MERGE_SEC and (cam_id is None or cid == cam_id)
+            ]
+
+    def restore(self, messages, now=None):
+        """
+        Reabre eventos guardados en un checkpoint para que, tras reiniciar, la
+        condición que sigue activa se fusione con ellos en vez de crear otro
+        borrador. No se re-anuncian (no entran a _recent ni al consumidor).
+        """
+        now = now or time.time()
+        with self._lock:
+            for m in messages:
+                if m.get("incidente_id") is None or now - m["last"] >= EVENT_MERGE_SEC:
+                    continue  # sin borrador creado todavía: que se vuelva a abrir
+                key = (m["cam_id"], m["tipo"])
+                if key in self._open:
+                    continue
+                self._open[key] = {
+                    "seq": m["seq"],
+                    "cam_id": m["cam_id"],
+                    "tipo": m["tipo"],
+                    "first": m["first"],
+                    "last": m["last"],
+                    "count": m["count"],
+                    "ids": set(m["ids"]),
+                    "clip_meta": None,
+                    "incidente_id": m["incidente_id"],
+                }
+
+    @staticmethod
+    def to_message(event):
+        return {
+            "seq": event["seq"],
+            "cam_id": event["cam_id"],
+            "tipo": event["tipo"],
+            "first": event["first"],
+            "last": event["last"],
+            "count": event["count"],
+            "ids": sorted(event["ids"]),
+            "incidente_id": event["incidente_id"],
+        }
+
+
+event_bus = EventBus()
+
+
+# ===============================
+# CONSUMIDOR: BORRADORES DE INCIDENTE
+# ===============================
+def _draft_incidente(event):
+    tipo_incidente, prioridad = EVENT_TYPES[event["tipo"]]
+    start = datetime.fromtimestamp(event["first"])
+    meta = event["clip_meta"]
+    ids = sorted(event["ids"])
+    return models.Incidente(
+        type=tipo_incidente,
+        priority=prioridad,
+        camera=str(event["cam_id"]),
+        start_date=start.date(),
+        start_time=start.time().replace(microsecond=0),
+        observacion=f"Detección automática ({event['tipo']})" + (f" ids: {ids[:10]}" if ids else ""),
+        pista=[],
+        trabajos_via=[],
+        status=EVENT_DRAFT_STATUS,
+        clip=meta["path"].replace("\\", "/").rsplit("/", 1)[-1] if meta else None,
+        created_at=datetime.utcnow(),
+    )
+
+
+def _insert_batch(events):
+    db = SessionLocal()
+    try:
+        rows = [_draft_incidente(e) for e in events]
+        db.add_all(rows)
+        db.commit()  # una sola transacción por lote
+        for event, row in zip(events, rows):
+            event["incidente_id"] = row.id
+            meta = event["clip_meta"]
+            # el clip en curso hereda el id para el catálogo
+            if meta and meta.get("incidente_id") is None:
+                meta["incidente_id"] = row.id
+        print(f"🚨 {len(rows)} incidente(s) borrador creados desde el detector")
+    except Exception as e:
+        db.rollback()
+        print(f"⚠️ No se pudieron crear {len(events)} borrador(es) → {e}")
+    finally:
+        db.close()
+
+
+def _consumer_loop(bus):
+    while True:
+        batch = [bus.pending.get()]
+        deadline = time.time() + EVENT_FLUSH_SEC
+        while len(batch) < EVENT_BATCH_SIZE:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(bus.pending.get(timeout=remaining))
+            except queue.Empty:
+                break
+        _insert_batch(batch)
+
+
+_consumer = None
+_consumer_lock = threading.Lock()
+
+
+def start_event_consumer(bus=event_bus):
+    global _consumer
+    with _consumer_lock:
+        if _consumer is None or not _consumer.is_alive():
+            _consumer = threading.Thread(target=_consumer_loop, args=(bus,), daemon=True)
+            _consumer.start()
@@ -0,0 +1,147 @@
+import io
+import csv
+import json
+import zlib
+from datetime import date, time, datetime
+
+from sqlalchemy import types as sqltypes
+
+from app.database import SessionLocal
+from backend_siv.app.services.config import EXPORT_CHUNK_ROWS
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet es opcional
+    pa = None
+    pq = None
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+
+# ===============================
+# LECTURA POR LOTES
+# ===============================
+def iter_chunks(stmt):
+    """
+    Ejecuta un select() de columnas con cursor del lado del servidor
+    (yield_per => stream_results) y entrega listas de tuplas de EXPORT_CHUNK_ROWS.
+    Abre su propia sesión: la del request ya se cerró cuando el stream corre.
+    """
+    db = SessionLocal()
+    try:
+        result = db.execute(stmt.execution_options(yield_per=EXPORT_CHUNK_ROWS))
+        for part in result.partitions():
+            yield [tuple(row) for row in part]
+    finally:
+        db.close()
+
+
+def _cell(value):
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(value, (date, time, datetime)):
+        return value.isoformat()
+    return value
+
+
+# ===============================
+# CSV
+# ===============================
+def csv_stream(columns, chunks):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(columns)
+    for rows in chunks:
+        writer.writerows([_cell(v) for v in row] for row in rows)
+        yield buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
+
+
+# ===============================
+# PARQUET
+# ===============================
+class _ChunkSink(io.RawIOBase):
+    """Archivo de solo escritura que acumula bytes hasta que el stream los drena"""
+
+    def __init__(self):
+        self.parts = []
+        self.pos = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.parts.append(bytes(b))
+        self.pos += len(b)
+        return len(b)
+
+    def tell(self):
+        return self.pos
+
+    def drain(self):
+        data = b"".join(self.parts)
+        self.parts = []
+        return data
+
+
+def _arrow_type(sql_type):
+    if isinstance(sql_type, sqltypes.Integer):
+        return pa.int64()
+    if isinstance(sql_type, sqltypes.Float):
+        return pa.float64()
+    if isinstance(sql_type, sqltypes.DateTime):
+        return pa.timestamp("us")
+    if isinstance(sql_type, sqltypes.Date):
+        return pa.date32()
+    if isinstance(sql_type, sqltypes.Time):
+        return pa.time64("us")
+    return pa.string()
+
+
+def parquet_stream(stmt, chunks):
+    """Un row group por lote: la memoria del servidor no depende del total de filas"""
+    schema = pa.schema([(c.name, _arrow_type(c.type)) for c in stmt.selected_columns])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    for rows in chunks:
+        arrays = []
+        for i, field in enumerate(schema):
+            values = [row[i] for row in rows]
+            if field.type == pa.string():
+                values = [None if v is None else str(_cell(v)) for v in values]
+            arrays.append(pa.array(values, type=field.type))
+        writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+# ===============================
+# GZIP AL VUELO
+# ===============================
+def gzip_stream(stream):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31 = formato gzip
+    for data in stream:
+        out = compressor.compress(data)
+        if out:
+            yield out
+    yield compressor.flush()
+
+
+def export_stream(stmt, formato="csv", gzip=False):
+    """Generador de bytes listo para StreamingResponse"""
+    if formato == "parquet" and pa is None:
+        raise RuntimeError("pyarrow no está instalado")
+    chunks = iter_chunks(stmt)
+    if formato == "parquet":
+        stream = parquet_stream(stmt, chunks)
+    else:
+        stream = csv_stream([c.name for c in stmt.selected_columns], chunks)
+    return gzip_stream(stream) if gzip else stream
@@ -0,0 +1,208 @@
+import time
+import struct
+import threading
+from collections import deque
+from fractions import Fraction
+
+from backend_siv.app.services.config import (
+    FMP4_CODEC, FMP4_PRESET, FMP4_BITRATE, FMP4_GOP_SEC, FMP4_BUFFER_FRAGMENTS
+)
+
+try:
+    import av
+except ImportError:  # PyAV es opcional: sin él solo hay MJPEG
+    av = None
+
+# Media Source Extensions necesita el codec exacto; se completa con el SPS real
+DEFAULT_MIME = 'video/mp4; codecs="avc1.42E01F"'
+
+
+def available():
+    return av is not None
+
+
+# ===============================
+# FRAGMENTOS EN MEMORIA (BROADCAST)
+# ===============================
+class FragmentHub:
+    """
+    Como FrameHub pero con historia: H.264 necesita todos los fragmentos desde
+    un keyframe. Guarda el segmento de inicialización (ftyp+moov) y los últimos
+    fragmentos (moof+mdat); un viewer nuevo, o uno que quedó atrás del buffer,
+    recibe init + fragmentos desde el último keyframe y arranca al instante.
+    """
+
+    def __init__(self, maxlen=FMP4_BUFFER_FRAGMENTS):
+        self._cond = threading.Condition()
+        self.seq = 0
+        self.init = None
+        self.init_seq = 0      # seq en que cambió el init (reinicio del encoder)
+        self.mime = DEFAULT_MIME
+        self.fragments = deque(maxlen=maxlen)  # (seq, data, keyframe)
+        self.last_key_seq = 0
+
+    def set_init(self, data, mime=None):
+        with self._cond:
+            self.init = data
+            self.init_seq = self.seq + 1
+            self.mime = mime or DEFAULT_MIME
+            self.fragments.clear()
+            self.last_key_seq = 0
+
+    def publish(self, data, keyframe):
+        with self._cond:
+            self.seq += 1
+            if keyframe:
+                self.last_key_seq = self.seq
+            self.fragments.append((self.seq, data, keyframe))
+            self._cond.notify_all()
+
+    def _resync(self, after_seq):
+        oldest = self.fragments[0][0] if self.fragments else self.seq + 1
+        return after_seq < self.init_seq or after_seq + 1 < oldest
+
+    def read(self, after_seq=0, timeout=None):
+        """
+        (seq, bytes) con todo lo posterior a after_seq; si hace falta resincronizar,
+        bytes empieza con el init y sigue desde el último keyframe. bytes vacío = timeout.
+        """
+        with self._cond:
+            ready = lambda: self.init is not None and self.last_key_seq and (
+                self.seq > after_seq or self._resync(after_seq)
+            )
+            self._cond.wait_for(ready, timeout)
+            if not ready():
+                return after_seq, b""
+            if self._resync(after_seq):
+                parts = [self.init] + [d for s, d, _ in self.fragments if s >= self.last_key_seq]
+            else:
+                parts = [d for s, d, _ in self.fragments if s > after_seq]
+            return self.seq, b"".join(parts)
+
+
+# ===============================
+# ENCODER H.264 → MP4 FRAGMENTADO
+# ===============================
+class _BoxSink:
+    """Archivo de salida para PyAV que separa las cajas MP4 de primer nivel"""
+
+    def __init__(self):
+        self.buf = bytearray()
+        self.boxes = []
+
+    def write(self, data):
+        self.buf += data
+        while len(self.buf) >= 8:
+            size = struct.unpack(">I", self.buf[:4])[0]
+            if size < 8 or len(self.buf) < size:
+                break
+            self.boxes.append((bytes(self.buf[4:8]), bytes(self.buf[:size])))
+            del self.buf[:size]
+        return len(data)
+
+    def seek(self, *args):
+        raise OSError("no seekable")
+
+    def tell(self):
+        return 0
+
+    def flush(self):
+        pass
+
+
+class Fmp4Encoder:
+    """
+    Codifica los frames anotados de una cámara una sola vez y publica en el hub:
+    un fragmento por frame (frag_every_frame) y un keyframe cada FMP4_GOP_SEC.
+    Si nadie miró por más de un GOP, reabre el encoder: el video arranca en un
+    keyframe nuevo en vez de saltar desde uno viejo.
+    """
+
+    def __init__(self, hub, fps):
+        if av is None:
+            raise RuntimeError("PyAV no está instalado")
+        self.hub = hub
+        self.fps = fps
+        self.encoded = 0
+        self.encode_ms = 0.0
+        self._container = None
+        self._last_captured = 0.0
+
+    def _open(self, size):
+        self._sink = _BoxSink()
+        self._container = av.open(
+            self._sink, mode="w", format="mp4",
+            options={"movflags": "empty_moov+default_base_moof+frag_every_frame"},
+        )
+        stream = self._container.add_stream(FMP4_CODEC, rate=round(self.fps))
+        stream.width, stream.height = size
+        stream.pix_fmt = "yuv420p"
+        stream.bit_rate = FMP4_BITRATE
+        stream.codec_context.time_base = Fraction(1, 1000)
+        stream.options = {
+            "preset": FMP4_PRESET, "tune": "zerolatency", "profile": "baseline",
+            "g": str(max(1, round(self.fps * FMP4_GOP_SEC))),
+        }
+        self._stream = stream
+        self._keys = deque()  # keyframe de cada paquete muxeado, en orden
+        self._t0 = None
+        self._last_pts = -1
+        self._pending = None  # moof esperando su mdat
+        self._ftyp = b""
+
+    def encode(self, frame, captured=None):
+        t0 = time.perf_counter()
+        captured = captured or time.time()
+        if self._container is not None and captured - self._last_captured > FMP4_GOP_SEC:
+            self.close()
+        if self._container is None:
+            self._open((frame.shape[1], frame.shape[0]))
+        self._last_captured = captured
+        if self._t0 is None:
+            self._t0 = captured
+        # pts en ms desde la captura: los frames descartados no desincronizan el video
+        pts = max(self._last_pts + 1, int((captured - self._t0) * 1000))
+        self._last_pts = pts
+        vf = av.VideoFrame.from_ndarray(frame, format="bgr24")
+        vf.pts, vf.time_base = pts, Fraction(1, 1000)
+        for packet in self._stream.encode(vf):
+            self._keys.append(packet.is_keyframe)
+            self._container.mux(packet)
+        self._collect()
+        elapsed = (time.perf_counter() - t0) * 1000
+        self.encode_ms = elapsed if not self.encoded else 0.9 * self.encode_ms + 0.1 * elapsed
+        self.encoded += 1
+
+    def _collect(self):
+        boxes, self._sink.boxes = self._sink.boxes, []
+        for kind, data in boxes:
+            if kind == b"ftyp":
+                self._ftyp = data
+            elif kind == b"moov":
+                self.hub.set_init(self._ftyp + data, self._mime(data))
+            elif kind == b"moof":
+                self._pending = data
+            elif kind == b"mdat" and self._pending is not None:
+                key = self._keys.popleft() if self._keys else False
+                self.hub.publish(self._pending + data, key)
+                self._pending = None
+
+    def _mime(self, moov):
+        # avcC: versión (1) + perfil, compatibilidad y nivel → codecs="avc1.PPCCLL"
+        i = moov.find(b"avcC")
+        if i < 0:
+            return DEFAULT_MIME
+        profile = moov[i + 5:i + 8].hex().upper()
+        return f'video/mp4; codecs="avc1.{profile}"'
+
+    def close(self):
+        if self._container is not None:
+            try:
+                for packet in self._stream.encode(None):
+                    self._keys.append(packet.is_keyframe)
+                    self._container.mux(packet)
+                self._container.close()
+                self._collect()
+            except Exception:
+                pass
+            self._container = None
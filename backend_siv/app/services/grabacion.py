@@ -0,0 +1,347 @@
+import os
+import cv2
+import json
+import time
+import queue
+import bisect
+import threading
+
+from backend_siv.app.services.config import (
+    GENERATED_DIR, SEGMENT_SEC, SEGMENT_QUEUE_SIZE,
+    RETENTION_INTERVAL_SEC, RETENTION_MAX_AGE_HOURS,
+    RETENTION_MAX_BYTES, RETENTION_OVERRIDES, SIDECAR_ENABLED
+)
+from backend_siv.app.services.media import faststart
+from backend_siv.app.services.sidecar import SidecarWriter
+
+PART_SUFFIX = ".part.mp4"
+PART_FASTSTART_SUFFIX = ".part.faststart.mp4"  # temporal de media.faststart sobre un .part.mp4
+INDEX_NAME = "index.jsonl"
+
+# índice en memoria por carpeta: ruta -> ((mtime, tamaño), [entradas])
+_index_cache = {}
+_index_lock = threading.RLock()
+
+
+def camera_dir(cam_id):
+    return os.path.join(GENERATED_DIR, f"cam{cam_id}")
+
+
+# ===============================
+# ÍNDICE DE SEGMENTOS
+# ===============================
+def _index_path(cam_id):
+    return os.path.join(camera_dir(cam_id), INDEX_NAME)
+
+
+def load_index(cam_id):
+    """Entradas {file, start, end, frames, size} ordenadas por inicio"""
+    path = _index_path(cam_id)
+    if not os.path.exists(path):
+        return []
+    with _index_lock:
+        st = os.stat(path)
+        key = (st.st_mtime_ns, st.st_size)
+        cached = _index_cache.get(path)
+        if cached and cached[0] == key:
+            return cached[1]
+        entries = []
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    entries.append(json.loads(line))
+        entries.sort(key=lambda e: e["start"])
+        _index_cache[path] = (key, entries)
+        return entries
+
+
+def _append_index(cam_id, entry):
+    with _index_lock:
+        with open(_index_path(cam_id), "a") as f:
+            f.write(json.dumps(entry) + "\n")
+
+
+def _rewrite_index(cam_id, entries):
+    path = _index_path(cam_id)
+    tmp = path + ".tmp"
+    with _index_lock:
+        with open(tmp, "w") as f:
+            for e in entries:
+                f.write(json.dumps(e) + "\n")
+        os.replace(tmp, path)
+
+
+def find_segments(cam_id, desde=None, hasta=None):
+    """Segmentos que se solapan con [desde, hasta] (timestamps epoch)"""
+    entries = load_index(cam_id)
+    if hasta is not None:
+        # solo segmentos que empiezan antes del fin del rango
+        entries = entries[:bisect.bisect_right([e["start"] for e in entries], hasta)]
+    if desde is not None:
+        entries = [e for e in entries if e["end"] >= desde]
+    return entries
+
+
+# ===============================
+# ESCRITOR SEGMENTADO POR CÁMARA
+# ===============================
+class SegmentRecorder:
+    """
+    Graba en segmentos de SEGMENT_SEC en su propio hilo.
+    Cada segmento se escribe como .part.mp4 y solo al cerrarse se renombra
+    (os.replace) y se agrega al índice, así un crash nunca deja un segmento
+    "final" corrupto. Al rotar, el hilo escritor abre el segmento siguiente y
+    entrega el anterior a un hilo de cierre (release, faststart, rename e
+    índice): la cola de frames no espera al remux.
+    """
+
+    def __init__(self, cam_id, fps, size, class_names=None):
+        self.cam_id = cam_id
+        self.fps = fps
+        self.size = size
+        self.class_names = class_names
+        self._sidecar = None
+        self.out_dir = camera_dir(cam_id)
+        os.makedirs(self.out_dir, exist_ok=True)
+        self._discard_partials()
+
+        self.frames = queue.Queue(maxsize=SEGMENT_QUEUE_SIZE)
+        self.dropped = 0
+        self._writer = None
+        self._part_path = None
+        self._start = None
+        self._count = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+        # segmentos cerrados en orden: un solo hilo mantiene el índice ordenado
+        self._pending = queue.Queue()
+        self._finalizer = threading.Thread(target=self._finalize_loop, daemon=True)
+        self._finalizer.start()
+
+    def _discard_partials(self):
+        # restos de un proceso que murió sin cerrar su segmento (sin moov, ilegibles)
+        # o en medio del faststart de uno
+        for name in os.listdir(self.out_dir):
+            if name.endswith((PART_SUFFIX, PART_FASTSTART_SUFFIX)):
+                os.remove(os.path.join(self.out_dir, name))
+                print(f"🧹 Segmento incompleto descartado: {name}")
+
+    def write(self, frame, dets=None):
+        """
+        No bloquea: si el escritor va atrasado se descarta el frame más viejo.
+        dets (ver sidecar.pack_detections) viaja con su frame al sidecar del segmento.
+        """
+        if self.frames.full():
+            try:
+                self.frames.get_nowait()
+                self.dropped += 1
+            except queue.Empty:
+                pass
+        try:
+            self.frames.put_nowait((frame, dets))
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        self._stop.set()
+        # sin timeout: el escritor entrega su último segmento antes del None
+        self._thread.join()
+        self._pending.put(None)
+        self._finalizer.join(timeout=60)
+
+    def _loop(self):
+        while not self._stop.is_set() or not self.frames.empty():
+            try:
+                frame, dets = self.frames.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            now = time.time()
+            if self._writer is None or now - self._start >= SEGMENT_SEC:
+                closed = self._detach(now)
+                self._open(now, (frame.shape[1], frame.shape[0]))
+                if closed:
+                    self._pending.put(closed)
+            if (frame.shape[1], frame.shape[0]) != self.size:
+                frame = cv2.resize(frame, self.size)
+            self._writer.write(frame)
+            if self._sidecar is not None:
+                self._sidecar.add(dets)
+            self._count += 1
+        closed = self._detach(time.time())
+        if closed:
+            self._pending.put(closed)
+
+    def _open(self, now, frame_size):
+        stamp = time.strftime("%Y%m%d_%H%M%S", time.localtime(now))
+        self._part_path = os.path.join(self.out_dir, f"cam{self.cam_id}_{stamp}{PART_SUFFIX}")
+        self._writer = cv2.VideoWriter(
+            self._part_path,
+            cv2.VideoWriter_fourcc(*"avc1"),
+            self.fps,
+            self.size
+        )
+        if not self._writer.isOpened():
+            print(f"⚠️ No se pudo abrir el segmento {self._part_path}")
+        if SIDECAR_ENABLED:
+            # coordenadas de las cajas en el frame original (antes del resize)
+            self._sidecar = SidecarWriter(self.cam_id, self.fps, frame_size, self.class_names)
+        self._start = now
+        self._count = 0
+
+    def _detach(self, now):
+        """Suelta el segmento actual sin cerrarlo: (writer, part, inicio, fin, frames, sidecar)"""
+        if self._writer is None:
+            return None
+        closed = (self._writer, self._part_path, self._start, now, self._count, self._sidecar)
+        self._writer = None
+        self._sidecar = None
+        return closed
+
+    def _finalize_loop(self):
+        while True:
+            closed = self._pending.get()
+            if closed is None:
+                return
+            try:
+                self._finalize(*closed)
+            except Exception as e:
+                print(f"⚠️ No se pudo cerrar el segmento {closed[1]} → {e}")
+
+    def _finalize(self, writer, part, start, end, count, sidecar):
+        writer.release()
+        if not os.path.exists(part):
+            return
+        if not count:
+            os.remove(part)
+            return
+
+        faststart(part)
+        final = part[:-len(PART_SUFFIX)] + ".mp4"
+        os.replace(part, final)
+        entry = {
+            "file": os.path.basename(final),
+            "start": start,
+            "end": end,
+            "frames": count,
+            "size": os.path.getsize(final),
+        }
+        sidecar_file = sidecar.save(final) if sidecar is not None else None
+        if sidecar_file:
+            entry["sidecar"] = os.path.basename(sidecar_file)
+            entry["size"] += os.path.getsize(sidecar_file)  # cuenta para la cuota
+        _append_index(self.cam_id, entry)
+        print(f"💾 Segmento cámara {self.cam_id} → {os.path.basename(final)}")
+
+
+# ===============================
+# CLIP DE INCIDENTE (HILO PROPIO)
+# ===============================
+class ClipWriter:
+    """
+    Escritor de un único clip. write() solo encola; la codificación y el
+    release() (que escribe el moov) ocurren en el hilo del clip.
+    on_close(path) se llama desde ese hilo cuando el archivo está completo.
+    """
+
+    def __init__(self, path, fps, size, on_close=None, class_names=None, cam_id=None):
+        self.path = path
+        self.fps = fps
+        self.size = size
+        self.on_close = on_close
+        self.sidecar = SidecarWriter(cam_id, fps, size, class_names) if SIDECAR_ENABLED else None
+        self.frames = queue.Queue(maxsize=SEGMENT_QUEUE_SIZE)
+        self.dropped = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def write(self, frame, dets=None):
+        try:
+            self.frames.put_nowait((frame, dets))
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        """No bloquea: el hilo vacía la cola, cierra el archivo y avisa"""
+        self._stop.set()
+
+    def join(self, timeout=None):
+        self._thread.join(timeout)
+
+    def _loop(self):
+        writer = cv2.VideoWriter(
+            self.path,
+            cv2.VideoWriter_fourcc(*"avc1"),
+            self.fps,
+            self.size
+        )
+        while not self._stop.is_set() or not self.frames.empty():
+            try:
+                frame, dets = self.frames.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            writer.write(frame)
+            if self.sidecar is not None:
+                self.sidecar.add(dets)
+        writer.release()
+        if self.sidecar is not None:
+            self.sidecar.save(self.path)
+        if self.on_close:
+            try:
+                self.on_close(self.path)
+            except Exception as e:
+                print(f"⚠️ Error al cerrar clip {self.path} → {e}")
+
+
+# ===============================
+# RETENCIÓN (EDAD + CUOTA)
+# ===============================
+def enforce_retention(cam_id, now=None):
+    """Borra segmentos más viejos que max_age y luego los más antiguos hasta entrar en cuota"""
+    now = now or time.time()
+    policy = RETENTION_OVERRIDES.get(cam_id, {})
+    max_age = policy.get("max_age_hours", RETENTION_MAX_AGE_HOURS) * 3600
+    max_bytes = policy.get("max_bytes", RETENTION_MAX_BYTES)
+
+    with _index_lock:
+        entries = load_index(cam_id)
+        keep = [e for e in entries if now - e["end"] <= max_age]
+        total = sum(e["size"] for e in keep)
+        while keep and total > max_bytes:
+            total -= keep.pop(0)["size"]
+
+        removed = [e for e in entries if e not in keep]
+        if not removed:
+            return 0
+        # primero el índice: un segmento nunca queda indexado sin archivo
+        _rewrite_index(cam_id, keep)
+    for e in removed:
+        for name in (e["file"], e.get("sidecar")):
+            path = os.path.join(camera_dir(cam_id), name) if name else None
+            if path and os.path.exists(path):
+                os.remove(path)
+    print(f"🗑️ Retención cámara {cam_id}: {len(removed)} segmento(s) eliminados")
+    return len(removed)
+
+
+_retention_thread = None
+
+
+def start_retention_job(cam_ids):
+    global _retention_thread
+    if _retention_thread is not None and _retention_thread.is_alive():
+        return
+
+    def loop():
+        while True:
+            for cid in cam_ids:
+                try:
+                    enforce_retention(cid)
+                except Exception as e:
+                    print(f"⚠️ Retención cámara {cid} falló → {e}")
+            time.sleep(RETENTION_INTERVAL_SEC)
+
+    _retention_thread = threading.Thread(target=loop, daemon=True)
+    _retention_thread.start()
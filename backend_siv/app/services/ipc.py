@@ -0,0 +1,39 @@
+import json
+import socket
+import struct
+
+# ===============================
+# PROTOCOLO DEL SOCKET DEL MOTOR
+# ===============================
+# Cada mensaje: cabecera ">II" (largo JSON, largo payload) + JSON + payload binario.
+# El payload lleva el JPEG en las respuestas de frames; vacío en el resto.
+_HEADER = struct.Struct(">II")
+
+
+def send_msg(sock, header, payload=b""):
+    body = json.dumps(header, default=str).encode("utf-8")
+    sock.sendall(_HEADER.pack(len(body), len(payload)) + body + payload)
+
+
+def _recv_exact(sock, n):
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionError("Socket cerrado")
+        buf.extend(chunk)
+    return bytes(buf)
+
+
+def recv_msg(sock):
+    body_len, payload_len = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    header = json.loads(_recv_exact(sock, body_len))
+    payload = _recv_exact(sock, payload_len) if payload_len else b""
+    return header, payload
+
+
+def connect(path, timeout=None):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    sock.connect(path)
+    return sock
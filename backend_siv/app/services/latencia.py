@@ -0,0 +1,84 @@
+import time
+import numpy as np
+from collections import deque
+
+from backend_siv.app.services.config import LATENCY_WINDOW
+
+
+# ===============================
+# REGISTRO POR FRAME
+# ===============================
+class FrameRecord:
+    """
+    Un frame y su reloj: se crea en la captura y cada etapa marca su tiempo
+    (epoch) al terminar. __slots__ porque se crea uno por frame por cámara.
+    """
+    __slots__ = (
+        "cam_id", "seq", "frame", "captured",
+        "dequeued", "inferred", "rendered", "encoded", "published",
+    )
+
+    def __init__(self, cam_id, seq, frame, captured=None):
+        self.cam_id = cam_id
+        self.seq = seq
+        self.frame = frame
+        self.captured = captured or time.time()
+        self.dequeued = None
+        self.inferred = None
+        self.rendered = None
+        self.encoded = None
+        self.published = None
+
+    def age(self, now=None):
+        return (now or time.time()) - self.captured
+
+
+# (nombre, desde, hasta) de cada tramo medido
+STAGES = (
+    ("cola_captura", "captured", "dequeued"),
+    ("inferencia", "dequeued", "inferred"),
+    ("render", "inferred", "rendered"),
+    ("salida", "rendered", "encoded"),
+    ("total_publicado", "captured", "published"),
+)
+
+
+# ===============================
+# DISTRIBUCIÓN DE LATENCIAS POR CÁMARA
+# ===============================
+class LatencyStats:
+    """Ventana deslizante por etapa; los percentiles se calculan al consultar"""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self._samples = {name: deque(maxlen=window) for name, _, _ in STAGES}
+        self._samples["entrega"] = deque(maxlen=window)  # captura -> entregado a un viewer
+        self.stale_dropped = 0
+        self.stale_skipped_encode = 0
+
+    def observe(self, rec):
+        for name, start, end in STAGES:
+            t0, t1 = getattr(rec, start), getattr(rec, end)
+            if t0 is not None and t1 is not None:
+                self._samples[name].append(t1 - t0)
+
+    def observe_delivery(self, captured, now=None):
+        if captured:
+            self._samples["entrega"].append((now or time.time()) - captured)
+
+    def summary(self):
+        out = {}
+        for name, samples in self._samples.items():
+            if not samples:
+                continue
+            data = np.array(list(samples))  # list() copia de una vez (sin mutar durante la iteración)
+            p50, p95, p99 = (float(v) for v in np.percentile(data, (50, 95, 99)) * 1000)
+            out[name] = {
+                "p50": round(p50, 1),
+                "p95": round(p95, 1),
+                "p99": round(p99, 1),
+                "max": round(float(data.max()) * 1000, 1),
+                "n": len(data),
+            }
+        out["descartados_viejos"] = self.stale_dropped
+        out["sin_codificar_viejos"] = self.stale_skipped_encode
+        return out
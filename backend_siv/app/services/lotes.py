@@ -0,0 +1,342 @@
+import os
+import cv2
+import time
+import uuid
+import queue
+import shutil
+import threading
+import numpy as np
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from backend_siv.app.services.config import (
+    MODEL_PATH, TRACK_LOW_THRESH, CLASS_COLORS, DEFAULT_COLOR, FFMPEG_BIN,
+    ANALYSIS_DIR, ANALYSIS_WORK_DIR, BATCH_WORKERS, BATCH_CHUNK_SEC, BATCH_LINK_DISTANCE, EVENT_TYPES
+)
+from backend_siv.app.services.sidecar import (
+    SidecarWriter, pack_detections, load_sidecar, write_sidecar, sidecar_path
+)
+from backend_siv.app.services.media import probe_video, _run_ffmpeg
+from backend_siv.app.services.tracker import ByteTracker
+
+ID_STRIDE = 1_000_000      # los ids de cada tramo se desplazan para no chocar al unir
+
+# ===============================
+# ESTADO DE LOS TRABAJOS (PROCESO DEL MOTOR)
+# ===============================
+# Vive donde corre el motor (LocalEngine / engine.py): los workers HTTP lo
+# consultan por get_engine(), así todos ven los mismos trabajos y el pool de
+# modelos existe una sola vez.
+jobs = {}  # job_id -> dict con estado, progreso y resultado
+_jobs_lock = threading.Lock()
+
+_pool = None
+_progress = None  # dict compartido (job_id, tramo) -> frames procesados
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool, _progress
+    with _pool_lock:
+        if _pool is None:
+            ctx = mp.get_context("spawn")  # cada worker carga su propio modelo
+            _progress = ctx.Manager().dict()
+            _pool = ProcessPoolExecutor(
+                max_workers=BATCH_WORKERS, mp_context=ctx, initializer=_init_worker
+            )
+        return _pool, _progress
+
+
+# ===============================
+# WORKER: INFERENCIA DE UN TRAMO
+# ===============================
+_model = None
+
+
+def _init_worker():
+    global _model
+    from ultralytics import YOLO
+    _model = YOLO(MODEL_PATH)
+
+
+def _draw(frame, box, name):
+    x1, y1, x2, y2 = map(int, box)
+    color = CLASS_COLORS.get(name, DEFAULT_COLOR)
+    cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+    cv2.putText(frame, name.capitalize(), (x1, max(y1 - 6, 12)),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2, cv2.LINE_AA)
+
+
+def process_chunk(job_id, idx, src, start, end, out_path, cam_id, progress):
+    """Detecta y trackea los frames [start, end) → clip anotado + sidecar"""
+    cap = cv2.VideoCapture(src)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30
+    size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+    writer = cv2.VideoWriter(out_path, cv2.VideoWriter_fourcc(*"avc1"), fps, size)
+    names = {int(k): v.lower() for k, v in _model.names.items()}
+    sidecar = SidecarWriter(cam_id, fps, size, names)
+    tracker = ByteTracker()  # tracker nuevo para cada tramo
+
+    for n, f in enumerate(range(start, end)):
+        ok, frame = cap.read()
+        if not ok:
+            break
+        boxes = _model.predict(frame, conf=TRACK_LOW_THRESH, verbose=False)[0].boxes
+        if boxes is not None and len(boxes):
+            raw = boxes.xyxy.cpu().numpy(), boxes.conf.cpu().numpy(), boxes.cls.int().cpu().numpy()
+        else:
+            raw = np.zeros((0, 4)), (), ()
+        xyxy, ids, cls, conf = tracker.update(*raw)
+        sidecar.add(pack_detections(ids, cls, conf, xyxy, t=f / fps))
+        for box, c in zip(xyxy, cls):
+            _draw(frame, box, names.get(int(c), str(c)))
+        writer.write(frame)
+        if n % 25 == 0:
+            progress[(job_id, idx)] = n + 1
+
+    progress[(job_id, idx)] = end - start
+    writer.release()
+    cap.release()
+    sidecar.save(out_path)
+    return out_path
+
+
+# ===============================
+# UNIÓN DE TRAMOS
+# ===============================
+def _frame_rows(sc, i):
+    return slice(int(sc["offsets"][i]), int(sc["offsets"][i + 1]))
+
+
+def _centers(box):
+    box = box.astype(np.int32)
+    return np.stack([(box[:, 0] + box[:, 2]) // 2, (box[:, 1] + box[:, 3]) // 2], axis=1)
+
+
+def _link_tracks(prev, curr, max_dist=BATCH_LINK_DISTANCE):
+    """
+    Une los tracks del último frame de un tramo con los del primero del
+    siguiente (misma clase, centro más cercano). Devuelve {id nuevo: id previo}.
+    """
+    prev_ids, prev_cls, prev_xy = prev
+    curr_ids, curr_cls, curr_xy = curr
+    pairs = []
+    for i in range(len(curr_ids)):
+        for j in range(len(prev_ids)):
+            if curr_cls[i] != prev_cls[j]:
+                continue
+            dist = float(np.hypot(*(curr_xy[i] - prev_xy[j])))
+            if dist <= max_dist:
+                pairs.append((dist, i, j))
+    mapping, used = {}, set()
+    for _, i, j in sorted(pairs):
+        if curr_ids[i] in mapping or j in used:
+            continue
+        mapping[int(curr_ids[i])] = int(prev_ids[j])
+        used.add(j)
+    return mapping
+
+
+def stitch_sidecars(paths, out_video):
+    """Concatena los sidecars de los tramos en uno solo, con ids continuos entre tramos"""
+    t, ids, cls, conf, box, counts = [], [], [], [], [], []
+    prev_last = None
+    meta = None
+    for k, path in enumerate(paths):
+        sc = load_sidecar(path)
+        meta = meta or sc["meta"]
+        frames = len(sc["t"])
+        chunk_ids = sc["ids"].astype(np.int64) + k * ID_STRIDE
+        if frames and prev_last is not None:
+            first = _frame_rows(sc, 0)
+            mapping = _link_tracks(prev_last, (chunk_ids[first], sc["cls"][first], _centers(sc["box"][first])))
+            if mapping:
+                chunk_ids = np.array([mapping.get(int(i), int(i)) for i in chunk_ids], np.int64)
+        if frames:
+            last = _frame_rows(sc, frames - 1)
+            prev_last = (chunk_ids[last], sc["cls"][last], _centers(sc["box"][last]))
+
+        t.append(sc["t"])
+        ids.append(chunk_ids)
+        cls.append(sc["cls"])
+        conf.append(sc["conf"])
+        box.append(sc["box"])
+        counts.append(np.diff(sc["offsets"]))
+
+    counts = np.concatenate(counts)
+    offsets = np.zeros(len(counts) + 1, np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    return write_sidecar(
+        out_video, np.concatenate(t), offsets, np.concatenate(ids),
+        np.concatenate(cls), np.concatenate(conf), np.concatenate(box), meta
+    )
+
+
+def concat_videos(paths, out_path):
+    """Une los clips anotados: ffmpeg sin recodificar si está, si no con OpenCV"""
+    if FFMPEG_BIN:
+        listing = out_path + ".txt"
+        with open(listing, "w") as f:
+            for p in paths:
+                f.write(f"file '{os.path.abspath(p)}'\n")
+        try:
+            _run_ffmpeg(["-f", "concat", "-safe", "0", "-i", listing, "-c", "copy", out_path])
+            return out_path
+        except RuntimeError as e:
+            print(f"⚠️ ffmpeg concat falló, se une con OpenCV → {e}")
+        finally:
+            os.remove(listing)
+
+    fps, _, _, size = probe_video(paths[0])
+    writer = cv2.VideoWriter(out_path, cv2.VideoWriter_fourcc(*"avc1"), fps, size)
+    for p in paths:
+        cap = cv2.VideoCapture(p)
+        while True:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            writer.write(frame)
+        cap.release()
+    writer.release()
+    return out_path
+
+
+# ===============================
+# RESULTADOS -> INCIDENTES + CATÁLOGO
+# ===============================
+def _store_results(job, summary, out_video):
+    from backend_siv.app.services.eventos import EventBus, _insert_batch
+    from backend_siv.app.services.catalogo import register_clip
+
+    # Un bus propio: los detenidos/alertas se fusionan igual que en vivo
+    bus = EventBus()
+    base = job["start_time"].timestamp()
+    clip_meta = {"path": out_video, "incidente_id": None}
+    for d in summary["detenidos"]:
+        bus.publish(job["camera_id"], "vehiculo_detenido", {d["id"]}, clip_meta, now=base + d["t"])
+    for a in summary["alertas"]:
+        if a["activa"] and a["regla"] in EVENT_TYPES:
+            bus.publish(job["camera_id"], a["regla"], clip_meta=clip_meta, now=base + a["t"])
+
+    events = []
+    while True:
+        try:
+            events.append(bus.pending.get_nowait())
+        except queue.Empty:
+            break
+    if events:
+        _insert_batch(events)
+
+    end = datetime.fromtimestamp(base + summary["duracion_sec"])
+    register_clip(job["camera_id"], out_video, "analisis", job["start_time"], end, clip_meta["incidente_id"])
+    return [e["incidente_id"] for e in events if e["incidente_id"] is not None]
+
+
+# ===============================
+# COORDINADOR DEL TRABAJO
+# ===============================
+def _update(job_id, **fields):
+    with _jobs_lock:
+        jobs[job_id].update(fields)
+
+
+def _run_job(job_id):
+    from backend_siv.app.services.reanalisis import analyze
+
+    job = jobs[job_id]
+    work = job["work_dir"]
+    pool, progress = _get_pool()
+    try:
+        futures = [
+            pool.submit(process_chunk, job_id, i, job["src"], start, end,
+                        os.path.join(work, f"tramo_{i:04d}.mp4"), job["camera_id"], progress)
+            for i, (start, end) in enumerate(job["chunks"])
+        ]
+        _update(job_id, status="procesando")
+        chunk_paths = [f.result() for f in futures]  # en orden de tramo
+
+        _update(job_id, status="uniendo")
+        os.makedirs(ANALYSIS_DIR, exist_ok=True)
+        out_video = os.path.join(ANALYSIS_DIR, f"analisis_{job_id}.mp4")
+        concat_videos(chunk_paths, out_video)
+        sidecar = stitch_sidecars([sidecar_path(p) for p in chunk_paths], out_video)
+
+        summary = analyze(sidecar)
+        incidentes = _store_results(job, summary, out_video)
+        _update(job_id, status="listo", finished=time.time(), result={
+            **summary,
+            "incidentes": incidentes,
+            "video": f"/api/videos/archivo/analisis/{os.path.basename(out_video)}",
+            "sidecar": os.path.basename(sidecar),
+        })
+        print(f"✅ Análisis {job_id} listo: {len(summary['detenidos'])} detenido(s), {len(incidentes)} candidato(s)")
+    except Exception as e:
+        _update(job_id, status="error", error=str(e), finished=time.time())
+        print(f"⚠️ Análisis {job_id} falló → {e}")
+    finally:
+        for i in range(len(job["chunks"])):
+            progress.pop((job_id, i), None)
+        shutil.rmtree(work, ignore_errors=True)
+
+
+def submit_job(src_path, filename, camera_id=0, start_time=None):
+    """Encola un video ya guardado en disco; devuelve el id del trabajo"""
+    fps, frames, _, _ = probe_video(src_path)
+    if not frames:
+        raise ValueError("No se pudo leer el video")
+    step = max(int(BATCH_CHUNK_SEC * fps), 1)
+    chunks = [(s, min(s + step, frames)) for s in range(0, frames, step)]
+
+    job_id = os.path.basename(os.path.dirname(src_path))
+    with _jobs_lock:
+        jobs[job_id] = {
+            "id": job_id,
+            "filename": filename,
+            "camera_id": camera_id,
+            "status": "en_cola",
+            "created": time.time(),
+            "finished": None,
+            "start_time": start_time or datetime.now(),
+            "frames_total": frames,
+            "chunks": chunks,
+            "src": src_path,
+            "work_dir": os.path.dirname(src_path),
+            "error": None,
+            "result": None,
+        }
+    threading.Thread(target=_run_job, args=(job_id,), daemon=True).start()
+    return job_id
+
+
+def new_job_dir():
+    """Carpeta de trabajo para un video subido: <ANALYSIS_WORK_DIR>/<id> (no se publica)"""
+    path = os.path.join(ANALYSIS_WORK_DIR, uuid.uuid4().hex[:12])
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def job_status(job_id):
+    with _jobs_lock:
+        job = jobs.get(job_id)
+        if job is None:
+            return None
+        data = {k: job[k] for k in ("id", "filename", "camera_id", "status", "created", "finished", "error")}
+        data["tramos"] = len(job["chunks"])
+        data["frames_total"] = job["frames_total"]
+    done = job["frames_total"] if job["status"] == "listo" else sum(
+        (_progress or {}).get((job_id, i), 0) for i in range(len(job["chunks"]))
+    )
+    data["progreso"] = round(min(done / job["frames_total"], 1.0), 3)
+    return data
+
+
+def job_result(job_id):
+    with _jobs_lock:
+        job = jobs.get(job_id)
+        return None if job is None else job["result"]
+
+
+def list_jobs():
+    return [job_status(job_id) for job_id in list(jobs)]
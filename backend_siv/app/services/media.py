@@ -0,0 +1,175 @@
+import cv2
+import os
+import subprocess
+import threading
+
+from backend_siv.app.services.config import (
+    THUMB_DIRNAME, PREVIEW_DIRNAME, THUMB_WIDTH,
+    PREVIEW_RES, PREVIEW_MAX_SEC, PREVIEW_FPS,
+    FFMPEG_BIN, HLS_DIRNAME, HLS_SEGMENT_SEC
+)
+
+_hls_locks = {}
+_hls_locks_guard = threading.Lock()
+
+# ===============================
+# INFO DE UN CLIP
+# ===============================
+def probe_video(path):
+    """Devuelve (fps, frames, duración en segundos, (ancho, alto))"""
+    cap = cv2.VideoCapture(path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30
+    frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+    size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    cap.release()
+    return fps, frames, (frames / fps if frames else 0.0), size
+
+
+# ===============================
+# MINIATURA (POSTER)
+# ===============================
+def make_thumbnail(path):
+    """
+    Guarda un .jpg con el frame central del clip en <carpeta>/thumbs.
+    Devuelve la ruta relativa a la carpeta del video, o None si falla.
+    """
+    folder, filename = os.path.split(path)
+    out_dir = os.path.join(folder, THUMB_DIRNAME)
+    os.makedirs(out_dir, exist_ok=True)
+
+    cap = cv2.VideoCapture(path)
+    frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+    if frames > 1:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, frames // 2)
+    ok, frame = cap.read()
+    cap.release()
+    if not ok:
+        return None
+
+    h, w = frame.shape[:2]
+    thumb = cv2.resize(frame, (THUMB_WIDTH, int(h * THUMB_WIDTH / w)), interpolation=cv2.INTER_AREA)
+    name = os.path.splitext(filename)[0] + ".jpg"
+    cv2.imwrite(os.path.join(out_dir, name), thumb, [int(cv2.IMWRITE_JPEG_QUALITY), 75])
+    return f"{THUMB_DIRNAME}/{name}"
+
+
+# ===============================
+# PREVIEW DE BAJA RESOLUCIÓN
+# ===============================
+def make_preview(path):
+    """
+    Genera un .mp4 corto (PREVIEW_MAX_SEC, PREVIEW_FPS, PREVIEW_RES) en <carpeta>/previews,
+    tomando frames repartidos a lo largo de todo el clip.
+    Devuelve la ruta relativa a la carpeta del video, o None si falla.
+    """
+    folder, filename = os.path.split(path)
+    out_dir = os.path.join(folder, PREVIEW_DIRNAME)
+    os.makedirs(out_dir, exist_ok=True)
+
+    cap = cv2.VideoCapture(path)
+    frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+    if frames <= 0:
+        cap.release()
+        return None
+
+    wanted = min(frames, PREVIEW_MAX_SEC * PREVIEW_FPS)
+    step = max(frames / wanted, 1.0)
+    name = filename if filename.endswith(".mp4") else os.path.splitext(filename)[0] + ".mp4"
+    out_path = os.path.join(out_dir, name)
+    writer = cv2.VideoWriter(out_path, cv2.VideoWriter_fourcc(*"avc1"), PREVIEW_FPS, PREVIEW_RES)
+
+    written = 0
+    next_idx = 0.0
+    idx = 0
+    while written < wanted:
+        # grab() avanza sin decodificar; solo se decodifican los frames que se usan
+        if not cap.grab():
+            break
+        if idx >= next_idx:
+            ok, frame = cap.retrieve()
+            if ok:
+                writer.write(cv2.resize(frame, PREVIEW_RES, interpolation=cv2.INTER_AREA))
+                written += 1
+            next_idx += step
+        idx += 1
+
+    writer.release()
+    cap.release()
+    if not written:
+        os.remove(out_path)
+        return None
+    return f"{PREVIEW_DIRNAME}/{name}"
+
+
+# ===============================
+# FASTSTART (MOOV AL INICIO)
+# ===============================
+def _run_ffmpeg(args):
+    result = subprocess.run(
+        [FFMPEG_BIN, "-hide_banner", "-loglevel", "error", "-y", *args],
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.decode(errors="ignore").strip())
+
+
+def faststart(path):
+    """
+    Remuxa (sin recodificar) un .mp4 moviendo el átomo moov al inicio,
+    para que el navegador pueda reproducir y buscar sin descargar todo el archivo.
+    Reemplaza el archivo de forma atómica. Devuelve False si no hay ffmpeg o falla.
+    """
+    if not FFMPEG_BIN or not path.endswith(".mp4"):
+        return False
+    tmp = path[:-4] + ".faststart.mp4"
+    try:
+        _run_ffmpeg(["-i", path, "-c", "copy", "-movflags", "+faststart", tmp])
+        os.replace(tmp, path)
+        return True
+    except Exception as e:
+        print(f"⚠️ faststart falló para {path} → {e}")
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        return False
+
+
+# ===============================
+# SEGMENTACIÓN HLS
+# ===============================
+def hls_dir(path):
+    folder, filename = os.path.split(path)
+    return os.path.join(folder, HLS_DIRNAME, os.path.splitext(filename)[0])
+
+
+def make_hls(path):
+    """
+    Segmenta el clip en HLS (playlist VOD + segmentos .ts) sin recodificar.
+    Idempotente: si la playlist ya existe no hace nada. Devuelve la carpeta o None.
+    """
+    out_dir = hls_dir(path)
+    playlist = os.path.join(out_dir, "index.m3u8")
+
+    with _hls_locks_guard:
+        lock = _hls_locks.setdefault(out_dir, threading.Lock())
+    with lock:
+        if os.path.exists(playlist):
+            return out_dir
+        if not FFMPEG_BIN:
+            return None
+        os.makedirs(out_dir, exist_ok=True)
+        tmp_playlist = os.path.join(out_dir, "index.tmp.m3u8")
+        try:
+            _run_ffmpeg([
+                "-i", path, "-c", "copy",
+                "-f", "hls",
+                "-hls_time", str(HLS_SEGMENT_SEC),
+                "-hls_playlist_type", "vod",
+                "-hls_segment_filename", os.path.join(out_dir, "seg_%05d.ts"),
+                tmp_playlist
+            ])
+            # la playlist final solo aparece cuando todos los segmentos existen
+            os.replace(tmp_playlist, playlist)
+            return out_dir
+        except Exception as e:
+            print(f"⚠️ HLS falló para {path} → {e}")
+            return None
@@ -0,0 +1,144 @@
+import cv2
+import math
+import time
+import threading
+import numpy as np
+
+from backend_siv.app.services.config import (
+    MOSAIC_TILE, MOSAIC_FPS, MOSAIC_IDLE_SEC, LOW_JPEG_QUALITY
+)
+from backend_siv.app.services.salida import FrameHub
+
+
+def layout_key(cam_ids, cols=None):
+    """(cámaras, columnas) normalizado: el mismo layout comparte el mosaico"""
+    cam_ids = tuple(cam_ids)
+    cols = cols or math.ceil(math.sqrt(len(cam_ids))) or 1
+    return cam_ids, min(cols, max(len(cam_ids), 1))
+
+
+# ===============================
+# MOSAICO DE VARIAS CÁMARAS
+# ===============================
+class MosaicComposer:
+    """
+    Arma una grilla con el último frame low de cada cámara y la codifica una sola
+    vez por tick para todos los viewers del mismo layout. Solo decodifica los
+    tiles que cambiaron; si ninguno cambió no vuelve a codificar.
+    source(cam_id) -> (seq, jpg, captura); touch(cam_id, viewer_id) mantiene
+    vivo el lease low de cada cámara mientras alguien mire el mosaico.
+    """
+
+    def __init__(self, cam_ids, cols, source, touch=None, release=None,
+                 tile=MOSAIC_TILE, fps=MOSAIC_FPS, quality=LOW_JPEG_QUALITY, idle_sec=MOSAIC_IDLE_SEC):
+        self.cam_ids, self.cols = layout_key(cam_ids, cols)
+        self.rows = math.ceil(len(self.cam_ids) / self.cols)
+        self.source, self.touch, self.release = source, touch, release
+        self.tile = tile
+        self.period = 1.0 / fps
+        self.quality = quality
+        self.idle_sec = idle_sec
+        self.viewer_id = "mosaico:" + ",".join(map(str, self.cam_ids))
+
+        self.hub = FrameHub()
+        self.encodes = 0
+        self.last_wait = time.time()
+        self.running = True
+        self._seqs = {cid: -1 for cid in self.cam_ids}
+        self._captured = {cid: 0.0 for cid in self.cam_ids}
+        w, h = tile
+        self.canvas = np.zeros((self.rows * h, self.cols * w, 3), np.uint8)
+        for cid in self.cam_ids:
+            self._blank(cid)
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def _slot(self, cid):
+        i = self.cam_ids.index(cid)
+        w, h = self.tile
+        x, y = (i % self.cols) * w, (i // self.cols) * h
+        return self.canvas[y:y + h, x:x + w]
+
+    def _label(self, view, cid):
+        cv2.putText(view, f"Cam {cid}", (8, 22), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2, cv2.LINE_AA)
+
+    def _blank(self, cid):
+        view = self._slot(cid)
+        view[:] = (24, 24, 24)
+        self._label(view, cid)
+        cv2.putText(view, "Sin senal", (8, view.shape[0] // 2), cv2.FONT_HERSHEY_SIMPLEX, 0.7,
+                    (150, 150, 150), 2, cv2.LINE_AA)
+
+    def compose(self):
+        """Actualiza los tiles nuevos; True si el canvas cambió"""
+        changed = False
+        for cid in self.cam_ids:
+            seq, data, captured = self.source(cid)
+            if data is None or seq == self._seqs[cid]:
+                continue
+            img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+            if img is None:
+                continue
+            view = self._slot(cid)
+            if (img.shape[1], img.shape[0]) != self.tile:
+                img = cv2.resize(img, self.tile, interpolation=cv2.INTER_AREA)
+            view[:] = img
+            self._label(view, cid)
+            self._seqs[cid] = seq
+            self._captured[cid] = captured or 0.0
+            changed = True
+        return changed
+
+    def _loop(self):
+        while self.running:
+            t0 = time.time()
+            if t0 - self.last_wait > self.idle_sec:
+                break  # nadie mira este layout
+            if self.touch:
+                for cid in self.cam_ids:
+                    self.touch(cid, self.viewer_id)
+            if self.compose() or not self.encodes:
+                ok, jpg = cv2.imencode(".jpg", self.canvas, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+                if ok:
+                    # captura del tile más viejo: la edad del mosaico es la del peor frame
+                    captured = min((c for c in self._captured.values() if c), default=None)
+                    self.hub.publish(jpg.tobytes(), captured)
+                    self.encodes += 1
+            time.sleep(max(0.0, self.period - (time.time() - t0)))
+        self.running = False
+        if self.release:
+            for cid in self.cam_ids:
+                self.release(cid, self.viewer_id)
+
+    def wait(self, after_seq=0, timeout=None):
+        self.last_wait = time.time()
+        return self.hub.wait(after_seq, timeout)
+
+
+# ===============================
+# MOSAICOS ACTIVOS (UNO POR LAYOUT)
+# ===============================
+_mosaics = {}
+_mosaics_lock = threading.Lock()
+
+
+def get_mosaic(cam_ids, cols, source, touch=None, release=None):
+    key = layout_key(cam_ids, cols)
+    with _mosaics_lock:
+        mosaic = _mosaics.get(key)
+        if mosaic is None or not mosaic.running:
+            mosaic = MosaicComposer(*key, source, touch, release).start()
+            _mosaics[key] = mosaic
+        mosaic.last_wait = time.time()
+        return mosaic
+
+
+def mosaic_stats():
+    with _mosaics_lock:
+        return [
+            {"camaras": list(m.cam_ids), "columnas": m.cols, "codificados": m.encodes}
+            for m in _mosaics.values() if m.running
+        ]
@@ -0,0 +1,104 @@
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+from backend_siv.app.services.config import SCHED_SLOTS, SCHED_WEIGHTS, SCHED_MIN_FPS
+
+LEVELS = tuple(SCHED_WEIGHTS)  # de mayor a menor prioridad
+
+
+# ===============================
+# TURNOS DE INFERENCIA ENTRE CÁMARAS
+# ===============================
+class InferenceScheduler:
+    """
+    Reparte el modelo entre los hilos process_frames. En vez de competir por
+    model_lock en orden de llegada, cada cámara pide un turno con su nivel de
+    prioridad y, al liberarse el modelo, gana la de mayor peso × espera desde su
+    último turno. Una cámara que pasó más de 1/SCHED_MIN_FPS sin turno va primero
+    (mínimo garantizado). Mientras espera, su cola envejece y los frames viejos se
+    descartan: así baja su frecuencia de detección.
+    """
+
+    def __init__(self, slots=SCHED_SLOTS, weights=SCHED_WEIGHTS, min_fps=SCHED_MIN_FPS):
+        self.slots = slots
+        self.weights = dict(weights)
+        self.min_period = 1.0 / min_fps if min_fps else float("inf")
+        self._cond = threading.Condition()
+        self._busy = 0
+        self._waiting = {}     # cam_id -> nivel
+        self._last = {}        # cam_id -> último turno
+        self._stats = {}
+
+    def _stat(self, cam_id):
+        return self._stats.setdefault(cam_id, {
+            "nivel": None, "turnos": 0, "turnos_minimo": 0, "espera_ms": 0.0,
+            "recientes": deque(maxlen=1024),
+        })
+
+    def _pick(self, now):
+        """(cam_id, por_minimo) que debe recibir el próximo turno"""
+        def idle(cid):
+            return now - self._last.get(cid, 0.0)
+
+        overdue = [cid for cid in self._waiting if idle(cid) >= self.min_period]
+        if overdue:
+            return max(overdue, key=idle), True
+        best = max(self._waiting, key=lambda cid: self.weights.get(self._waiting[cid], 1.0) * idle(cid))
+        return best, False
+
+    def acquire(self, cam_id, level):
+        t0 = time.time()
+        with self._cond:
+            self._waiting[cam_id] = level
+            while True:
+                if self._busy < self.slots:
+                    chosen, forced = self._pick(time.time())
+                    if chosen == cam_id:
+                        break
+                self._cond.wait(0.1)
+            del self._waiting[cam_id]
+            self._busy += 1
+            now = time.time()
+            self._last[cam_id] = now
+            st = self._stat(cam_id)
+            st["nivel"] = level
+            st["turnos"] += 1
+            st["turnos_minimo"] += forced
+            wait_ms = (now - t0) * 1000
+            st["espera_ms"] = wait_ms if st["turnos"] == 1 else 0.9 * st["espera_ms"] + 0.1 * wait_ms
+            st["recientes"].append(now)
+
+    def release(self, cam_id):
+        with self._cond:
+            self._busy -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, cam_id, level):
+        self.acquire(cam_id, level)
+        try:
+            yield
+        finally:
+            self.release(cam_id)
+
+    def forget(self, cam_id):
+        with self._cond:
+            self._last.pop(cam_id, None)
+            self._stats.pop(cam_id, None)
+
+    def stats(self, cam_id, window=10.0):
+        now = time.time()
+        with self._cond:
+            st = self._stat(cam_id)
+            recent = sum(1 for t in st["recientes"] if now - t <= window)
+            return {
+                "nivel": st["nivel"],
+                "peso": self.weights.get(st["nivel"], 1.0),
+                "turnos": st["turnos"],
+                "turnos_minimo": st["turnos_minimo"],
+                "espera_ms": round(st["espera_ms"], 2),
+                "fps_inferencia": round(recent / window, 2),
+                "en_espera": len(self._waiting),
+            }
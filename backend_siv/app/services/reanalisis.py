@@ -0,0 +1,151 @@
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+from collections import defaultdict, Counter
+
+from backend_siv.app.services.config import (
+    STOP_FRAMES_THRESHOLD, STOP_DISTANCE_THRESHOLD, MAX_TRACK_HISTORY,
+    ALERT_RULES, ROAD_ZONES
+)
+from backend_siv.app.services.sidecar import load_sidecar
+from backend_siv.app.services.zonas import get_zone_map
+from backend_siv.app.services.alertas import AlertEngine
+from backend_siv.app.services.detenidos import (
+    step_stopped, forget_missing, STOP_CONFIRM_FRAMES, MOVE_CONFIRM_FRAMES
+)
+from backend_siv.app.services.grabacion import find_segments, camera_dir
+
+# ===============================
+# REANÁLISIS DESDE SIDECARS (SIN MODELO)
+# ===============================
+# Recalcula detenidos, conteos y reglas de alerta a partir de las detecciones
+# guardadas junto a cada grabación (SIV_SIDECAR=1), con otros parámetros:
+#
+#   python -m backend_siv.app.services.reanalisis clip.det.npz --stop-distance 8
+
+EXCLUDE_ALERT_LABELS = {"persona", "cono", "asistencia"}
+
+
+def _class_names(meta):
+    names = meta.get("names") or {}
+    if isinstance(names, list):
+        return {i: n.lower() for i, n in enumerate(names)}
+    return {int(k): v.lower() for k, v in names.items()}
+
+
+def analyze(path, stop_frames=STOP_FRAMES_THRESHOLD, stop_distance=STOP_DISTANCE_THRESHOLD,
+            stop_confirm=STOP_CONFIRM_FRAMES, move_confirm=MOVE_CONFIRM_FRAMES,
+            rules=ALERT_RULES, max_history=MAX_TRACK_HISTORY):
+    """Resumen del reanálisis de un sidecar: conteos, detenidos y cambios de alerta"""
+    t0 = time.perf_counter()
+    sc = load_sidecar(path)
+    meta = sc["meta"]
+    names = _class_names(meta)
+    times, offsets = sc["t"], sc["offsets"]
+    ids, cls = sc["ids"], sc["cls"]
+
+    # Todo lo que no depende del estado se calcula vectorizado de una vez
+    box = sc["box"].astype(np.int32)
+    cx = (box[:, 0] + box[:, 2]) // 2
+    cy = (box[:, 1] + box[:, 3]) // 2
+    zone_map = get_zone_map(meta.get("cam_id"), tuple(meta["size"]))
+    road_labels = [i for i, n in enumerate(zone_map.names) if n in ROAD_ZONES]
+    on_road = np.isin(zone_map.classify_many(cx, cy), road_labels)
+    person_ids = [i for i, n in names.items() if n == "persona"]
+    ped_on_road = on_road & np.isin(cls, person_ids)
+
+    histories = defaultdict(list)
+    states = defaultdict(lambda: "MOVING")
+    stopped_p = defaultdict(int)
+    moving_p = defaultdict(int)
+    engine = AlertEngine(rules)
+    alert_state = {n: False for n in rules}
+
+    track_class = {}
+    max_vehicles = 0
+    stopped_before = set()
+    detenidos = []
+    alertas = []
+
+    for i in range(len(times)):
+        a, b = offsets[i], offsets[i + 1]
+        t = float(times[i])
+        frame_ids = ids[a:b].tolist()
+        frame_cls = cls[a:b].tolist()
+        current_ids = set(frame_ids)
+        max_vehicles = max(max_vehicles, len(current_ids))
+
+        for tid, c, x, y in zip(frame_ids, frame_cls, cx[a:b].tolist(), cy[a:b].tolist()):
+            track_class[tid] = names.get(c, str(c))
+            history = histories[tid]
+            history.append((x, y))
+            if len(history) > max_history:
+                history.pop(0)
+
+        stopped = step_stopped(
+            histories, states, stopped_p, moving_p, current_ids,
+            stop_frames, stop_distance, stop_confirm, move_confirm
+        )
+
+        signals = {names.get(c, str(c)) for c in frame_cls}
+        if ped_on_road[a:b].any():
+            signals.add("peaton_en_via")
+        active = engine.update(signals, now=t)
+        for name, on in active.items():
+            if on != alert_state[name]:
+                alertas.append({"t": t, "frame": i, "regla": name, "activa": on})
+                alert_state[name] = on
+
+        blocked = active.get("conos") or active.get("asistencia")
+        for tid in stopped - stopped_before:
+            if track_class.get(tid) not in EXCLUDE_ALERT_LABELS and not blocked:
+                detenidos.append({"t": t, "frame": i, "id": tid, "clase": track_class.get(tid)})
+        stopped_before = stopped
+
+        forget_missing(histories, states, stopped_p, moving_p, current_ids)
+
+    elapsed = time.perf_counter() - t0
+    return {
+        "archivo": os.path.basename(path),
+        "frames": len(times),
+        "detecciones": int(len(ids)),
+        "duracion_sec": round(float(times[-1] - times[0]), 2) if len(times) else 0.0,
+        "tracks_por_clase": dict(Counter(track_class.values())),
+        "max_vehiculos": max_vehicles,
+        "detenidos": detenidos,
+        "alertas": alertas,
+        "fps_analisis": round(len(times) / elapsed, 1) if elapsed else None,
+    }
+
+
+def analyze_segments(cam_id, desde=None, hasta=None, **params):
+    """Reanaliza los segmentos continuos de una cámara que tengan sidecar"""
+    return [
+        analyze(os.path.join(camera_dir(cam_id), e["sidecar"]), **params)
+        for e in find_segments(cam_id, desde, hasta)
+        if e.get("sidecar")
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reanálisis de detecciones guardadas (.det.npz)")
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--stop-frames", type=int, default=STOP_FRAMES_THRESHOLD)
+    parser.add_argument("--stop-distance", type=float, default=STOP_DISTANCE_THRESHOLD)
+    parser.add_argument("--stop-confirm", type=int, default=STOP_CONFIRM_FRAMES)
+    parser.add_argument("--move-confirm", type=int, default=MOVE_CONFIRM_FRAMES)
+    args = parser.parse_args(argv)
+
+    for path in args.paths:
+        result = analyze(
+            path, args.stop_frames, args.stop_distance, args.stop_confirm, args.move_confirm
+        )
+        json.dump(result, sys.stdout, ensure_ascii=False)
+        sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
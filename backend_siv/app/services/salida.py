@@ -0,0 +1,183 @@
+import cv2
+import time
+import queue
+import threading
+
+from backend_siv.app.services.config import (
+    JPEG_QUALITY, OUTPUT_QUEUE_SIZE, OUTPUT_DROP_POLICY, LOW_RES, LOW_JPEG_QUALITY,
+    OUTPUT_MAX_AGE_SEC
+)
+
+DROP_POLICIES = ("drop_oldest", "drop_newest", "block")
+
+
+# ===============================
+# ÚLTIMO FRAME CODIFICADO (BROADCAST)
+# ===============================
+class FrameHub:
+    """
+    Guarda solo el último JPEG con un número de secuencia. Cada lector espera
+    un seq mayor al último que vio, así N viewers comparten el mismo frame
+    en vez de robárselo de una cola.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self.seq = 0
+        self.data = None
+        self.timestamp = 0.0
+        self.captured = 0.0  # momento de captura del frame publicado
+
+    def publish(self, data, captured=None):
+        with self._cond:
+            self.seq += 1
+            self.data = data
+            self.timestamp = time.time()
+            self.captured = captured or self.timestamp
+            self._cond.notify_all()
+
+    def latest(self):
+        """(seq, data, captura) del último frame publicado, sin esperar"""
+        with self._cond:
+            return self.seq, self.data, self.captured
+
+    def wait(self, after_seq=0, timeout=None):
+        """
+        (seq, data, captura) del primer frame con seq > after_seq;
+        data None si venció el timeout
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self.seq > after_seq, timeout)
+            if self.seq > after_seq:
+                return self.seq, self.data, self.captured
+            return self.seq, None, None
+
+
+# ===============================
+# ETAPA DE SALIDA POR CÁMARA
+# ===============================
+class OutputStage:
+    """
+    Recibe los frames anotados desde la inferencia por una cola acotada y, en su
+    propio hilo, los entrega al recorder y codifica solo las rendiciones que alguien
+    está mirando: full (JPEG a resolución completa) y low (LOW_RES, una sola vez por
+    frame para todos los viewers de stream_low).
+    Con la cola llena aplica la política configurada:
+      drop_oldest -> descarta el frame en espera (stream siempre al día)
+      drop_newest -> descarta el frame nuevo
+      block       -> la inferencia espera (no se pierde ningún frame)
+    """
+
+    def __init__(self, cam_id, hub, recorder=None, policy=OUTPUT_DROP_POLICY, maxsize=OUTPUT_QUEUE_SIZE,
+                 low_hub=None, latency=None, fmp4=None):
+        if policy not in DROP_POLICIES:
+            raise ValueError(f"Política de descarte inválida: {policy}")
+        self.cam_id = cam_id
+        self.hub = hub
+        self.low_hub = low_hub
+        self.latency = latency  # LatencyStats de la cámara (opcional)
+        self.fmp4 = fmp4        # Fmp4Encoder (opcional, requiere PyAV)
+        self.recorder = recorder
+        self.policy = policy
+        self.frames = queue.Queue(maxsize=maxsize)
+
+        self.submitted = 0
+        self.dropped = 0
+        self.encoded = 0
+        self.encoded_low = 0
+        self.encode_ms = 0.0  # promedio móvil exponencial
+
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def submit(self, frame, full=True, low=False, dets=None, rec=None, fmp4=False):
+        """
+        full / low / fmp4: qué rendiciones publicar para este frame (el recorder lo recibe siempre).
+        dets: detecciones del frame para el sidecar del segmento.
+        rec: FrameRecord del frame (tiempos por etapa)
+        """
+        self.submitted += 1
+        item = (frame, full, low, dets, rec, fmp4)
+        if self.policy == "block":
+            self.frames.put(item)
+            return True
+        if self.policy == "drop_oldest" and self.frames.full():
+            try:
+                self.frames.get_nowait()
+                self.dropped += 1
+            except queue.Empty:
+                pass
+        try:
+            self.frames.put_nowait(item)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def close(self):
+        self._stop.set()
+        self._thread.join(timeout=5)
+        if self.fmp4 is not None:
+            self.fmp4.close()
+
+    def stats(self):
+        return {
+            "output_submitted": self.submitted,
+            "output_dropped": self.dropped,
+            "output_encoded": self.encoded,
+            "output_encoded_low": self.encoded_low,
+            "encode_ms": round(self.encode_ms, 2),
+            "fmp4_encoded": self.fmp4.encoded if self.fmp4 else 0,
+            "fmp4_encode_ms": round(self.fmp4.encode_ms, 2) if self.fmp4 else 0.0,
+            "output_policy": self.policy,
+        }
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                frame, full, low, dets, rec, fmp4 = self.frames.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            if self.recorder is not None:
+                self.recorder.write(frame, dets)
+
+            # Un frame que ya llega viejo se graba pero no se muestra
+            captured = rec.captured if rec is not None else None
+            if rec is not None and rec.age() > OUTPUT_MAX_AGE_SEC:
+                if self.latency is not None:
+                    self.latency.stale_skipped_encode += 1
+                continue
+
+            if low and self.low_hub is not None:
+                small = cv2.resize(frame, LOW_RES, interpolation=cv2.INTER_AREA)
+                ok, jpg = cv2.imencode(".jpg", small, [int(cv2.IMWRITE_JPEG_QUALITY), LOW_JPEG_QUALITY])
+                self.encoded_low += 1
+                if ok:
+                    self.low_hub.publish(jpg.tobytes(), captured)
+
+            if fmp4 and self.fmp4 is not None:
+                self.fmp4.encode(frame, captured)
+
+            if not full:
+                self._done(rec, published=(low and self.low_hub is not None) or (fmp4 and self.fmp4 is not None))
+                continue
+
+            t0 = time.perf_counter()
+            ok, jpg = cv2.imencode(".jpg", frame, [int(cv2.IMWRITE_JPEG_QUALITY), JPEG_QUALITY])
+            elapsed = (time.perf_counter() - t0) * 1000
+            self.encode_ms = elapsed if not self.encoded else 0.9 * self.encode_ms + 0.1 * elapsed
+            self.encoded += 1
+            if ok:
+                self.hub.publish(jpg.tobytes(), captured)
+            self._done(rec)
+
+    def _done(self, rec, published=True):
+        if rec is None:
+            return
+        if published:
+            rec.encoded = rec.published = time.time()
+        rec.frame = None  # el registro puede sobrevivir al frame
+        if self.latency is not None:
+            self.latency.observe(rec)
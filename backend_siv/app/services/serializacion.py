@@ -0,0 +1,111 @@
+import json
+from datetime import date, datetime, time as dtime
+
+from fastapi import Response
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional: sin él se usa json estándar
+    orjson = None
+
+
+def available():
+    return orjson is not None
+
+
+# ===============================
+# RESPUESTA JSON DIRECTA
+# ===============================
+def _default(value):
+    if isinstance(value, (datetime, date, dtime)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} no es serializable")
+
+
+class FastJSONResponse(Response):
+    """
+    Serializa dicts / listas de tipos simples sin pasar por response_model:
+    nada de validación por fila ni jsonable_encoder. Las fechas salen en ISO 8601,
+    igual que con Pydantic.
+    """
+    media_type = "application/json"
+
+    def render(self, content):
+        if orjson is not None:
+            return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+        return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+# ===============================
+# BENCHMARK (ORM + PYDANTIC VS FILAS + ORJSON)
+# ===============================
+def benchmark(sizes=(1000, 10000, 100000), repeat=3):
+    """
+    ms por listado de incidentes con cada camino, en una base SQLite temporal
+    propia que se borra al terminar (nunca la de SIV_DATABASE_URL). Desde backend_siv:
+    PYTHONPATH=.. python -m app.services.serializacion
+    """
+    import os
+    import time
+    import shutil
+    import tempfile
+    from typing import List
+    from fastapi.responses import JSONResponse
+    from pydantic import TypeAdapter
+    from sqlalchemy import create_engine, insert
+    from sqlalchemy.orm import Session
+    from app import models, schemas, crud
+
+    adapter = TypeAdapter(List[schemas.IncidenteResponse])
+
+    def slow(db):
+        # lo mismo que hace FastAPI con response_model
+        rows = crud.get_incidentes(db)
+        for inc in rows:
+            inc.created_by_name = inc.creador.name if inc.creador else "Desconocido"
+            inc.closed_by_name = inc.cerrador.name if inc.cerrador else "-"
+        content = adapter.dump_python(adapter.validate_python(rows, from_attributes=True), mode="json")
+        return JSONResponse(content).body
+
+    def fast(db):
+        return FastJSONResponse(crud.incidentes_rows(db)).body
+
+    tmp_dir = tempfile.mkdtemp(prefix="siv_bench_")
+    engine = create_engine(f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}")
+    results = []
+    try:
+        models.Base.metadata.create_all(engine)
+        with Session(engine) as db:
+            db.add(models.User(id=1, username="bench", name="Bench", email="bench@siv", password="-"))
+            db.commit()
+            loaded = 0
+            for size in sizes:
+                now = datetime.utcnow()
+                db.execute(insert(models.Incidente), [
+                    dict(type="cono", priority="Alta", camera=str(i % 12), sector="N", status="Activo",
+                         observacion=f"Incidente de prueba {i}", pista=[1, 2], trabajos_via=[],
+                         created_by_id=1, created_at=now, updated_at=now)
+                    for i in range(loaded, size)
+                ])
+                db.commit()
+                loaded = size
+                row = {"filas": size}
+                for name, fn in (("pydantic_ms", slow), ("orjson_ms", fast)):
+                    best = float("inf")
+                    for _ in range(repeat):
+                        db.expunge_all()
+                        t0 = time.perf_counter()
+                        body = fn(db)
+                        best = min(best, time.perf_counter() - t0)
+                    row[name] = round(best * 1000, 1)
+                    row[name.replace("_ms", "_kb")] = len(body) // 1024
+                row["aceleracion"] = round(row["pydantic_ms"] / row["orjson_ms"], 1)
+                results.append(row)
+                print(row)
+    finally:
+        engine.dispose()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return results
+
+if __name__ == "__main__":
+    benchmark()
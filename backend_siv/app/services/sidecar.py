@@ -0,0 +1,92 @@
+import os
+import json
+import time
+import numpy as np
+
+from backend_siv.app.services.config import SIDECAR_SUFFIX
+
+_EMPTY = (
+    np.zeros(0, np.int32), np.zeros(0, np.uint8),
+    np.zeros(0, np.float16), np.zeros((0, 4), np.int16),
+)
+
+
+def sidecar_path(video_path):
+    """clip.mp4 -> clip.det.npz"""
+    base, _ = os.path.splitext(video_path)
+    return base + SIDECAR_SUFFIX
+
+
+def pack_detections(ids, cls, conf, xyxy, t=None):
+    """Detecciones de un frame en tipos compactos (coordenadas del frame, sin padding)"""
+    return (
+        time.time() if t is None else t,
+        np.asarray(ids, np.int32),
+        np.asarray(cls, np.uint8),
+        np.asarray(conf, np.float16),
+        np.round(np.asarray(xyxy, np.float32)).astype(np.int16).reshape(-1, 4),
+    )
+
+
+# ===============================
+# ESCRITURA (UN SIDECAR POR VIDEO)
+# ===============================
+class SidecarWriter:
+    """
+    Acumula las detecciones frame a frame en el mismo orden en que se escriben
+    los frames del video y al cerrar las guarda en formato CSR:
+    offsets[i]:offsets[i+1] son las filas del frame i.
+    """
+
+    def __init__(self, cam_id, fps, size, class_names):
+        self.meta = {"cam_id": cam_id, "fps": fps, "size": list(size), "names": class_names}
+        self.times = []
+        self.counts = []
+        self.parts = []
+
+    def add(self, dets):
+        if dets is None:
+            t, *arrays = (time.time(),) + _EMPTY
+        else:
+            t, *arrays = dets
+        self.times.append(t)
+        self.counts.append(len(arrays[0]))
+        self.parts.append(arrays)
+
+    def save(self, video_path):
+        if not self.times:
+            return None
+        ids, cls, conf, box = (np.concatenate(c) for c in zip(*self.parts))
+        offsets = np.zeros(len(self.counts) + 1, np.int32)
+        np.cumsum(self.counts, out=offsets[1:])
+        return write_sidecar(video_path, self.times, offsets, ids, cls, conf, box, self.meta)
+
+
+def write_sidecar(video_path, t, offsets, ids, cls, conf, box, meta):
+    """Guarda los arrays de forma atómica junto al video; devuelve la ruta"""
+    path = sidecar_path(video_path)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        np.savez_compressed(
+            f,
+            t=np.asarray(t, np.float64),
+            offsets=np.asarray(offsets, np.int32),
+            ids=np.asarray(ids, np.int32),
+            cls=np.asarray(cls, np.uint8),
+            conf=np.asarray(conf, np.float16),
+            box=np.asarray(box, np.int16).reshape(-1, 4),
+            meta=np.frombuffer(json.dumps(meta).encode(), np.uint8),
+        )
+    os.replace(tmp, path)
+    return path
+
+
+# ===============================
+# LECTURA
+# ===============================
+def load_sidecar(path):
+    """dict con los arrays del sidecar y 'meta' ya decodificado"""
+    with np.load(path) as z:
+        data = {k: z[k] for k in z.files}
+    data["meta"] = json.loads(data["meta"].tobytes().decode())
+    return data
@@ -0,0 +1,103 @@
+import base64
+import hashlib
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, func, text, inspect, or_, and_
+
+from app import models, crud
+from backend_siv.app.services.config import CHANGES_SETTLE_SEC
+
+Incidente = models.Incidente
+
+
+# ===============================
+# COLUMNA updated_at (BASES YA CREADAS)
+# ===============================
+def ensure_updated_at(bind):
+    """Agrega incidentes.updated_at (con índice) si la tabla es anterior a la columna"""
+    columns = {c["name"] for c in inspect(bind).get_columns("incidentes")}
+    if "updated_at" in columns:
+        return False
+    print("🛠️ Agregando incidentes.updated_at...")
+    col_type = "DATETIME(6)" if bind.dialect.name == "mysql" else "DATETIME"
+    with bind.begin() as conn:
+        conn.execute(text(f"ALTER TABLE incidentes ADD COLUMN updated_at {col_type} NULL"))
+        conn.execute(text("CREATE INDEX ix_incidentes_updated_at ON incidentes (updated_at)"))
+        conn.execute(text("UPDATE incidentes SET updated_at = COALESCE(closed_at, created_at)"))
+    return True
+
+
+# ===============================
+# CURSOR (updated_at, id)
+# ===============================
+def encode_cursor(updated_at, inc_id):
+    raw = f"{updated_at.isoformat()}|{inc_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """(updated_at, id) del cursor; ValueError si no es válido"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        ts, inc_id = raw.split("|")
+        return datetime.fromisoformat(ts), int(inc_id)
+    except Exception:
+        raise ValueError("Cursor inválido")
+
+
+def _after(since):
+    if not since:
+        return []
+    ts, inc_id = decode_cursor(since)
+    return [or_(Incidente.updated_at > ts, and_(Incidente.updated_at == ts, Incidente.id > inc_id))]
+
+
+# ===============================
+# CAMBIOS DESDE EL CURSOR
+# ===============================
+def changes_since(db, since=None, limit=500):
+    """
+    (incidentes, cursor, has_more) creados / actualizados / cerrados después de since.
+    El cursor no avanza sobre los cambios de los últimos CHANGES_SETTLE_SEC: una
+    transacción más lenta puede confirmar después con un updated_at anterior. Esos
+    incidentes se vuelven a entregar en el siguiente pedido (el cliente los reemplaza por id).
+    """
+    rows = db.execute(
+        select(Incidente).where(Incidente.updated_at.is_not(None), *_after(since))
+        .order_by(Incidente.updated_at, Incidente.id)
+        .limit(limit + 1)
+    ).scalars().all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    settle = datetime.utcnow() - timedelta(seconds=CHANGES_SETTLE_SEC)
+    settled = rows if has_more else [r for r in rows if r.updated_at <= settle]
+    cursor = encode_cursor(settled[-1].updated_at, settled[-1].id) if settled else since
+    return rows, cursor, has_more
+
+
+def current_cursor(db):
+    """Cursor del estado actual (para el listado completo)"""
+    last = db.execute(
+        select(Incidente.updated_at, Incidente.id)
+        .where(Incidente.updated_at <= datetime.utcnow() - timedelta(seconds=CHANGES_SETTLE_SEC))
+        .order_by(Incidente.updated_at.desc(), Incidente.id.desc())
+        .limit(1)
+    ).first()
+    return encode_cursor(*last) if last else ""
+
+
+# ===============================
+# ETAG SIN SERIALIZAR
+# ===============================
+def list_etag(db, scope, filtros=None, since=None):
+    """
+    ETag de un listado a partir de count / max(updated_at) / max(id) de las filas
+    que devolvería: cambia si se crea, edita, cierra o borra alguna.
+    """
+    conds = crud.incidente_filters(**(filtros or {})) + _after(since)
+    count, last_update, last_id = db.execute(
+        select(func.count(), func.max(Incidente.updated_at), func.max(Incidente.id)).where(*conds)
+    ).one()
+    key = f"{scope}|{sorted((filtros or {}).items())}|{since}|{count}|{last_update}|{last_id}"
+    return '"' + hashlib.sha1(key.encode()).hexdigest()[:20] + '"'
@@ -0,0 +1,179 @@
+import time
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+from backend_siv.app.services.config import (
+    TRACK_HIGH_THRESH, TRACK_LOW_THRESH, TRACK_NEW_THRESH,
+    TRACK_MATCH_IOU, TRACK_LOW_MATCH_IOU, TRACK_BUFFER
+)
+
+
+# ===============================
+# IoU VECTORIZADO
+# ===============================
+def iou_matrix(a, b):
+    """IoU entre cada caja de a (N,4) y de b (M,4) en xyxy → (N,M)"""
+    if not len(a) or not len(b):
+        return np.zeros((len(a), len(b)), np.float32)
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-6)
+
+
+def _assign(iou, min_iou):
+    """Asignación óptima (húngaro) sobre 1 - IoU; descarta pares bajo min_iou"""
+    if not iou.size:
+        return []
+    rows, cols = linear_sum_assignment(1.0 - iou)
+    return [(r, c) for r, c in zip(rows, cols) if iou[r, c] >= min_iou]
+
+
+# ===============================
+# BYTETRACK LIVIANO (UNA INSTANCIA POR CÁMARA)
+# ===============================
+class ByteTracker:
+    """
+    Asociación estilo ByteTrack sobre detecciones crudas:
+      1. tracks (activos y perdidos) contra detecciones de confianza alta
+      2. tracks activos sin pareja contra detecciones de confianza baja
+      3. detecciones altas sin pareja abren tracks nuevos
+    El movimiento se predice con velocidad constante suavizada (sin Kalman).
+    El estado vive en arrays por instancia: cada cámara tiene el suyo.
+    """
+
+    def __init__(self, high=TRACK_HIGH_THRESH, low=TRACK_LOW_THRESH, new=TRACK_NEW_THRESH,
+                 match_iou=TRACK_MATCH_IOU, low_match_iou=TRACK_LOW_MATCH_IOU, buffer=TRACK_BUFFER):
+        self.high, self.low, self.new = high, low, new
+        self.match_iou, self.low_match_iou = match_iou, low_match_iou
+        self.buffer = buffer
+        self.frame_id = 0
+        self._next_id = 1
+
+        self.boxes = np.zeros((0, 4), np.float32)
+        self.vel = np.zeros((0, 4), np.float32)
+        self.ids = np.zeros(0, np.int64)
+        self.cls = np.zeros(0, np.int64)
+        self.score = np.zeros(0, np.float32)
+        self.hits = np.zeros(0, np.int64)
+        self.lost = np.zeros(0, np.int64)  # frames seguidos sin detección
+
+        self.track_ms = 0.0  # promedio móvil exponencial
+
+    def reset(self):
+        self.__init__(self.high, self.low, self.new, self.match_iou, self.low_match_iou, self.buffer)
+
+    def update(self, xyxy, conf, cls):
+        """
+        Detecciones del frame (N,4), (N,), (N,) → tracks confirmados en este frame
+        como (xyxy, ids, cls, conf).
+        """
+        t0 = time.perf_counter()
+        self.frame_id += 1
+        xyxy = np.asarray(xyxy, np.float32).reshape(-1, 4)
+        conf = np.asarray(conf, np.float32).reshape(-1)
+        cls = np.asarray(cls, np.int64).reshape(-1)
+
+        # predicción
+        pred = self.boxes + self.vel
+        n_tracks = len(self.ids)
+        det_box = np.zeros((n_tracks, 4), np.float32)
+        det_conf = np.zeros(n_tracks, np.float32)
+        matched = np.zeros(n_tracks, bool)
+
+        high = np.flatnonzero(conf >= self.high)
+        low = np.flatnonzero((conf >= self.low) & (conf < self.high))
+
+        # 1) todos los tracks vs detecciones altas (misma clase)
+        iou = iou_matrix(pred, xyxy[high])
+        iou[self.cls[:, None] != cls[high][None, :]] = 0.0
+        used_high = set()
+        for r, c in _assign(iou, self.match_iou):
+            matched[r] = True
+            det_box[r] = xyxy[high[c]]
+            det_conf[r] = conf[high[c]]
+            used_high.add(c)
+
+        # 2) tracks activos sin pareja vs detecciones bajas
+        rest = np.flatnonzero(~matched & (self.lost == 0))
+        if len(rest) and len(low):
+            iou = iou_matrix(pred[rest], xyxy[low])
+            iou[self.cls[rest][:, None] != cls[low][None, :]] = 0.0
+            for r, c in _assign(iou, self.low_match_iou):
+                matched[rest[r]] = True
+                det_box[rest[r]] = xyxy[low[c]]
+                det_conf[rest[r]] = conf[low[c]]
+
+        # actualización de los emparejados
+        m = matched
+        self.vel[m] = 0.5 * self.vel[m] + 0.5 * (det_box[m] - self.boxes[m])
+        self.boxes[m] = det_box[m]
+        self.score[m] = det_conf[m]
+        self.hits[m] += 1
+        self.lost[m] = 0
+        self.boxes[~m] = pred[~m]
+        self.lost[~m] += 1
+
+        # 3) tracks nuevos
+        new = [high[c] for c in range(len(high)) if c not in used_high and conf[high[c]] >= self.new]
+        if new:
+            k = len(new)
+            self.boxes = np.vstack([self.boxes, xyxy[new]])
+            self.vel = np.vstack([self.vel, np.zeros((k, 4), np.float32)])
+            self.ids = np.concatenate([self.ids, np.arange(self._next_id, self._next_id + k)])
+            self.cls = np.concatenate([self.cls, cls[new]])
+            self.score = np.concatenate([self.score, conf[new]])
+            self.hits = np.concatenate([self.hits, np.ones(k, np.int64)])
+            self.lost = np.concatenate([self.lost, np.zeros(k, np.int64)])
+            matched = np.concatenate([matched, np.ones(k, bool)])
+            self._next_id += k
+
+        # depurar perdidos hace demasiado
+        keep = self.lost <= self.buffer
+        if not keep.all():
+            for name in ("boxes", "vel", "ids", "cls", "score", "hits", "lost"):
+                setattr(self, name, getattr(self, name)[keep])
+            matched = matched[keep]
+
+        # salida: vistos en este frame y confirmados (2 hits, o desde el primer frame)
+        out = matched & ((self.hits >= 2) | (self.frame_id == 1))
+        elapsed = (time.perf_counter() - t0) * 1000
+        self.track_ms = elapsed if self.frame_id == 1 else 0.9 * self.track_ms + 0.1 * elapsed
+        return self.boxes[out].copy(), self.ids[out].copy(), self.cls[out].copy(), self.score[out].copy()
+
+    def coast(self):
+        """Frame sin detecciones (cascada): avanza los tracks activos sin envejecerlos"""
+        active = self.lost == 0
+        self.boxes[active] += self.vel[active]
+        out = active & (self.hits >= 2)
+        return self.boxes[out].copy(), self.ids[out].copy(), self.cls[out].copy(), self.score[out].copy()
+
+
+# ===============================
+# BENCHMARK DEL TRACKING (SIN MODELO)
+# ===============================
+def benchmark(frames=2000, objects=40, seed=0):
+    """Frames/s del tracker con detecciones sintéticas en movimiento"""
+    rng = np.random.default_rng(seed)
+    pos = rng.uniform(0, 1200, (objects, 2))
+    speed = rng.uniform(-3, 3, (objects, 2))
+    size = rng.uniform(20, 80, (objects, 2))
+    cls = rng.integers(0, 4, objects)
+    tracker = ByteTracker()
+    t0 = time.perf_counter()
+    for _ in range(frames):
+        pos += speed
+        xyxy = np.hstack([pos, pos + size]) + rng.normal(0, 1, (objects, 4))
+        conf = rng.uniform(0.05, 0.95, objects)
+        tracker.update(xyxy, conf, cls)
+    elapsed = time.perf_counter() - t0
+    return {"frames": frames, "objetos": objects, "fps": round(frames / elapsed, 1),
+            "ms_por_frame": round(elapsed / frames * 1000, 3), "tracks": len(tracker.ids)}
+
+
+if __name__ == "__main__":
+    print(benchmark())
@@ -0,0 +1,64 @@
+import time
+import threading
+from collections import defaultdict
+
+from backend_siv.app.services.config import VIEWER_LEASE_SEC
+
+RENDITIONS = ("full", "low", "snap_full", "snap_low", "fmp4")  # snap_*: solo snapshots; fmp4: H.264 por WebSocket
+
+
+# ===============================
+# VIEWERS POR CÁMARA Y RENDICIÓN
+# ===============================
+class ViewerRegistry:
+    """
+    Conteo de referencias con lease: cada viewer se identifica con un id y
+    renueva su lease en cada pedido de frame. release() lo quita al cerrar el
+    stream; si el worker HTTP muere sin avisar, el lease vence solo.
+    """
+
+    def __init__(self, lease_sec=VIEWER_LEASE_SEC):
+        self.lease_sec = lease_sec
+        self._lock = threading.Lock()
+        self._leases = defaultdict(dict)  # (cam_id, rendición) -> {viewer_id: último acceso}
+        self.last_active = {}             # cam_id -> último momento con algún viewer
+
+    def touch(self, cam_id, rendition, viewer_id, now=None):
+        now = now or time.time()
+        with self._lock:
+            self._leases[(cam_id, rendition)][viewer_id] = now
+            self.last_active[cam_id] = now
+
+    def mark_active(self, cam_id, now=None):
+        with self._lock:
+            self.last_active[cam_id] = now or time.time()
+
+    def release(self, cam_id, rendition, viewer_id):
+        with self._lock:
+            self._leases[(cam_id, rendition)].pop(viewer_id, None)
+
+    def count(self, cam_id, rendition=None, now=None):
+        now = now or time.time()
+        renditions = (rendition,) if rendition else RENDITIONS
+        total = 0
+        with self._lock:
+            for r in renditions:
+                leases = self._leases[(cam_id, r)]
+                for vid, seen in list(leases.items()):
+                    if now - seen > self.lease_sec:
+                        del leases[vid]
+                total += len(leases)
+            if total:
+                self.last_active[cam_id] = now
+        return total
+
+    def idle_for(self, cam_id, now=None):
+        """Segundos desde que la cámara tuvo su último viewer (inf si nunca)"""
+        now = now or time.time()
+        if self.count(cam_id, now=now):
+            return 0.0
+        last = self.last_active.get(cam_id)
+        return float("inf") if last is None else now - last
+
+    def snapshot(self, cam_id):
+        return {r: self.count(cam_id, r) for r in RENDITIONS}
@@ -0,0 +1,66 @@
+import cv2
+import numpy as np
+from collections import defaultdict
+
+from backend_siv.app.services.config import CAMERA_ZONES, DEFAULT_ZONES, ZONE_GRID_CELL
+
+
+# ===============================
+# GRILLA DE ZONAS RASTERIZADA
+# ===============================
+class ZoneMap:
+    """
+    Rasteriza una vez los polígonos de zona de una cámara en una grilla uint8
+    (una celda cada ZONE_GRID_CELL px). Clasificar un centroide es una lectura
+    de la grilla: O(1) sin importar cuántas zonas o vértices haya.
+    """
+
+    def __init__(self, zones, frame_size, cell=ZONE_GRID_CELL):
+        self.width, self.height = frame_size
+        self.cell = cell
+        self.names = [None] + list(zones)  # índice 0 = fuera de toda zona
+        cols = -(-self.width // cell)
+        rows = -(-self.height // cell)
+        self.grid = np.zeros((rows, cols), np.uint8)
+
+        for label, name in enumerate(self.names[1:], start=1):
+            pts = np.array([
+                (x * self.width / cell, y * self.height / cell)
+                for x, y in zones[name]
+            ], np.float32)
+            cv2.fillPoly(self.grid, [np.round(pts).astype(np.int32)], label)
+
+    def classify(self, x, y):
+        """Nombre de la zona del punto (coordenadas del frame) o None"""
+        col = int(x) // self.cell
+        row = int(y) // self.cell
+        if row < 0 or col < 0 or row >= self.grid.shape[0] or col >= self.grid.shape[1]:
+            return None
+        return self.names[self.grid[row, col]]
+
+    def classify_many(self, xs, ys):
+        """Versión vectorizada: devuelve los índices de zona (0 = ninguna)"""
+        cols = np.clip(np.asarray(xs, np.int64) // self.cell, 0, self.grid.shape[1] - 1)
+        rows = np.clip(np.asarray(ys, np.int64) // self.cell, 0, self.grid.shape[0] - 1)
+        return self.grid[rows, cols]
+
+
+_zone_maps = {}
+
+
+def get_zone_map(cam_id, frame_size):
+    """ZoneMap cacheado por cámara; se reconstruye solo si cambia la resolución"""
+    zm = _zone_maps.get(cam_id)
+    if zm is None or (zm.width, zm.height) != tuple(frame_size):
+        zm = ZoneMap(CAMERA_ZONES.get(cam_id, DEFAULT_ZONES), frame_size)
+        _zone_maps[cam_id] = zm
+    return zm
+
+
+def empty_occupancy():
+    return defaultdict(lambda: defaultdict(int))
+
+
+def freeze_occupancy(occupancy):
+    """Copia a dicts normales (para publicar el conteo del frame)"""
+    return {zona: dict(clases) for zona, clases in occupancy.items()}
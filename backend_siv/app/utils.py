@@ -6,7 +6,7 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 from app import models
-from app.api.routes.dependencies import get_db
+from app.database import get_db
 
 # ---------------------------
 # Hash de contraseñas
@@ -0,0 +1,71 @@
+import os
+import sys
+import shutil
+import tempfile
+
+import pytest
+
+# Igual que uvicorn app.main:app desde backend_siv: los servicios se importan como backend_siv.*
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (BACKEND_DIR, os.path.dirname(BACKEND_DIR)):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+# Base SQLite propia y motor sintético, aunque el entorno apunte a otra base:
+# config y database leen el entorno al importarse
+TMP_DIR = tempfile.mkdtemp(prefix="siv_tests_")
+os.environ["SIV_DATABASE_URL"] = f"sqlite:///{os.path.join(TMP_DIR, 'tests.db')}"
+os.environ["SIV_ENGINE_MODE"] = "fake"
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(TMP_DIR, ignore_errors=True)
+
+
+@pytest.fixture
+def db():
+    """Sesión sobre la base de pruebas; las tablas se vacían al terminar cada test"""
+    from app import models
+    from app.database import engine, SessionLocal
+
+    models.Base.metadata.create_all(engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        for table in reversed(models.Base.metadata.sorted_tables):
+            session.execute(table.delete())
+        session.commit()
+        session.close()
+
+
+@pytest.fixture
+def client(db):
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    return TestClient(app)
+
+
+@pytest.fixture
+def login(db, client):
+    """login(rol) -> headers con el token de un usuario nuevo de ese rol"""
+    from app import models, utils
+
+    def _login(role="admin"):
+        db_role = db.query(models.Role).filter(models.Role.name == role).first()
+        if not db_role:
+            db_role = models.Role(name=role, permissions=[])
+            db.add(db_role)
+            db.flush()
+        username = f"test_{role}"
+        if not db.query(models.User).filter(models.User.username == username).first():
+            db.add(models.User(username=username, name=role.capitalize(), email=f"{username}@siv.cl",
+                               password=utils.hash_password("clave"), role_id=db_role.id))
+        db.commit()
+        resp = client.post("/api/auth/login", json={"username": username, "password": "clave"})
+        assert resp.status_code == 200, resp.text
+        return {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+    return _login
@@ -0,0 +1,63 @@
+import pytest
+
+from backend_siv.app.services.alertas import simulate, synthetic_stream, ACTIVE, IDLE, PENDING
+from backend_siv.app.services.config import ALERT_RULES
+
+
+def pattern(fps, on_sec, off_sec):
+    """Señal presente on_sec segundos y ausente off_sec, muestreada a fps"""
+    return "x" * round(on_sec * fps) + "." * round(off_sec * fps)
+
+
+def transitions(changes, name):
+    return [(t, state) for t, rule, state in changes if rule == name]
+
+
+def test_un_frame_perdido_no_libera_alerta_activa():
+    rule = ALERT_RULES["conos"]
+    fps = 10
+    on = pattern(fps, 2, 0)
+    # un hueco de un frame con la alerta ya activa, y otro mientras se confirma
+    stream = synthetic_stream("xx.xx" + on + "." + on, rule["signal"], fps)
+    states = [state for _, state in transitions(simulate(stream), "conos")]
+    assert states == [PENDING, ACTIVE]
+
+
+@pytest.mark.parametrize("name", list(ALERT_RULES))
+def test_confirma_y_libera_en_las_ventanas_configuradas(name):
+    rule = ALERT_RULES[name]
+    fps = 10
+    on_sec = 2.0
+    stream = synthetic_stream(pattern(fps, on_sec, rule["release_sec"] + 1), rule["signal"], fps)
+    changes = transitions(simulate(stream), name)
+
+    assert [state for _, state in changes] == [PENDING, ACTIVE, IDLE]
+    (t_pending, _), (t_active, _), (t_idle, _) = changes
+    last_seen = on_sec - 1 / fps
+    assert t_pending == 0
+    assert t_active == pytest.approx(rule["confirm_sec"], abs=1 / fps)
+    assert t_active >= rule["confirm_sec"] - 1e-9
+    assert t_idle == pytest.approx(last_seen + rule["release_sec"], abs=1 / fps)
+    assert t_idle >= last_seen + rule["release_sec"] - 1e-9
+
+
+def test_mismas_transiciones_a_5_y_30_fps():
+    rule = ALERT_RULES["conos"]
+    by_fps = {}
+    for fps in (5, 30):
+        stream = synthetic_stream(pattern(fps, 2.0, rule["release_sec"] + 1), rule["signal"], fps)
+        by_fps[fps] = transitions(simulate(stream), "conos")
+
+    assert [s for _, s in by_fps[5]] == [s for _, s in by_fps[30]] == [PENDING, ACTIVE, IDLE]
+    # mismos tiempos salvo el muestreo: a lo más un frame de la tasa más baja
+    for (t5, _), (t30, _) in zip(by_fps[5], by_fps[30]):
+        assert t5 == pytest.approx(t30, abs=1 / 5)
+
+
+def test_senal_intermitente_no_confirma():
+    rule = ALERT_RULES["peaton_en_via"]
+    fps = 10
+    # apariciones sueltas separadas más que gap_sec: nunca llega a ACTIVE
+    gap = "." * (round(rule["gap_sec"] * fps) + 2)
+    stream = synthetic_stream(("x" + gap) * 5, rule["signal"], fps)
+    assert ACTIVE not in [s for _, s in transitions(simulate(stream), "peaton_en_via")]
@@ -0,0 +1,58 @@
+import pytest
+
+from backend_siv.app.services.busqueda import terms, search_incidentes
+from backend_siv.app.services.config import SEARCH_MAX_TERMS
+
+
+@pytest.mark.parametrize("q, expected", [
+    ("camión detenido", ["camión", "detenido"]),
+    ('cono" OR "x', ["cono", "OR", "x"]),      # comillas y operadores no pasan a MATCH
+    ("+pista -berma *", ["pista", "berma"]),
+    ("NEAR(a b)", ["NEAR", "a", "b"]),
+    ("", []),
+    (None, []),
+    ("%$#", []),
+])
+def test_terms_solo_palabras(q, expected):
+    assert terms(q) == expected
+
+
+def test_terms_largo_minimo_y_maximo():
+    assert terms("a de ruta", min_len=3) == ["ruta"]
+    assert len(terms(" ".join(f"p{i}" for i in range(SEARCH_MAX_TERMS + 5)))) == SEARCH_MAX_TERMS
+
+
+def add_incidente(db, observacion, camera="1"):
+    from app import models
+    inc = models.Incidente(type="cono", priority="Alta", camera=camera, status="Activo",
+                           pista=[], trabajos_via=[], observacion=observacion)
+    db.add(inc)
+    db.commit()
+    return inc.id
+
+
+@pytest.mark.parametrize("q, matches", [
+    ("camion*", True),
+    ("(camion", True),
+    ("camion -", True),
+    # OR / NEAR no son operadores: quedan como palabras que también deben aparecer
+    ('camion" OR "x', False),
+    ('NEAR("camion")', False),
+])
+def test_busqueda_con_sintaxis_fts_no_falla(db, q, matches):
+    found = add_incidente(db, "Camión detenido en la berma")
+    add_incidente(db, "Cono en pista 2")
+    total, rows = search_incidentes(db, q)
+    assert [inc.id for inc, _ in rows] == ([found] if matches else [])
+    assert total == len(rows)
+
+
+def test_busqueda_prefijo_sin_tildes_y_filtros(db):
+    found = add_incidente(db, "Camión detenido en la berma", camera="3")
+    add_incidente(db, "Camión detenido", camera="4")
+    add_incidente(db, "Cono en pista 2", camera="3")
+
+    total, rows = search_incidentes(db, "camion deten", camera="3")
+    assert total == 1
+    assert rows[0][0].id == found
+    assert search_incidentes(db, '""') == (0, [])
@@ -0,0 +1,102 @@
+import pytest
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.testclient import TestClient
+
+from backend_siv.app.services.entrega import _parse_range, range_file_response
+
+DATA = bytes(range(256)) * 4  # 1024 bytes
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 1023)),
+    ("bytes=-24", (1000, 1023)),
+    ("bytes=-5000", (0, 1023)),         # sufijo más largo que el archivo
+    ("bytes=1000-5000", (1000, 1023)),  # fin recortado al tamaño
+    ("bytes=10-20, 30-40", (10, 20)),   # solo el primer rango
+    ("items=0-10", None),
+    ("bytes=abc", None),
+    ("bytes=-0", None),
+    ("bytes=x-10", None),
+])
+def test_parse_range(header, expected):
+    assert _parse_range(header, len(DATA)) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=1024-", "bytes=50-10"])
+def test_parse_range_no_satisfacible(header):
+    with pytest.raises(HTTPException) as exc:
+        _parse_range(header, len(DATA))
+    assert exc.value.status_code == 416
+    assert exc.value.headers["Content-Range"] == "bytes */1024"
+
+
+@pytest.fixture
+def file_client(tmp_path):
+    path = tmp_path / "clip.mp4"
+    path.write_bytes(DATA)
+    app = FastAPI()
+
+    @app.get("/clip")
+    def clip(request: Request):
+        return range_file_response(request, str(path), "video/mp4")
+
+    return TestClient(app)
+
+
+def test_sin_range_entrega_todo_con_etag(file_client):
+    resp = file_client.get("/clip")
+    assert resp.status_code == 200
+    assert resp.content == DATA
+    assert resp.headers["Accept-Ranges"] == "bytes"
+    assert resp.headers["Content-Length"] == str(len(DATA))
+    assert resp.headers["ETag"].startswith('"')
+
+
+def test_range_devuelve_206_con_content_range(file_client):
+    resp = file_client.get("/clip", headers={"Range": "bytes=100-199"})
+    assert resp.status_code == 206
+    assert resp.content == DATA[100:200]
+    assert resp.headers["Content-Range"] == "bytes 100-199/1024"
+    assert resp.headers["Content-Length"] == "100"
+
+
+def test_range_invalido_entrega_completo(file_client):
+    resp = file_client.get("/clip", headers={"Range": "bytes=abc"})
+    assert resp.status_code == 200
+    assert resp.content == DATA
+
+
+def test_range_fuera_del_archivo_es_416(file_client):
+    resp = file_client.get("/clip", headers={"Range": "bytes=2000-"})
+    assert resp.status_code == 416
+    assert resp.headers["Content-Range"] == "bytes */1024"
+
+
+def test_if_none_match_y_comodin_dan_304(file_client):
+    etag = file_client.get("/clip").headers["ETag"]
+    assert file_client.get("/clip", headers={"If-None-Match": etag}).status_code == 304
+    assert file_client.get("/clip", headers={"If-None-Match": f'"otro", {etag}'}).status_code == 304
+    assert file_client.get("/clip", headers={"If-None-Match": "*"}).status_code == 304
+    assert file_client.get("/clip", headers={"If-None-Match": '"otro"'}).status_code == 200
+
+
+def test_if_modified_since(file_client):
+    last_modified = file_client.get("/clip").headers["Last-Modified"]
+    assert file_client.get("/clip", headers={"If-Modified-Since": last_modified}).status_code == 304
+    old = "Mon, 01 Jan 2001 00:00:00 GMT"
+    assert file_client.get("/clip", headers={"If-Modified-Since": old}).status_code == 200
+    assert file_client.get("/clip", headers={"If-Modified-Since": "basura"}).status_code == 200
+
+
+def test_if_range_con_etag_vigente_respeta_el_rango(file_client):
+    etag = file_client.get("/clip").headers["ETag"]
+    resp = file_client.get("/clip", headers={"Range": "bytes=0-9", "If-Range": etag})
+    assert resp.status_code == 206
+    assert resp.content == DATA[:10]
+
+
+def test_if_range_con_etag_viejo_entrega_completo(file_client):
+    resp = file_client.get("/clip", headers={"Range": "bytes=0-9", "If-Range": '"viejo"'})
+    assert resp.status_code == 200
+    assert resp.content == DATA
@@ -0,0 +1,82 @@
+from app import crud, models
+from app.routes import incidentes as incidentes_routes
+
+
+def add_incidente(db, status="Activo", camera="1"):
+    inc = models.Incidente(type="cono", priority="Alta", camera=camera, status=status,
+                           pista=[], trabajos_via=[])
+    db.add(inc)
+    db.commit()
+    return inc.id
+
+
+CLOSE = {"accion": "cerrar", "end_date": "2026-03-01", "end_time": "10:00:00"}
+
+
+def test_resultado_por_id(db):
+    activo, cerrado = add_incidente(db), add_incidente(db, status="Cerrado")
+    outcomes = crud.bulk_update_incidentes(db, [activo, cerrado, 999, activo], {"status": "Cerrado"})
+    # ids repetidos se informan una vez, en el orden pedido
+    assert outcomes == {activo: "actualizado", cerrado: "ya_cerrado", 999: "no_encontrado"}
+    db.expire_all()
+    assert db.get(models.Incidente, activo).status == "Cerrado"
+
+
+def test_operador_no_toca_cerrados(db):
+    activo, cerrado = add_incidente(db), add_incidente(db, status="Cerrado")
+    outcomes = crud.bulk_update_incidentes(db, [activo, cerrado], {"priority": "Baja"}, skip_closed=True)
+    assert outcomes == {activo: "actualizado", cerrado: "prohibido"}
+    db.expire_all()
+    assert db.get(models.Incidente, activo).priority == "Baja"
+    assert db.get(models.Incidente, cerrado).priority == "Alta"
+
+
+def test_filtros_que_exceden_el_limite_no_aplican_nada(db):
+    ids = [add_incidente(db) for _ in range(3)]
+    assert crud.bulk_update_incidentes(db, None, {"priority": "Baja"}, filtros={"camera": "1"}, limit=2) is None
+    db.expire_all()
+    assert {db.get(models.Incidente, i).priority for i in ids} == {"Alta"}
+
+    outcomes = crud.bulk_update_incidentes(db, None, {"priority": "Baja"}, filtros={"camera": "1"}, limit=3)
+    assert outcomes == {i: "actualizado" for i in ids}
+
+
+def test_bulk_cerrar_por_ids(db, client, login):
+    activo, cerrado = add_incidente(db), add_incidente(db, status="Cerrado")
+    resp = client.post("/api/incidentes/bulk/", json={**CLOSE, "ids": [activo, cerrado, 999]}, headers=login())
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["actualizados"] == 1
+    assert {r["id"]: r["resultado"] for r in body["resultados"]} == {
+        activo: "actualizado", cerrado: "ya_cerrado", 999: "no_encontrado",
+    }
+
+
+def test_bulk_operador_recibe_prohibido(db, client, login):
+    cerrado = add_incidente(db, status="Cerrado")
+    body = {"accion": "actualizar", "ids": [cerrado], "cambios": {"priority": "Baja"}}
+    resp = client.post("/api/incidentes/bulk/", json=body, headers=login("operador"))
+    assert resp.json()["resultados"] == [{"id": cerrado, "resultado": "prohibido"}]
+
+
+def test_bulk_valida_la_seleccion(db, client, login):
+    headers = login()
+    cases = [
+        {**CLOSE},                                              # ni ids ni filtros
+        {**CLOSE, "ids": [1], "filtros": {"camera": "1"}},      # los dos
+        {**CLOSE, "filtros": {"camera": "", "status": None}},   # filtros vacíos = todos
+        {"accion": "cerrar", "ids": [1]},                       # cierre sin fecha
+        {"accion": "actualizar", "ids": [1]},                   # sin cambios
+    ]
+    for body in cases:
+        assert client.post("/api/incidentes/bulk/", json=body, headers=headers).status_code == 400, body
+
+
+def test_bulk_por_filtros_sobre_el_limite_responde_400(db, client, login, monkeypatch):
+    for _ in range(3):
+        add_incidente(db, camera="7")
+    monkeypatch.setattr(incidentes_routes, "BULK_MAX_IDS", 2)
+    resp = client.post("/api/incidentes/bulk/", json={**CLOSE, "filtros": {"camera": "7"}}, headers=login())
+    assert resp.status_code == 400
+    db.expire_all()
+    assert db.query(models.Incidente).filter(models.Incidente.status == "Cerrado").count() == 0
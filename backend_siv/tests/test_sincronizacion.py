@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend_siv.app.services.config import CHANGES_SETTLE_SEC
+from backend_siv.app.services.sincronizacion import (
+    encode_cursor, decode_cursor, changes_since, current_cursor
+)
+
+
+def add_incidente(db, updated_at, **extra):
+    from app import models
+    inc = models.Incidente(type="cono", priority="Alta", camera="1", status="Activo",
+                           pista=[], trabajos_via=[], **extra)
+    db.add(inc)
+    db.flush()
+    inc.updated_at = updated_at  # onupdate no corre en el flush del alta
+    db.commit()
+    return inc
+
+
+def test_cursor_ida_y_vuelta_con_microsegundos():
+    ts = datetime(2026, 3, 1, 12, 30, 5, 123456)
+    cursor = encode_cursor(ts, 42)
+    assert "=" not in cursor  # sin relleno: va tal cual en la query string
+    assert decode_cursor(cursor) == (ts, 42)
+
+
+@pytest.mark.parametrize("cursor", ["", "no-es-base64!", encode_cursor(datetime(2026, 1, 1), 1)[:-3], "eHh4"])
+def test_cursor_invalido_lanza_value_error(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_el_cursor_no_avanza_sobre_cambios_recientes(db):
+    old = datetime.utcnow() - timedelta(seconds=CHANGES_SETTLE_SEC + 60)
+    settled = add_incidente(db, old)
+    fresh = add_incidente(db, datetime.utcnow())
+
+    rows, cursor, has_more = changes_since(db)
+    assert [r.id for r in rows] == [settled.id, fresh.id]
+    assert not has_more
+    # el reciente se entrega pero el cursor se queda en el asentado
+    assert decode_cursor(cursor) == (settled.updated_at, settled.id)
+    assert current_cursor(db) == cursor
+
+    rows, cursor2, _ = changes_since(db, cursor)
+    assert [r.id for r in rows] == [fresh.id]
+    assert cursor2 == cursor
+
+
+def test_mismo_updated_at_desempata_por_id(db):
+    ts = datetime.utcnow() - timedelta(seconds=CHANGES_SETTLE_SEC + 60)
+    first, second = add_incidente(db, ts), add_incidente(db, ts)
+
+    rows, cursor, _ = changes_since(db, encode_cursor(ts, first.id))
+    assert [r.id for r in rows] == [second.id]
+    assert decode_cursor(cursor) == (ts, second.id)
+
+
+def test_con_mas_paginas_el_cursor_avanza_aunque_sean_recientes(db):
+    now = datetime.utcnow()
+    incs = [add_incidente(db, now + timedelta(microseconds=i)) for i in range(3)]
+
+    rows, cursor, has_more = changes_since(db, limit=2)
+    assert has_more
+    assert [r.id for r in rows] == [incs[0].id, incs[1].id]
+    assert decode_cursor(cursor)[1] == incs[1].id
+
+
+def test_changes_con_cursor_invalido_responde_400(client, login):
+    resp = client.get("/api/incidentes/changes", params={"since": "no-es-un-cursor"}, headers=login())
+    assert resp.status_code == 400
+    assert resp.json()["detail"] == "Cursor inválido"
+
+
+def test_changes_sin_cursor_devuelve_todo_y_etag(db, client, login):
+    inc = add_incidente(db, datetime.utcnow() - timedelta(seconds=CHANGES_SETTLE_SEC + 60))
+    headers = login()
+
+    resp = client.get("/api/incidentes/changes", params={"since": ""}, headers=headers)
+    assert resp.status_code == 200
+    body = resp.json()
+    assert [i["id"] for i in body["items"]] == [inc.id]
+    assert decode_cursor(body["cursor"])[1] == inc.id
+
+    cached = client.get("/api/incidentes/changes", params={"since": ""},
+                        headers={**headers, "If-None-Match": resp.headers["ETag"]})
+    assert cached.status_code == 304
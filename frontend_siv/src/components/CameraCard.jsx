@@ -11,7 +11,8 @@ const ALERT_COLORS = {
 
 const NORMAL_BORDER = "#555";
 
-const CameraCard = ({ camId, title }) => {
+// snapshotMs > 0: en vez del stream continuo, refresca un snapshot cada snapshotMs
+const CameraCard = ({ camId, title, snapshotMs = 0 }) => {
   const [data, setData] = useState({
     nivel: "Baja",
     nivel_color: "#16a34a",
@@ -23,6 +24,7 @@ const CameraCard = ({ camId, title }) => {
   });
 
   const [online, setOnline] = useState(true);
+  const [idle, setIdle] = useState(false); // modo snapshot: cámara apagada, sin frame
   const videoRef = useRef(null);
 
   // Fetch del estado de la cámara
@@ -63,10 +65,45 @@ const CameraCard = ({ camId, title }) => {
 
   // 🔹 Forzar carga del stream al montar el componente
   useEffect(() => {
+    if (snapshotMs > 0) return;
     if (videoRef.current) {
       videoRef.current.src = `${BACKEND_URL}/api/cam/${camId}/stream_low`; // mini video baja calidad
     }
-  }, [camId]);
+  }, [camId, snapshotMs]);
+
+  // 🔹 Modo snapshot: petición condicional (ETag), solo se descarga si hay frame nuevo
+  useEffect(() => {
+    if (snapshotMs <= 0) return;
+    let etag = null;
+    let objectUrl = null;
+
+    const fetchSnapshot = async () => {
+      try {
+        const res = await fetch(`${BACKEND_URL}/api/cam/${camId}/snapshot?low=true`, {
+          headers: etag ? { "If-None-Match": etag } : {},
+          cache: "no-store",
+        });
+        if (res.status === 304) return;
+        // 204: la cámara está apagada por inactividad (el snapshot no la inicia)
+        setIdle(res.status !== 200);
+        if (res.status !== 200) return;
+        etag = res.headers.get("ETag");
+        const url = URL.createObjectURL(await res.blob());
+        if (videoRef.current) videoRef.current.src = url;
+        if (objectUrl) URL.revokeObjectURL(objectUrl);
+        objectUrl = url;
+      } catch (err) {
+        console.error(err);
+      }
+    };
+
+    fetchSnapshot();
+    const interval = setInterval(fetchSnapshot, snapshotMs);
+    return () => {
+      clearInterval(interval);
+      if (objectUrl) URL.revokeObjectURL(objectUrl);
+    };
+  }, [camId, snapshotMs]);
 
   const borderColor = data.alertType ? ALERT_COLORS[data.alertType] : NORMAL_BORDER;
 
@@ -96,8 +133,10 @@ const CameraCard = ({ camId, title }) => {
               className="stream"
             />
 
+            {idle && <div className="idle">EN REPOSO 💤 · clic para ver en vivo</div>}
+
             <div className="camera-title">{data.asistencia ? data.asistencia : title}</div>
-            <div className="live-badge">EN VIVO 🔴</div>
+            {!idle && <div className="live-badge">EN VIVO 🔴</div>}
             <div className="level-badge" style={{ background: data.nivel_color }}>
               🚦 {data.nivel}
             </div>
@@ -162,6 +201,17 @@ const CameraCard = ({ camId, title }) => {
           background: #111827;
         }
 
+        .idle {
+          position: absolute;
+          inset: 0;
+          display: flex;
+          justify-content: center;
+          align-items: center;
+          color: #d1d5db;
+          font-weight: 700;
+          background: #111827;
+        }
+
         .camera-title {
           position: absolute;
           top: 10px;
@@ -0,0 +1,72 @@
+import React, { useEffect, useRef, useState } from "react";
+
+const BACKEND_URL = "http://127.0.0.1:8000";
+const WS_URL = BACKEND_URL.replace(/^http/, "ws");
+
+// H.264 (MP4 fragmentado) por WebSocket con Media Source Extensions.
+// Si el navegador o el servidor no lo soportan, vuelve al stream MJPEG.
+const LiveVideo = ({ camId, className, alt }) => {
+  const videoRef = useRef(null);
+  const [fallback, setFallback] = useState(!window.MediaSource);
+
+  useEffect(() => {
+    if (fallback) return;
+    const video = videoRef.current;
+    const ws = new WebSocket(`${WS_URL}/api/cam/${camId}/live`);
+    ws.binaryType = "arraybuffer";
+
+    let mediaSource = null;
+    let buffer = null;
+    const pending = [];
+
+    const flush = () => {
+      if (!buffer || buffer.updating || !pending.length) return;
+      buffer.appendBuffer(pending.shift());
+      // mantiene el video pegado al vivo y libera lo ya reproducido
+      if (video.buffered.length) {
+        const end = video.buffered.end(video.buffered.length - 1);
+        if (end - video.currentTime > 1.5) video.currentTime = end - 0.2;
+      }
+    };
+
+    ws.onmessage = (msg) => {
+      if (typeof msg.data === "string") {
+        // nuevo init (primer mensaje o encoder reiniciado): nuevo MediaSource
+        const { mime } = JSON.parse(msg.data);
+        if (!MediaSource.isTypeSupported(mime)) {
+          setFallback(true);
+          return;
+        }
+        pending.length = 0;
+        buffer = null;
+        mediaSource = new MediaSource();
+        video.src = URL.createObjectURL(mediaSource);
+        mediaSource.addEventListener("sourceopen", () => {
+          buffer = mediaSource.addSourceBuffer(mime);
+          buffer.mode = "sequence";
+          buffer.addEventListener("updateend", flush);
+          flush();
+        });
+        return;
+      }
+      pending.push(msg.data);
+      flush();
+    };
+
+    ws.onclose = (e) => {
+      if (e.code === 1011 || e.code === 1006) setFallback(true); // sin PyAV en el servidor
+    };
+
+    return () => {
+      ws.close();
+      if (video && video.src) URL.revokeObjectURL(video.src);
+    };
+  }, [camId, fallback]);
+
+  if (fallback) {
+    return <img src={`${BACKEND_URL}/api/cam/${camId}/stream`} className={className} alt={alt} />;
+  }
+  return <video ref={videoRef} className={className} autoPlay muted playsInline />;
+};
+
+export default LiveVideo;
@@ -1,6 +1,7 @@
 import React, { useState, useEffect, useRef } from "react";
 import { useNavigate } from "react-router-dom";
 import CameraCard from "../components/CameraCard";
+import LiveVideo from "../components/LiveVideo";
 import { motion } from "framer-motion";
 import { Activity, AlertTriangle, Camera } from "lucide-react";
 import { Container, Row, Col, Button } from "react-bootstrap";
@@ -10,6 +11,10 @@ import "../styles/Camaras.css";
 
 const BACKEND_URL = "http://127.0.0.1:8000";
 
+// La grilla refresca snapshots (sin un stream MJPEG por tile); el stream en vivo
+// se abre solo en pantalla completa
+const GRID_SNAPSHOT_MS = 2000;
+
 const ALERT_COLORS = {
   vehiculo: "#ef4444",
   asistencia: "#10b981",
@@ -27,7 +32,6 @@ export default function Camaras() {
   const [isRecording, setIsRecording] = useState(false);
   const mediaRecorderRef = useRef(null);
   const recordedChunksRef = useRef([]);
-  const videoRef = useRef(null);
 
   const cameras = [
     { id: 1, title: "CCTV 1.1" },
@@ -186,6 +190,7 @@ export default function Camaras() {
                 <CameraCard
                   title={cam.title}
                   camId={cam.id}
+                  snapshotMs={GRID_SNAPSHOT_MS}
                   alertColor={ALERT_COLORS[cameraStatus[cam.id]?.alertType]}
                   alertType={cameraStatus[cam.id]?.alertType}
                   nivel={cameraStatus[cam.id]?.nivel}
@@ -208,9 +213,8 @@ export default function Camaras() {
             exit={{ scale: 0.8 }}
             transition={{ duration: 0.3 }}
           >
-            <img
-              ref={videoRef}
-              src={`${BACKEND_URL}/api/cam/${focusedCam.id}/stream`}
+            <LiveVideo
+              camId={focusedCam.id}
               className="fullscreen-img"
               alt={focusedCam.title}
             />
@@ -46,11 +46,13 @@ export default function Grabaciones() {
   const [videos, setVideos] = useState([]);
   const [loading, setLoading] = useState(true);
   const [search, setSearch] = useState("");
+  const [query, setQuery] = useState(""); // search con debounce: se envía al backend
   const [fromDate, setFromDate] = useState("");
   const [toDate, setToDate] = useState("");
   const [selectedCamera, setSelectedCamera] = useState(""); 
   const [page, setPage] = useState(1);
   const [modalVideo, setModalVideo] = useState(null);
+  const [total, setTotal] = useState(0);
   const videoRefs = useRef({});
   const hoverTimeouts = useRef({});
   const ITEMS_PER_PAGE = 24;
@@ -61,8 +63,16 @@ export default function Grabaciones() {
   const fetchVideos = async () => {
     setLoading(true);
     try {
-      const res = await fetch(`${BACKEND_URL}/api/videos/`);
+      // Paginación y filtros indexados se resuelven en el backend
+      const params = new URLSearchParams({ page, page_size: ITEMS_PER_PAGE });
+      const cameraId = selectedCamera.replace(/\D/g, "");
+      if (cameraId) params.append("camera_id", cameraId);
+      if (query) params.append("q", query);
+      if (fromDate) params.append("desde", `${fromDate}T00:00:00`);
+      if (toDate) params.append("hasta", `${toDate}T23:59:59`);
+      const res = await fetch(`${BACKEND_URL}/api/videos/?${params}`);
       const data = await res.json();
+      setTotal(Number(res.headers.get("X-Total-Count")) || data.length);
       setVideos(data.map(v => ({
         id: v.filename || `video-${Math.random()}`,
         cameraName: v.camera_id ? `Cámara ${v.camera_id}` : "Manual",
@@ -72,7 +82,9 @@ export default function Grabaciones() {
         fullDateTime: v.upload_time || "",
         username: v.username || "Desconocido",
         filename: v.filename || "video_desconocido.mp4",
-        url: v.filename ? `${BACKEND_URL}/videos/${v.filename}` : ""
+        url: v.url ? `${BACKEND_URL}${v.url}` : "",
+        thumbnail: v.thumbnail_url ? `${BACKEND_URL}${v.thumbnail_url}` : "",
+        preview: v.preview_url ? `${BACKEND_URL}${v.preview_url}` : ""
       })));
     } catch (err) {
       console.error(err);
@@ -82,26 +94,22 @@ export default function Grabaciones() {
     }
   };
 
-  useEffect(() => { fetchVideos(); }, []);
-  useEffect(() => { setPage(1); }, [search, fromDate, toDate, selectedCamera]);
+  useEffect(() => {
+    const t = setTimeout(() => setQuery(search.trim()), 300);
+    return () => clearTimeout(t);
+  }, [search]);
+  useEffect(() => { fetchVideos(); }, [page, fromDate, toDate, selectedCamera, query]);
+  useEffect(() => { setPage(1); }, [query, fromDate, toDate, selectedCamera]);
 
   // ---------------------------
-  // Filtrado y ordenamiento
+  // Ordenamiento (los filtros ya vienen aplicados del backend)
   // ---------------------------
-  const filteredVideos = useMemo(() => 
-    videos
-      .filter(v => search ? (v.cameraName + v.type + v.username).toLowerCase().includes(search.toLowerCase()) : true)
-      .filter(v => fromDate ? v.date >= fromDate : true)
-      .filter(v => toDate ? v.date <= toDate : true)
-      .filter(v => selectedCamera ? v.cameraName === selectedCamera : true)
-  , [videos, search, fromDate, toDate, selectedCamera]);
-
   const sortedVideos = useMemo(() =>
-    filteredVideos.sort((a,b) => new Date(b.fullDateTime) - new Date(a.fullDateTime))
-  , [filteredVideos]);
+    [...videos].sort((a,b) => new Date(b.fullDateTime) - new Date(a.fullDateTime))
+  , [videos]);
 
-  const totalPages = Math.ceil(sortedVideos.length / ITEMS_PER_PAGE);
-  const paginated = sortedVideos.slice((page-1)*ITEMS_PER_PAGE, page*ITEMS_PER_PAGE);
+  const totalPages = Math.ceil(total / ITEMS_PER_PAGE);
+  const paginated = sortedVideos;
 
   // ---------------------------
   // Descargar video
@@ -218,7 +226,7 @@ export default function Grabaciones() {
             </Form.Select>
             <Form.Control 
               size="sm" 
-              placeholder="Buscar..." 
+              placeholder="Buscar archivo o tipo..." 
               value={search} 
               onChange={e => setSearch(e.target.value)} 
               style={{ width: "220px", fontSize:"1rem", padding:"6px 8px", borderRadius:10 }}
@@ -249,7 +257,9 @@ export default function Grabaciones() {
                 >
                   <video
                     ref={el => videoRefs.current[v.id] = el}
-                    src={v.url || ""}
+                    src={v.preview || v.url || ""}
+                    poster={v.thumbnail || undefined}
+                    preload="metadata"
                     style={{ width: "100%", height: 130, objectFit: "cover", borderRadius:20 }}
                     muted
                     loop
@@ -1,7 +1,7 @@
 // ============================
 // src/components/IncidentesKanban.jsx
 // ============================
-import React, { useEffect, useState, useMemo } from "react";
+import React, { useEffect, useState, useMemo, useRef } from "react";
 import { motion } from "framer-motion";
 import { ToastContainer, toast } from "react-toastify";
 import "react-toastify/dist/ReactToastify.css";
@@ -9,6 +9,7 @@ import IncidenteForm from "./IncidenteForm";
 
 const API_URL = "http://127.0.0.1:8000/api/incidentes";
 const USERS_API = "http://127.0.0.1:8000/api/users/";
+const POLL_MS = 10000; // sondeo de cambios (responde 304 si no hay nada nuevo)
 
 const glassCard = {
   background: "rgba(255,255,255,0.08)",
@@ -37,8 +38,27 @@ export default function IncidentesKanban({ currentUser = { id: 1, username: "Jua
 
   const getToken = () => currentUser.token || localStorage.getItem("token");
 
-  // ---------- FETCH DATOS ----------
+  // Estado de sincronización: tras la carga completa solo se piden los cambios.
+  // loaded va aparte del cursor: el cursor es "" con la tabla vacía o con todo
+  // recién modificado, y /changes sin since igual funciona.
+  const sync = useRef({ loaded: false, cursor: "", etag: "", usersMap: null });
+
+  const withNames = list => {
+    const usersMap = sync.current.usersMap;
+    if (!usersMap) return list;
+    list.forEach(inc => {
+      const createdId = Number(inc.created_by_id || 0);
+      const closedId = Number(inc.close_by_id || 0);
+      inc.created_by_name = usersMap.get(createdId) || "Desconocido";
+      inc.closed_by_name = usersMap.get(closedId) || "No cerrado";
+    });
+    return list;
+  };
+
+  // ---------- FETCH DATOS (lista completa) ----------
   const fetchIncidents = async () => {
+    if (sync.current.loaded) return fetchChanges();
+
     setLoading(true);
     const token = getToken();
     if (!token) {
@@ -58,17 +78,13 @@ export default function IncidentesKanban({ currentUser = { id: 1, username: "Jua
 
       if (usersRes.ok) {
         const usersData = await usersRes.json();
-        const usersMap = new Map(usersData.map(u => [Number(u.id), u.username]));
-
-        incData.forEach(inc => {
-          const createdId = Number(inc.created_by_id || 0);
-          const closedId = Number(inc.close_by_id || 0);
-          inc.created_by_name = usersMap.get(createdId) || "Desconocido";
-          inc.closed_by_name = usersMap.get(closedId) || "No cerrado";
-        });
+        sync.current.usersMap = new Map(usersData.map(u => [Number(u.id), u.username]));
       }
 
-      setIncidents(incData);
+      sync.current.cursor = incRes.headers.get("X-Changes-Cursor") || "";
+      sync.current.etag = "";
+      sync.current.loaded = true;
+      setIncidents(withNames(incData));
     } catch (err) {
       toast.error(`❌ ${err.message}`);
     } finally {
@@ -76,7 +92,54 @@ export default function IncidentesKanban({ currentUser = { id: 1, username: "Jua
     }
   };
 
-  useEffect(() => { fetchIncidents(); }, []);
+  // ---------- FETCH CAMBIOS DESDE EL CURSOR ----------
+  const fetchChanges = async () => {
+    const token = getToken();
+    if (!token) return;
+
+    try {
+      const changed = [];
+      let hasMore = true;
+      while (hasMore) {
+        const headers = { Authorization: `Bearer ${token}` };
+        if (sync.current.etag) headers["If-None-Match"] = sync.current.etag;
+        const res = await fetch(`${API_URL}/changes?since=${encodeURIComponent(sync.current.cursor)}`, { headers });
+
+        if (res.status === 304) break;
+        if (res.status === 400) {
+          // cursor inválido: volver a la lista completa
+          sync.current.loaded = false;
+          sync.current.cursor = "";
+          return fetchIncidents();
+        }
+        if (!res.ok) throw new Error("Error al actualizar incidentes");
+
+        const data = await res.json();
+        changed.push(...data.items);
+        hasMore = data.has_more;
+        // el ETag vale para este cursor: solo sirve si el cursor no avanzó
+        sync.current.etag = data.cursor === sync.current.cursor ? res.headers.get("ETag") || "" : "";
+        sync.current.cursor = data.cursor || sync.current.cursor;
+      }
+
+      if (changed.length === 0) return;
+      const byId = new Map(withNames(changed).map(inc => [inc.id, inc]));
+      setIncidents(prev => {
+        const merged = prev.map(inc => byId.get(inc.id) || inc);
+        const known = new Set(prev.map(inc => inc.id));
+        const added = changed.filter(inc => !known.has(inc.id) && byId.get(inc.id) === inc);
+        return [...added.reverse(), ...merged];
+      });
+    } catch (err) {
+      toast.error(`❌ ${err.message}`);
+    }
+  };
+
+  useEffect(() => {
+    fetchIncidents();
+    const timer = setInterval(() => { if (sync.current.loaded) fetchChanges(); }, POLL_MS);
+    return () => clearInterval(timer);
+  }, []);
 
   // ---------- EDICIÓN ----------
   const handleEdit = incident => { setEditIncident(incident); setIsFormOpen(true); };
@@ -127,6 +190,7 @@ export default function IncidentesKanban({ currentUser = { id: 1, username: "Jua
       >
         <motion.select style={styles.filterSelect} value={filter.status} onChange={e => setFilter(prev => ({ ...prev, status: e.target.value }))}>
           <option value="">Todos los estados</option>
+          <option value="Borrador">Borrador (automático)</option>
           <option value="Activo">Activo</option>
           <option value="Cerrado">Cerrado</option>
         </motion.select>
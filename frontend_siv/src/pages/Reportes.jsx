@@ -215,6 +215,25 @@ export default function Reportes() {
     doc.save("reporte_incidentes.pdf");
   };
 
+  /* ================= CSV (streaming desde el backend) ================= */
+  const exportCSV = async () => {
+    const params = new URLSearchParams({ formato: "csv", gzip: "false" });
+    if (fromDate) params.append("desde", `${fromDate}T00:00:00`);
+    if (toDate) params.append("hasta", `${toDate}T23:59:59`);
+    try {
+      const res = await fetch(`${API_URL}/export?${params}`, { headers: { Authorization: `Bearer ${TOKEN}` } });
+      if (!res.ok) throw new Error("Error al exportar");
+      const link = document.createElement("a");
+      link.href = URL.createObjectURL(await res.blob());
+      link.download = "incidentes.csv";
+      document.body.appendChild(link);
+      link.click();
+      link.remove();
+    } catch (err) {
+      toast.error(`❌ ${err.message}`);
+    }
+  };
+
   /* ==================== RENDER ==================== */
   return (
     <Container fluid style={{ minHeight:"100vh", background:bgGradient, padding:"2rem 0" }}>
@@ -231,6 +250,7 @@ export default function Reportes() {
             <Col xs={12} sm="auto"><Form.Control size="sm" type="date" value={toDate} onChange={e=>setToDate(e.target.value)}/></Col>
             <Col xs={12} sm><Form.Control size="sm" placeholder="Buscar..." value={search} onChange={e=>setSearch(e.target.value)}/></Col>
             <Col xs={12} sm="auto"><Button size="sm" variant="outline-light" onClick={exportPDF}>📄 Exportar PDF</Button></Col>
+            <Col xs={12} sm="auto"><Button size="sm" variant="outline-light" onClick={exportCSV}>📑 Exportar CSV</Button></Col>
           </Row>
         </Card>
 